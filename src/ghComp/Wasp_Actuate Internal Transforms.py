@@ -200,6 +200,9 @@ def main(base_aggregation, input_values, reset, aggregation):
                     
                     int_transform.current_pos = remap(target_angle, int_transform.transform_domain[0], int_transform.transform_domain[1], 0,1)
         
+        ## parts indexes are stored by position in the parts list, rebuild them after replacing transformed parts
+        aggregation.rebuild_indexes()
+        
        ## check for collisions
         parts_ids = xrange(len(aggregation.aggregated_parts))
         for part in aggregation.aggregated_parts:
@@ -210,8 +213,10 @@ def main(base_aggregation, input_values, reset, aggregation):
             for ch in part.children:
                 if ch in collision_ids:
                     collision_ids.remove(ch)
-            if part.collider.check_collisions_by_id(aggregation.aggregated_parts, collision_ids):
+            if part.collider.check_collisions_by_id(aggregation.aggregated_parts, collision_ids, aggregation.collider_tree):
                 colliding_ids.append(part.id)
+        ## release the colliders materialized by the checks
+        aggregation.release_unused_geometry()
             
         return aggregation, colliding_ids
         
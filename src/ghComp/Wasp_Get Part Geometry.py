@@ -82,7 +82,10 @@ def main(part):
     
     ## execute main code if all needed inputs are available
     if check_data:
-        return part.geo
+        geo = part.geo
+        ## instanced parts materialize their geometry when needed, release it once passed to the output
+        part.release_geometry()
+        return geo
     else:
         return -1
 
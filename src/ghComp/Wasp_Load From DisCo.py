@@ -180,6 +180,8 @@ def main(parts, file_path, renumber):
                     
                     ## flip part if negative scaling occurs
                     if trans.M00 * trans.M11 * trans.M22 < 0:
+                        ## the flipped geometry is edited in place, so the part cannot share the geometry of its base part
+                        new_part.detach_geometry()
                         ## geometry
                         new_part.geo.Flip(True, True, True)
                         ## connections
@@ -102,6 +102,9 @@ def main(geometry, inside, soft_constraint, is_required, parts):
     
     if check_data:
         geo_constraint = Mesh_Constraint(geometry, _inside = inside, _soft = soft_constraint, _required = is_required, _parts=parts)
+        ## dense closed meshes are classified on a voxel grid, so that only points close to the surface need an exact inside test
+        if geometry.IsClosed and geometry.Faces.Count > 1000:
+            geo_constraint.generate_grid()
         return geo_constraint
     else:
         return -1
@@ -133,6 +133,8 @@ def main(base_aggregation, id, remove_children, remove, reset, aggregation):
                 for i in range(len(aggregation.aggregated_parts)-1, -1, -1):
                     if aggregation.aggregated_parts[i].id in remove_ids:
                         aggregation.aggregated_parts.pop(i)
+                ## parts indexes are stored by position in the parts list, rebuild them after removing parts
+                aggregation.rebuild_indexes()
             
             else:
                 for i in range(len(aggregation.aggregated_parts)-1, -1, -1):
@@ -93,6 +93,8 @@ def main(part, transform):
         
         ## flip part if negative scaling occurs
         if transform.M00 * transform.M11 * transform.M22 < 0:
+            ## the flipped geometry is edited in place, so the part cannot share the geometry of its base part
+            part_trans.detach_geometry()
             ## geometry
             part_trans.geo.Flip(True, True, True)
             ## connections
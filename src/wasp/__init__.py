@@ -34,12 +34,16 @@ from __future__ import division
 import os
 import sys
 
-import scriptcontext
-from Rhino import RhinoApp
-
-
-global_tolerance = scriptcontext.doc.ModelAbsoluteTolerance*2
-rh_version = RhinoApp.ExeVersion
+## model tolerance and Rhino version (fall back to defaults when running outside of Rhino)
+try:
+	import scriptcontext
+	from Rhino import RhinoApp
+
+	global_tolerance = scriptcontext.doc.ModelAbsoluteTolerance*2
+	rh_version = RhinoApp.ExeVersion
+except (ImportError, AttributeError):
+	global_tolerance = 0.001*2
+	rh_version = None
 
 
 __author__ = ['ar0551 <a.rossi.andrea@gmail.com>']
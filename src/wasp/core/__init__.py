@@ -16,4 +16,15 @@ from .attributes import *
 from .aggregation import *
 from .constraints import *
 from .colliders import *
-from .graph import *
\ No newline at end of file
+from .graph import *
+from .spatial import *
+from .aggregation_queue import *
+from .frontier import *
+from .journal import *
+from .part_store import *
+from .collision_cache import *
+from .occupancy import *
+from .sdf import *
+from .convex import *
+from .classification_grid import *
+from .constraint_scheduler import *
\ No newline at end of file
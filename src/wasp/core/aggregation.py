@@ -10,18 +10,27 @@ Aggregation class and functions
 """
 
 import random
-import bisect
 import time
+from collections import OrderedDict
 
-from Rhino.Geometry import Transform
-from Rhino.Geometry import Point3d, Vector3d, Plane
+from wasp.geometry import Transform
+from wasp.geometry import Point3d, Vector3d, Plane
 
 from wasp import global_tolerance
 
 from wasp.core.parts import Part, AdvancedPart, PartCatalog
-from wasp.core.rules import Rule
+from wasp.core.rules import Rule, RulesTables
 from wasp.core.graph import Graph
 from wasp.core.constraints import Plane_Constraint, Mesh_Constraint
+from wasp.core.spatial import SpatialHash, AABBTree, mesh_bounds, line_segment, segment_overlaps_bounds
+from wasp.core.aggregation_queue import AggregationQueue
+from wasp.core.frontier import AggregationFrontier
+from wasp.core.journal import PlacementRecord
+from wasp.core.part_store import PartStore
+from wasp.core.collision_cache import CollisionCache
+from wasp.core.occupancy import OccupancyGrid
+from wasp.core.colliders import lines_hit_parts
+from wasp.core.constraint_scheduler import ConstraintScheduler, COLLISION_DEPENDENT_CHECKS, timer
 
 from wasp.field import Field
 
@@ -43,6 +52,8 @@ class Aggregation(object):
 			self.parts[part.name] = part
 		
 		self.rules = _rules
+		## rules tables compiled from the rules (computed when resetting base parts)
+		self.rules_tables = None
 		
 		self.mode = _mode
 		self.coll_check = _coll_check
@@ -62,16 +73,44 @@ class Aggregation(object):
 				self.field[f.name] = f
 			self.multiple_fields = True
 		
+		## cache of collision results between base parts at given relative poses (set to None to disable)
+		self.collision_cache = CollisionCache()
+		
 		## reset base parts
 		self.reset_base_parts()
 		
 		## temp list to store possible colliders to newly added parts
 		self.possible_collisions = []
 		
-		## aggregation queue, storing sorted possible next states in the form (part, f_val)
-		self.aggregation_queue = []
-		self.queue_values = []
-		self.queue_count = 0
+		## spatial hash of aggregated parts centers (broad-phase for collision checks)
+		self.spatial_index = None
+		## bounding volume hierarchy of aggregated parts collider meshes, with leaves stored by part position
+		self.collider_tree = None
+		self.collider_leaves = []
+		## bounding volume hierarchy of the exclusion lines of aggregated parts, with leaves (part id, constraint id, direction id) stored by part position
+		self.exclusion_tree = None
+		self.exclusion_leaves = []
+		## columnar store of aggregated parts state (centers, sizes, transforms, types, parents, active connections)
+		self.part_store = PartStore()
+		## optional voxel occupancy grid of aggregated parts colliders (collision fast path, see set_occupancy_grid)
+		self.occupancy_grid = None
+		## number of frontier triples sampled for each random placement, keeping the one with the most free space in front of its connection (see set_occupancy_grid)
+		self.free_space_samples = 1
+		## ids of aggregated parts recently used in collision checks, from the least to the most recently used
+		## (instanced parts beyond the maximum count release their materialized geometry and collider)
+		self.materialized_parts = OrderedDict()
+		self.max_materialized_parts = 1000
+		self.rebuild_spatial_index()
+		
+		## aggregation queue, storing possible next states in the form (part, parent_id, transform, conn_on_parent, conn_to_parent) prioritized by field value
+		self.aggregation_queue = AggregationQueue()
+
+		## open frontier of live (part, connection, rule) triples, with the number of aggregated parts already indexed
+		self.frontier = AggregationFrontier()
+		self.frontier_parts_count = 0
+
+		## placement journal, storing a record of the changes caused by each placement (or None if not recorded), indexed by part position
+		self.journal = []
 		
 		## previous aggregated parts
 		self.prev_num = 0
@@ -79,7 +118,7 @@ class Aggregation(object):
 			self.prev_num = len(_prev)
 			for prev_p in _prev:
 				prev_p_copy = prev_p.copy(maintain_parenting=True)
-				prev_p_copy.reset_part(self.rules)
+				prev_p_copy.reset_part(self.rules, self.rules_tables)
 				if prev_p_copy.id is None:
 					prev_p_copy.id = len(self.aggregated_parts)
 				self.aggregated_parts.append(prev_p_copy)
@@ -94,6 +133,8 @@ class Aggregation(object):
 		
 		## global constraints applied to the aggregation
 		self.global_constraints = _global_constraints
+		## optional adaptive ordering of the constraint checks (see set_adaptive_checks)
+		self.constraint_scheduler = None
 		
 		## random seed
 		self.rnd_seed = None
@@ -155,7 +196,7 @@ class Aggregation(object):
 		if len(data['aggregated_parts']) > 0:
 			for p_id in data['aggregated_parts_sequence']:
 				aggr_part_data = data['aggregated_parts'][str(p_id)]
-				if aggr_part_data.has_key('geometry'):
+				if 'geometry' in aggr_part_data:
 					if aggr_part_data['class_type'] == 'Part':
 						d_aggregated_parts.append(Part.from_data(aggr_part_data))
 					elif aggr_part_data['class_type'] == 'AdvancedPart':
@@ -175,6 +216,7 @@ class Aggregation(object):
 							d_aggregated_parts.append(AdvancedPart.from_data(aggr_part_data, base_part=base_part))
 		
 		aggregation.aggregated_parts = d_aggregated_parts
+		aggregation.rebuild_spatial_index()
 
 		aggregation.graph = Graph.from_data(data['graph'])
 
@@ -230,8 +272,36 @@ class Aggregation(object):
 			for part in new_parts:
 				self.parts[part.name] = part
 		
+		## rules tables, compiled only when the rules change and shared by all parts
+		if self.rules_tables is None or not self.rules_tables.matches(self.rules):
+			self.rules_tables = RulesTables(self.rules)
+		
 		for p_key in self.parts:
-			self.parts[p_key].reset_part(self.rules)
+			self.parts[p_key].reset_part(self.rules, self.rules_tables)
+		
+		## transformations from each base part connection (flipped) to the world XY plane,
+		## used to place a part on any connection plane with a single matrix product
+		self.rule_transforms = {}
+		for part in self.parts.values():
+			for conn in part.connections:
+				self.rule_transforms[(part.name, conn.id)] = Transform.PlaneToPlane(conn.flip_pln, Plane.WorldXY)
+		
+		## base parts might have changed, discard cached collision results
+		## (radii bound the distance of each base part collider from the world origin, to quantize relative poses)
+		self.collision_radii = {}
+		for part in self.parts.values():
+			self.collision_radii[part.name] = part.center.DistanceTo(Point3d(0,0,0)) + part.dim
+		if self.collision_cache is not None:
+			self.collision_cache.clear()
+		
+		## part sizes might have changed, update the spatial index cells
+		if new_parts != None:
+			self.rebuild_spatial_index()
+
+
+	## return the transformation placing part_name (by its connection conn_id) on the given connection of an aggregated part
+	def return_rule_transform(self, conn, part_name, conn_id):
+		return Transform.Multiply(conn.return_frame(), self.rule_transforms[(part_name, conn_id)])
 
 
 	## reset rules and regenerate rule tables for each part
@@ -240,22 +310,310 @@ class Aggregation(object):
 		self.reset_base_parts()
 		
 		for part in self.aggregated_parts:
-			part.reset_part(rules)
+			part.reset_part(rules, self.rules_tables)
+		self.part_store.rebuild(self.aggregated_parts)
+		self.rebuild_frontier()
+		self.reset_journal()
+	
+
+	## rebuild all structures indexed by position in the aggregated parts list (spatial indexes, part store, occupancy grid, frontier and journal)
+	## to be called after aggregated parts are removed, replaced or transformed outside of the aggregation methods
+	def rebuild_indexes(self):
+		self.rebuild_spatial_index()
+		self.rebuild_frontier()
+		self.reset_journal()
+	
+
+	## rebuild the spatial indexes of aggregated parts, with cell size computed from the base parts sizes
+	def rebuild_spatial_index(self):
+		self.spatial_index = SpatialHash(SpatialHash.cell_size_from_dims([part.dim for part in self.parts.values()]))
+		self.collider_tree = AABBTree()
+		self.collider_leaves = []
+		self.exclusion_tree = AABBTree()
+		self.exclusion_leaves = []
+		self.part_store.clear()
+		if self.occupancy_grid is not None:
+			self.occupancy_grid.clear()
+		self.materialized_parts = OrderedDict()
+		self.update_spatial_index()
+	
+
+	## sync the spatial indexes with the aggregated parts list (indexed by position in the list)
+	def update_spatial_index(self):
+		index_count = len(self.spatial_index)
+		parts_count = len(self.aggregated_parts)
+		for i in range(parts_count, index_count):
+			self.spatial_index.remove(i)
+			for leaf in self.collider_leaves[i]:
+				self.collider_tree.remove(leaf)
+			for leaf in self.exclusion_leaves[i]:
+				self.exclusion_tree.remove(leaf)
+		del self.collider_leaves[parts_count:]
+		del self.exclusion_leaves[parts_count:]
+		for i in range(index_count, parts_count):
+			part = self.aggregated_parts[i]
+			self.spatial_index.insert(i, part.center, part.dim)
+			self.collider_leaves.append([self.collider_tree.insert((i, geo_id), mesh_bounds(part.collider.geometry[geo_id])) for geo_id in range(len(part.collider.geometry))])
+			self.exclusion_leaves.append(self.insert_exclusions(i, part))
+		self.touch_parts(range(index_count, parts_count))
+		self.part_store.update(self.aggregated_parts)
+		if self.occupancy_grid is not None:
+			for i in range(parts_count, len(self.occupancy_grid)):
+				self.occupancy_grid.remove(i)
+			for i in range(len(self.occupancy_grid), parts_count):
+				self.occupancy_grid.insert(i, self.aggregated_parts[i].collider.geometry)
+	
+
+	## mark aggregated parts as recently used, releasing the geometry of the least recently used instanced parts beyond the maximum count
+	def touch_parts(self, ids):
+		for id in ids:
+			self.materialized_parts.pop(id, None)
+			self.materialized_parts[id] = True
+		while len(self.materialized_parts) > self.max_materialized_parts:
+			id, _ = self.materialized_parts.popitem(last=False)
+			if id < len(self.aggregated_parts):
+				self.aggregated_parts[id].release_geometry()
+	
+
+	## release the geometry of all instanced parts which are not among the most recently used ones (to be called after using the geometry of many parts)
+	def release_unused_geometry(self):
+		for i in range(len(self.aggregated_parts)):
+			if i not in self.materialized_parts:
+				self.aggregated_parts[i].release_geometry()
+	
+
+	## add the exclusion lines of an aggregated part to the exclusion tree, and return their leaves
+	def insert_exclusions(self, id, part):
+		leaves = []
+		if part.is_constrained:
+			for const_id in range(len(part.adjacency_const)):
+				adj_const = part.adjacency_const[const_id]
+				if not adj_const.is_adjacency:
+					for dir_id in range(len(adj_const.directions)):
+						start, end = line_segment(adj_const.directions[dir_id])
+						bounds = (min(start[0], end[0]), min(start[1], end[1]), min(start[2], end[2]), max(start[0], end[0]), max(start[1], end[1]), max(start[2], end[2]))
+						leaves.append(self.exclusion_tree.insert((id, const_id, dir_id), bounds))
+		return leaves
+	
+
+	## enable the voxel occupancy grid with the given voxel size (or disable it if None)
+	def set_occupancy_grid(self, voxel_size=None, free_space_samples=1):
+		'''
+		Enables the voxel occupancy grid, used as a fast path for collision checks:
+		candidates crossing only empty cells skip the mesh intersection tests, candidates with a vertex inside a part are rejected,
+		and only parts sharing a cell with the candidate are tested.
+		The grid can also deprioritize blocked connections in random aggregations: several frontier triples are sampled for each placement,
+		and the one with the most free space in front of its connection is tried first.
+
+		Args:
+			voxel_size (float): Size of the grid cells, or None to disable the grid
+			free_space_samples (int): Number of frontier triples sampled for each random placement (1 to sample uniformly)
+		'''
+		self.free_space_samples = max(1, int(free_space_samples))
+		if voxel_size is None:
+			self.occupancy_grid = None
+		else:
+			self.occupancy_grid = OccupancyGrid(voxel_size)
+			self.update_spatial_index()
+	
+
+	## estimate the free space in front of a connection of an aggregated part (fraction of empty cells within the given distance), or None if the grid is disabled
+	## the space is measured around the point at the given distance along the connection plane normal, outside of the part
+	def connection_free_space(self, part_id, conn_id, radius=None):
+		if self.occupancy_grid is None:
+			return None
+		self.update_spatial_index()
+		if radius is None:
+			radius = self.occupancy_grid.voxel_size
+		pln = self.aggregated_parts[part_id].connections[conn_id].pln
+		return self.occupancy_grid.free_space(pln.Origin + pln.ZAxis * radius, radius)
+	
+
+	## rebuild the open frontier from the active connections and rules of all aggregated parts
+	def rebuild_frontier(self):
+		self.frontier.clear()
+		self.frontier_parts_count = 0
+		self.update_frontier()
+	
+
+	## add the parts appended since the last update to the open frontier (indexed by position in the list)
+	def update_frontier(self):
+		if self.frontier_parts_count > len(self.aggregated_parts):
+			self.rebuild_frontier()
+			return
+		for i in range(self.frontier_parts_count, len(self.aggregated_parts)):
+			self.frontier.add_part(i, self.aggregated_parts[i])
+		self.frontier_parts_count = len(self.aggregated_parts)
+	
+
+	## deactivate a connection of an aggregated part
+	def deactivate_connection(self, part_id, conn_id):
+		part = self.aggregated_parts[part_id]
+		if part.active_connections_mask >> conn_id & 1:
+			if part_id < self.frontier_parts_count:
+				self.frontier.discard_connection(part_id, part, conn_id)
+			part.active_connections_mask &= ~(1 << conn_id)
+			if part_id < len(self.part_store):
+				self.part_store.update_mask(part_id, part)
+			record = self.current_record()
+			if record is not None:
+				record.deactivated.append((part_id, conn_id))
+	
+
+	## deactivate a rule of a connection of an aggregated part, and the connection itself if no active rule is left
+	def deactivate_rule(self, part_id, conn_id, rule_id):
+		part = self.aggregated_parts[part_id]
+		conn = part.connections[conn_id]
+		if conn.active_rules_mask >> rule_id & 1:
+			if part_id < self.frontier_parts_count:
+				self.frontier.discard(part_id, conn_id, rule_id, conn.rules_table[rule_id].part2)
+			conn.active_rules_mask &= ~(1 << rule_id)
+			record = self.current_record()
+			if record is not None:
+				record.deactivated.append((part_id, conn_id, rule_id))
+		if conn.active_rules_mask == 0:
+			self.deactivate_connection(part_id, conn_id)
+	
+
+	## return a random live (part, connection, rule) triple from the open frontier, optionally only among rules placing the given part name
+	def sample_frontier(self, part_name=None):
+		self.update_frontier()
+		while True:
+			triple = self.frontier.sample(part_name)
+			if triple is None:
+				return None
+			## discard triples deactivated outside of the aggregation methods
+			part_id, conn_id, rule_id = triple
+			part = self.aggregated_parts[part_id]
+			if part.active_connections_mask >> conn_id & 1 and part.connections[conn_id].active_rules_mask >> rule_id & 1:
+				return triple
+			self.frontier.discard(part_id, conn_id, rule_id, part.connections[conn_id].rules_table[rule_id].part2)
+	
+
+	## sample live triples from the open frontier, returning the one with the most free space in front of its connection
+	## (a single uniform sample if the occupancy grid is disabled or only one sample is required)
+	def sample_frontier_w_free_space(self, part_name=None):
+		triple = self.sample_frontier(part_name)
+		if triple is None or self.occupancy_grid is None or self.free_space_samples <= 1:
+			return triple
+		best_free_space = self.connection_free_space(triple[0], triple[1])
+		for i in range(self.free_space_samples - 1):
+			if best_free_space >= 1.0:
+				break
+			other_triple = self.sample_frontier(part_name)
+			free_space = self.connection_free_space(other_triple[0], other_triple[1])
+			if free_space > best_free_space:
+				triple = other_triple
+				best_free_space = free_space
+		return triple
+	
+
+	## reactivate a connection of an aggregated part
+	def reactivate_connection(self, part_id, conn_id):
+		part = self.aggregated_parts[part_id]
+		if not part.active_connections_mask >> conn_id & 1:
+			part.active_connections_mask |= 1 << conn_id
+			if part_id < len(self.part_store):
+				self.part_store.update_mask(part_id, part)
+			if part_id < self.frontier_parts_count:
+				self.frontier.add_connection(part_id, part, conn_id)
+	
+
+	## reactivate a rule of a connection of an aggregated part
+	def reactivate_rule(self, part_id, conn_id, rule_id):
+		part = self.aggregated_parts[part_id]
+		conn = part.connections[conn_id]
+		if not conn.active_rules_mask >> rule_id & 1:
+			conn.active_rules_mask |= 1 << rule_id
+			if part_id < self.frontier_parts_count and part.active_connections_mask >> conn_id & 1:
+				self.frontier.add(part_id, conn_id, rule_id, conn.rules_table[rule_id].part2)
+	
+
+	#### placement journal ####
+	## discard all placement records (parts placed so far can only be removed with a full reset)
+	def reset_journal(self):
+		self.journal = [None] * len(self.aggregated_parts)
+	
+
+	## start the record of a part just appended to the aggregated parts list
+	def start_record(self, parent_id=None):
+		part_id = len(self.aggregated_parts) - 1
+		del self.journal[part_id:]
+		self.journal.extend([None] * (part_id - len(self.journal)))
+		record = PlacementRecord(part_id, parent_id)
+		self.journal.append(record)
+		return record
+	
+
+	## return the record of the last placed part, or None if not recorded
+	def current_record(self):
+		if len(self.journal) > 0 and len(self.journal) == len(self.aggregated_parts):
+			return self.journal[-1]
+		return None
+	
+
+	## undo the placements of all parts after the given number, replaying their records in reverse
+	def undo_placements(self, num):
+		for i in range(len(self.aggregated_parts)-1, num-1, -1):
+			record = self.journal[i]
+			part = self.aggregated_parts[i]
+
+			## reactivate connections and rules
+			for change in reversed(record.deactivated):
+				if len(change) == 2:
+					self.reactivate_connection(change[0], change[1])
+				else:
+					self.reactivate_rule(change[0], change[1], change[2])
+
+			## remove queue entries added, and add back entries removed (if their parent is not being removed as well)
+			for entry in record.queue_pushed:
+				self.aggregation_queue.invalidate(entry)
+			for entry in reversed(record.queue_popped):
+				if entry[2][1] < num:
+					self.aggregation_queue.restore(entry)
+
+			## update the catalog by adding back the removed part
+			if record.catalog_name is not None:
+				self.catalog.update(record.catalog_name, 1)
+
+			## remove item from graph and parent
+			if record.parent_id is not None:
+				parent = self.aggregated_parts[record.parent_id]
+				self.graph.remove_node(part.id, in_nodes=[parent.id])
+				if len(parent.children) > 0 and parent.children[-1] == part.id:
+					parent.children.pop()
+			else:
+				self.graph.remove_node(part.id, in_nodes=[])
+
+			## remove item from the open frontier
+			if i < self.frontier_parts_count:
+				self.frontier.discard_part(i, part)
+
+		del self.aggregated_parts[num:]
+		del self.journal[num:]
+		self.frontier_parts_count = min(self.frontier_parts_count, num)
 	
 
 	## recompute aggregation queue
 	def recompute_aggregation_queue(self):
-		self.aggregation_queue = []
-		self.queue_values = []
-		self.queue_count = 0
+		self.aggregation_queue.clear()
 		for part in self.aggregated_parts:
 			self.compute_next_w_field(part)
+		## queue entries stored in the placement records are not valid anymore
+		self.reset_journal()
 	
 
 	## trim aggregated parts list to a specific length
 	def remove_elements(self, num):
 
 		self.removed_parts = self.aggregated_parts[num:]
+		
+		## if all removed parts have been recorded, undo only their placements
+		if len(self.journal) == len(self.aggregated_parts) and None not in self.journal[num:]:
+			self.undo_placements(num)
+			self.update_spatial_index()
+			return
+
 		for p in self.removed_parts:
 			## remove item from graph
 			self.graph.remove_node(p.id)
@@ -266,10 +624,13 @@ class Aggregation(object):
 
 		## trim the list to the desired length
 		self.aggregated_parts = self.aggregated_parts[:num]
+		self.update_spatial_index()
 
 		## reset the remaining parts (reactivate all connections, who might have been blocked by removed parts)
 		for part in self.aggregated_parts:
-			part.reset_part(self.rules)
+			part.reset_part(self.rules, self.rules_tables)
+		self.part_store.rebuild(self.aggregated_parts)
+		self.rebuild_frontier()
 		
 		## if using a field, recompute the whole aggregation queue
 		if self.field is not None:
@@ -282,13 +643,13 @@ class Aggregation(object):
 		possible_children = []
 		current_part = self.aggregated_parts[part_id]
 		
-		if conn_id in current_part.active_connections:
+		if current_part.active_connections_mask >> conn_id & 1:
 			current_conn = current_part.connections[conn_id]
 			for rule_id in current_conn.active_rules:
 				rule = current_conn.rules_table[rule_id]
 				
 				next_part = self.parts[rule.part2]
-				orientTransform = Transform.PlaneToPlane(next_part.connections[rule.conn2].flip_pln, current_conn.pln)
+				orientTransform = self.return_rule_transform(current_conn, rule.part2, rule.conn2)
 				
 				## boolean checks for all constraints
 				global_check = False
@@ -307,88 +668,105 @@ class Aggregation(object):
 	
 	## add a custom pre-computed part which has been already transformed in place and checked for constraints
 	def add_custom_part(self, part_id, conn_id, next_part):
-		next_part.reset_part(self.rules)
+		next_part.reset_part(self.rules, self.rules_tables)
 		next_part.id = len(self.aggregated_parts)
 		
-		self.aggregated_parts[part_id].children.append(next_part)
-		next_part.parent = self.aggregated_parts[part_id]
+		self.aggregated_parts[part_id].children.append(next_part.id)
+		next_part.parent = self.aggregated_parts[part_id].id
 		self.aggregated_parts.append(next_part)
 		
-		for i in range(len(self.aggregated_parts[part_id].active_connections)):
-			if self.aggregated_parts[part_id].active_connections[i] == conn_id:
-				self.aggregated_parts[part_id].active_connections.pop(i)
-				break
+		self.deactivate_connection(part_id, conn_id)
 
 	
 	#### constraints checks ####
+	## enable the adaptive ordering of the constraint checks (or disable it, restoring the default order)
+	def set_adaptive_checks(self, enabled=True, warmup=20, explore_interval=50):
+		'''
+		Enables the adaptive ordering of the constraint checks: the cost and rejection rate of each check are recorded for each part type,
+		and the checks are ordered so that cheap and selective checks run first. The placement results are not affected by the order.
+
+		Args:
+			enabled (bool): True to enable the adaptive ordering, False to restore the default order
+			warmup (int): Number of candidates of each part type running all checks in the default order
+			explore_interval (int): Interval of the candidates running all checks after the warmup
+		'''
+		if enabled:
+			self.constraint_scheduler = ConstraintScheduler(warmup, explore_interval)
+		else:
+			self.constraint_scheduler = None
+	
+
+	## return a report of the order of the constraint checks chosen for each part type, or None if the adaptive ordering is disabled
+	def constraint_checks_report(self):
+		if self.constraint_scheduler is None:
+			return None
+		return self.constraint_scheduler.report()
+	
+
+	## return the names of the constraint checks applied to a part in the current mode, in their default order
+	def constraint_checks(self, part):
+		checks = ['collision']
+		if (self.mode == 2 or self.mode == 3) and len(self.global_constraints) > 0:
+			checks.append('global')
+		if (self.mode == 1 or self.mode == 3) and part.is_constrained:
+			checks.extend(['additional_collider', 'supports', 'adjacencies', 'exclusions', 'orientation'])
+		return checks
+	
+
 	## function grouping all collsion and constraints checks
+	## checks run in their default order (or in the order chosen by the constraint scheduler) until one of them fails
 	def check_all_constraints(self, part, trans):
 		
 		## boolean checks for all constraints
-		coll_check = False
-		add_coll_check = False
-		missing_sup_check = False
-		adjacencies_check = False
-		exclusions_back_check = False
-		orientation_check = False
-		global_const_check = False
+		results = {'collision': False, 'global': False, 'additional_collider': False, 'supports': False, 'adjacencies': False, 'exclusions': False, 'orientation': False}
+
+		checks = self.constraint_checks(part)
+		explore = False
+		if self.constraint_scheduler is not None:
+			explore = self.constraint_scheduler.start_evaluation(part.name)
+			checks = self.constraint_scheduler.order(part.name, checks)
 
 		## variables to store already computed colliders
 		part_center_trans = None
 		part_collider_trans = None
 
-		## check overlaps/collisions with previously placed parts
-		coll_check, part_center_trans, part_collider_trans = self.collision_check(part, trans)
-
-		if coll_check == False:
-			## check constraints
-			## only local constraints mode
-			if self.mode == 1:
-				if part.is_constrained:
-					add_coll_check = self.additional_collider_check(part, trans)
-					
-					if not add_coll_check:
-						missing_sup_check = self.missing_supports_check(part, trans)
-
-						if not missing_sup_check:
-							adjacencies_check = self.adjacencies_check(part, trans)
-
-							if not adjacencies_check:
-								exclusions_back_check = self.exclusions_back_check(part, trans)
-
-								if not exclusions_back_check:
-									orientation_check = self.orientation_check(part, trans)
-
-			
-			## onyl global constraints mode
-			elif self.mode == 2:
-				if len(self.global_constraints) > 0:
-					global_const_check = self.global_constraints_check(part, trans, part_center_trans, part_collider_trans)
-			
-			## local+global constraints mode
-			elif self.mode == 3:
-				if len(self.global_constraints) > 0:
-					global_const_check = self.global_constraints_check(part, trans, part_center_trans, part_collider_trans)
-				
-				if not global_const_check and part.is_constrained:
-					add_coll_check = self.additional_collider_check(part, trans)
-					
-					if not add_coll_check:
-						missing_sup_check = self.missing_supports_check(part, trans)
-						
-						if not missing_sup_check:
-							adjacencies_check = self.adjacencies_check(part, trans)
-							
-							if not adjacencies_check:
-								exclusions_back_check = self.exclusions_back_check(part, trans)
-
-								if not exclusions_back_check:
-									orientation_check = self.orientation_check(part, trans)
+		rejected = False
+		for check_name in checks:
+			## when recording statistics for the scheduler, the remaining checks are run also after a failed check
+			if rejected and not explore:
+				break
+			## checks relying on the nearby parts found by the collision check are skipped if it failed
+			if check_name in COLLISION_DEPENDENT_CHECKS and results['collision']:
+				continue
+
+			if self.constraint_scheduler is not None:
+				start_time = timer()
+
+			## check overlaps/collisions with previously placed parts
+			if check_name == 'collision':
+				result, center, collider = self.collision_check(part, trans, part_center_trans, part_collider_trans)
+				if not result:
+					part_center_trans, part_collider_trans = center, collider
+			elif check_name == 'global':
+				result = self.global_constraints_check(part, trans, part_center_trans, part_collider_trans)
+			elif check_name == 'additional_collider':
+				result = self.additional_collider_check(part, trans)
+			elif check_name == 'supports':
+				result = self.missing_supports_check(part, trans)
+			elif check_name == 'adjacencies':
+				result = self.adjacencies_check(part, trans)
+			elif check_name == 'exclusions':
+				result = self.exclusions_back_check(part, trans, part_collider_trans)
+			elif check_name == 'orientation':
+				result = self.orientation_check(part, trans)
+
+			if self.constraint_scheduler is not None:
+				self.constraint_scheduler.record(part.name, check_name, timer() - start_time, result)
+			results[check_name] = result
+			rejected = rejected or result
 
 		## combine all constraints check result
-		global_check = coll_check or add_coll_check or missing_sup_check or global_const_check or adjacencies_check or exclusions_back_check or orientation_check
-
-		return global_check, coll_check, add_coll_check, missing_sup_check, global_const_check, adjacencies_check, exclusions_back_check, orientation_check
+		return rejected, results['collision'], results['additional_collider'], results['supports'], results['global'], results['adjacencies'], results['exclusions'], results['orientation']
 
 	
 	## overlap // part-part collision check
@@ -398,36 +776,74 @@ class Aggregation(object):
 		if part_center is None:
 			part_center = part.transform_center(trans)
 		
-		## overlap check
-		coll_count = 0
-		for ex_part in self.aggregated_parts:
-			dist = ex_part.center.DistanceTo(part_center)
+		## overlap check (only on parts in neighbouring cells of the spatial index)
+		self.update_spatial_index()
+		for ex_id in self.spatial_index.query(part_center, part.dim):
+			dist = self.part_store.distance_to(ex_id, part_center)
 
 			## if part centers overlap, return
 			if dist < global_tolerance:
 				return True, None, None
 				
 			## if not, check if the part is within collision range
-			elif dist < ex_part.dim + part.dim:
-				self.possible_collisions.append(coll_count)
-			
-			coll_count += 1
+			elif dist < self.part_store.dims[ex_id] + part.dim:
+				self.possible_collisions.append(ex_id)
+		self.touch_parts(self.possible_collisions)
 		
 		## check collisions with parts in range
 		if self.coll_check == True:
 			if part_collider is None:
 				part_collider = part.transform_collider(trans)
-			if part_collider.check_collisions_by_id(self.aggregated_parts, self.possible_collisions):
+			
+			## occupancy grid fast path, restricting mesh tests to parts sharing cells with the collider
+			collision_ids = self.possible_collisions
+			if self.occupancy_grid is not None and not part_collider.multiple:
+				grid_ids = set()
+				for geo in part_collider.geometry:
+					state, ids = self.occupancy_grid.check_mesh(geo)
+					if state == 1:
+						return True, None, None
+					grid_ids.update(ids)
+				collision_ids = [id for id in self.possible_collisions if id in grid_ids]
+			
+			pose_keys = {}
+			if self.collision_cache is not None:
+				pose_keys = self.collision_pose_keys(part, trans, collision_ids)
+			if part_collider.check_collisions_by_id(self.aggregated_parts, collision_ids, self.collider_tree, self.collision_cache, pose_keys):
 				return True, None, None
 		
 		return False, part_center, part_collider
 	
+
+	## return the keys of the poses of a base part placed with the given transformation, relative to the given aggregated parts
+	## (only instances of the current base parts can be cached, as their colliders are transformed copies of the base parts colliders)
+	def collision_pose_keys(self, part, trans, ids):
+		pose_keys = {}
+		if self.parts.get(part.name) is not part:
+			return pose_keys
+		for id in ids:
+			ex_part = self.aggregated_parts[id]
+			if ex_part.base_part is not None and ex_part.base_part is self.parts.get(ex_part.name):
+				ex_inverse = ex_part.return_base_inverse()
+				if ex_inverse is not None:
+					radius = max(self.collision_radii[part.name], self.collision_radii[ex_part.name])
+					pose_keys[id] = self.collision_cache.pose_key(part.name, ex_part.name, Transform.Multiply(ex_inverse, trans), radius)
+		return pose_keys
+	
 	
 	## additional collider check
 	def additional_collider_check(self, part, trans):
 		if part.add_collider != None:
 			add_collider = part.add_collider.transform(trans, transform_connections=True, maintain_valid = False)
-			if add_collider.check_collisions_w_parts(self.aggregated_parts):
+			## only parts with colliders overlapping the bounding box of the additional collider are checked
+			self.update_spatial_index()
+			ids = set()
+			for geo in add_collider.geometry:
+				ids.update([leaf[0] for leaf in self.collider_tree.query(mesh_bounds(geo))])
+			ids = sorted(ids)
+			add_collision = add_collider.check_collisions_w_parts([self.aggregated_parts[id] for id in ids])
+			self.touch_parts(ids)
+			if add_collision:
 				return True
 			## assign computed valid connections according to collider location
 			part.add_collider.valid_connections = list(add_collider.valid_connections)
@@ -440,11 +856,9 @@ class Aggregation(object):
 			for sup in part.supports:
 				supports_count = 0
 				sup_trans = sup.transform(trans)
-				for dir in sup_trans.sup_dir:
-					for id in self.possible_collisions:
-						if self.aggregated_parts[id].collider.check_intersection_w_line(dir):
-							supports_count += 1
-							break
+				for hit in lines_hit_parts(sup_trans.sup_dir, self.aggregated_parts, self.possible_collisions, self.collider_tree):
+					if hit:
+						supports_count += 1
 				if supports_count == len(sup_trans.sup_dir):
 					return False
 			return True
@@ -457,7 +871,7 @@ class Aggregation(object):
 		if len(part.adjacency_const) > 0:
 			for aec in part.adjacency_const:
 				aec_trans = aec.transform(trans)
-				if not aec_trans.check(self.aggregated_parts, self.possible_collisions):
+				if not aec_trans.check(self.aggregated_parts, self.possible_collisions, self.collider_tree):
 					return True
 			return False
 		else:
@@ -465,17 +879,23 @@ class Aggregation(object):
 	
 
 	## back-checking exclusions on already placed parts
-	def exclusions_back_check(self, part, trans):
-		part_trans = None
-		for id in self.possible_collisions:
-			if self.aggregated_parts[id].is_constrained:
-				if len(self.aggregated_parts[id].adjacency_const) > 0:
-					for adj_const in self.aggregated_parts[id].adjacency_const:
-						if not adj_const.is_adjacency:
-							if part_trans is None:
-								part_trans = part.transform(trans)
-							if not adj_const.check_single(part_trans):
-								return True
+	## only exclusion lines of nearby parts crossing the bounding box of the transformed collider are tested, against the collider itself
+	def exclusions_back_check(self, part, trans, part_collider=None):
+		if len(self.exclusion_tree) == 0:
+			return False
+		if part_collider is None:
+			part_collider = part.transform_collider(trans)
+		possible_ids = set(self.possible_collisions)
+		for geo in part_collider.geometry:
+			bounds = mesh_bounds(geo)
+			for id, const_id, dir_id in self.exclusion_tree.query(bounds):
+				if id in possible_ids:
+					adj_const = self.aggregated_parts[id].adjacency_const[const_id]
+					if adj_const.name_independent or part.name == adj_const.names[dir_id]:
+						ln = adj_const.directions[dir_id]
+						start, end = line_segment(ln)
+						if segment_overlaps_bounds(start, end, bounds, global_tolerance) and part_collider.check_intersection_w_line(ln):
+							return True
 		return False
 
 
@@ -483,8 +903,7 @@ class Aggregation(object):
 	def orientation_check(self, part, trans):
 		if len(part.orientation_const) > 0:
 			for oc in part.orientation_const:
-				oc_trans = oc.transform(trans)
-				if not oc_trans.check():
+				if not oc.check_transform(trans):
 					return True
 			return False
 		else:
@@ -524,23 +943,68 @@ class Aggregation(object):
 		return False
 	
 	
+	## check a batch of candidate centers against the soft global constraints, returning False for candidates which would be rejected by them
+	## only constraints with a cheap batch check are used: plane constraints, and mesh constraints with a classification grid or a distance field
+	## (optional constraints are only checked in advance if they all qualify, the others are left to global_constraints_check)
+	def soft_constraints_batch_check(self, centers, names):
+		valid = [True] * len(centers)
+		if len(centers) == 0 or not ((self.mode == 2 or self.mode == 3) and len(self.global_constraints) > 0):
+			return valid
+
+		def batch_checkable(constraint):
+			return constraint.soft and (constraint.type == 'plane' or constraint.grid is not None or constraint.sdf is not None)
+
+		optional_constraints = [constraint for constraint in self.global_constraints if not constraint.required]
+		check_optional = len(optional_constraints) > 0 and all([batch_checkable(constraint) for constraint in optional_constraints])
+		valid_optional = [False] * len(centers)
+		for constraint in self.global_constraints:
+			if not batch_checkable(constraint) or (not constraint.required and not check_optional):
+				continue
+			results = constraint.check_batch(centers, names)
+			if constraint.required:
+				valid = [valid[i] and results[i] for i in range(len(centers))]
+			else:
+				valid_optional = [valid_optional[i] or results[i] for i in range(len(centers))]
+		if check_optional:
+			valid = [valid[i] and valid_optional[i] for i in range(len(centers))]
+		return valid
+	
+	
 	## check all connections for validity against the give constraints
 	def check_all_connections(self):
-		for part in self.aggregated_parts:
-			if len(part.active_connections) > 0:
+		for part_id in range(len(self.aggregated_parts)):
+			part = self.aggregated_parts[part_id]
+			if part.active_connections_mask != 0:
 				for conn_id in part.active_connections:
 					conn = part.connections[conn_id]
-					if len(conn.active_rules) > 0:
+					if conn.active_rules_mask != 0:
 						for rule_id in conn.active_rules:
 							next_rule = conn.rules_table[rule_id]
 
 							next_part = self.parts[next_rule.part2]
-							orientTransform = Transform.PlaneToPlane(next_part.connections[next_rule.conn2].flip_pln, conn.pln)
+							orientTransform = self.return_rule_transform(conn, next_rule.part2, next_rule.conn2)
 							coll_check, _, _ = self.collision_check(next_part, orientTransform)
 							if coll_check:
-								conn.active_rules.remove(rule_id)
-								if len(conn.active_rules) == 0: 
-									part.active_connections.remove(conn_id)
+								self.deactivate_rule(part_id, conn_id, rule_id)
+	
+
+	## deactivate all rules placing parts in an orientation not allowed by their orientation constraints
+	## (the orientation of the part placed by a rule never changes, so these rules can be removed from the open frontier at once)
+	def check_all_orientations(self):
+		for part_id in range(len(self.aggregated_parts)):
+			part = self.aggregated_parts[part_id]
+			if part.active_connections_mask != 0:
+				for conn_id in part.active_connections:
+					conn = part.connections[conn_id]
+					if conn.active_rules_mask != 0:
+						for rule_id in conn.active_rules:
+							next_rule = conn.rules_table[rule_id]
+
+							next_part = self.parts[next_rule.part2]
+							if next_part.is_constrained and len(next_part.orientation_const) > 0:
+								orientTransform = self.return_rule_transform(conn, next_rule.part2, next_rule.conn2)
+								if self.orientation_check(next_part, orientTransform):
+									self.deactivate_rule(part_id, conn_id, rule_id)
 	
 
 	## check all connections of a given part for occlusion from other parts
@@ -551,10 +1015,14 @@ class Aggregation(object):
 			for i in range(len(part.connections)):
 				connection_matrix.append(i)
 
-			for i in range(len(part.connections)):
-				conn = part.connections[i]
-				for other_part in self.aggregated_parts:
-					if other_part.id != part.id:
+			## parts are visited one at a time, so that the geometry of each instanced part is materialized only once
+			for other_id in range(len(self.aggregated_parts)):
+				if len(connection_matrix) == 0:
+					break
+				other_part = self.aggregated_parts[other_id]
+				if other_part.id != part.id:
+					for i in list(connection_matrix):
+						conn = part.connections[i]
 						if connections_only:
 							for other_conn in other_part.connections:
 								if conn.pln.Origin.DistanceTo(other_conn.pln.Origin) < global_tolerance:
@@ -564,7 +1032,8 @@ class Aggregation(object):
 							conn_cp = other_part.geo.ClosestPoint(conn.pln.Origin)
 							if conn.pln.Origin.DistanceTo(conn_cp) < global_tolerance:
 								connection_matrix.remove(i)
-								break
+					if not connections_only:
+						self.touch_parts([other_id])
 		
 		else:
 			for i in range(len(part.connections)):
@@ -606,7 +1075,7 @@ class Aggregation(object):
 				
 				next_part = self.parts[part2]
 				
-				orientTransform = Transform.PlaneToPlane(next_part.connections[conn2].flip_pln, first_part.connections[conn1].pln)
+				orientTransform = self.return_rule_transform(first_part.connections[conn1], part2, conn2)
 				
 				next_part_trans = next_part.transform(orientTransform)
 
@@ -662,7 +1131,7 @@ class Aggregation(object):
 					first_part.id = rule_ids[0]
 					next_part = self.parts[part2]
 					
-					orientTransform = Transform.PlaneToPlane(next_part.connections[conn2].flip_pln, first_part.connections[conn1].pln)
+					orientTransform = self.return_rule_transform(first_part.connections[conn1], part2, conn2)
 					next_part_trans = next_part.transform(orientTransform)
 					next_part_trans.id = rule_ids[1]
 
@@ -709,10 +1178,11 @@ class Aggregation(object):
 				if first_part is not None:
 					first_part_trans = first_part.transform(Transform.Identity)
 					for conn in first_part_trans.connections:
-						conn.generate_rules_table(self.rules)
+						conn.generate_rules_table(self.rules, self.rules_tables)
 					
 					first_part_trans.id = 0
 					self.aggregated_parts.append(first_part_trans)
+					record = self.start_record()
 
 					## add data to graph
 					self.graph.add_node(first_part_trans.id)
@@ -720,6 +1190,7 @@ class Aggregation(object):
 					added += 1
 					if use_catalog and self.catalog is not None:
 						self.catalog.update(first_part_trans.name, -1)
+						record.catalog_name = first_part_trans.name
 			
 			## otherwise add new random part
 			else:
@@ -727,52 +1198,34 @@ class Aggregation(object):
 				part_01_id = -1
 				conn_01_id = -1
 				next_rule_id = -1
-				new_rule_attempts = 0
 				
-				while new_rule_attempts < 10000:
-					new_rule_attempts += 1
-					next_rule = None
-					if use_catalog and self.catalog is not None:
-						if self.catalog.is_limited and self.catalog.is_empty:
-							break
-						next_part = self.parts[self.catalog.return_weighted_part()]
-						if next_part is not None:
-							part_01_id = random.randint(0,len(self.aggregated_parts)-1)
-							part_01 = self.aggregated_parts[part_01_id]
-							if len(part_01.active_connections) > 0:
-								conn_01_id = part_01.active_connections[random.randint(0, len(part_01.active_connections)-1)]
-								conn_01 = part_01.connections[conn_01_id]
-								if len(conn_01.active_rules) > 0:
-									next_rule_id = conn_01.active_rules[random.randint(0, len(conn_01.active_rules)-1)]
-									next_rule = conn_01.rules_table[next_rule_id]
-									if next_rule.part2 == next_part.name:
-										break
-									else:
-										next_rule = None
-					else:
-						part_01_id = random.randint(0,len(self.aggregated_parts)-1)
-						part_01 = self.aggregated_parts[part_01_id]
-						if len(part_01.active_connections) > 0:
-							conn_01_id = part_01.active_connections[random.randint(0, len(part_01.active_connections)-1)]
-							conn_01 = part_01.connections[conn_01_id]
-							if len(conn_01.active_rules) > 0:
-								next_rule_id = conn_01.active_rules[random.randint(0, len(conn_01.active_rules)-1)]
-								next_rule = conn_01.rules_table[next_rule_id]
-								break
+				## sample a live (part, connection, rule) triple from the open frontier
+				next_triple = None
+				if use_catalog and self.catalog is not None:
+					if not (self.catalog.is_limited and self.catalog.is_empty):
+						self.update_frontier()
+						## draw only among part types which can be placed by at least one live rule
+						next_part_name = self.catalog.return_weighted_part(self.frontier.part_names())
+						if next_part_name is not None:
+							next_triple = self.sample_frontier_w_free_space(next_part_name)
+				else:
+					next_triple = self.sample_frontier_w_free_space()
+				
+				if next_triple is not None:
+					part_01_id, conn_01_id, next_rule_id = next_triple
+					conn_01 = self.aggregated_parts[part_01_id].connections[conn_01_id]
+					next_rule = conn_01.rules_table[next_rule_id]
 				
 				if next_rule is not None:
 					next_part = self.parts[next_rule.part2]
-					orientTransform = Transform.PlaneToPlane(next_part.connections[next_rule.conn2].flip_pln, conn_01.pln)
+					orientTransform = self.return_rule_transform(conn_01, next_rule.part2, next_rule.conn2)
 					
 					global_check, coll_check, add_coll_check, missing_sup_check, global_const_check, adjacencies_check, exclusions_back_check, orientation_check = self.check_all_constraints(next_part, orientTransform)
 					
 					if not global_check:
 						next_part_trans = next_part.transform(orientTransform)
-						next_part_trans.reset_part(self.rules)
-						for i in range(len(next_part_trans.active_connections)):
-							if next_part_trans.active_connections[i] == next_rule.conn2:
-								next_part_trans.active_connections.pop(i)
-								break
+						next_part_trans.reset_part(self.rules, self.rules_tables)
+						next_part_trans.active_connections_mask &= ~(1 << next_rule.conn2)
 						next_part_trans.id = len(self.aggregated_parts)
 						
 						## parent-child tracking
@@ -783,6 +1236,7 @@ class Aggregation(object):
 						
 						## add part to aggregated_parts list
 						self.aggregated_parts.append(next_part_trans)
+						record = self.start_record(part_01_id)
 
 						## add data to graph
 						self.graph.add_node(next_part_trans.id)
@@ -791,25 +1245,14 @@ class Aggregation(object):
 						## update catalog if using one
 						if use_catalog and self.catalog is not None:
 							self.catalog.update(next_part_trans.name, -1)
+							record.catalog_name = next_part_trans.name
 						
-						for i in range(len(self.aggregated_parts[part_01_id].active_connections)):
-							if self.aggregated_parts[part_01_id].active_connections[i] == conn_01_id:
-								self.aggregated_parts[part_01_id].active_connections.pop(i)
-								break
+						self.deactivate_connection(part_01_id, conn_01_id)
 						added += 1
 					## TO FIX --> do not remove rules when only caused by missing supports
 					else:
-						## remove rules if they cause collisions or overlappings
-						for i in range(len(self.aggregated_parts[part_01_id].connections[conn_01_id].active_rules)):
-							if self.aggregated_parts[part_01_id].connections[conn_01_id].active_rules[i] == next_rule_id:
-								self.aggregated_parts[part_01_id].connections[conn_01_id].active_rules.pop(i)
-								break
-						## check if the connection is still active (still active rules available)
-						if len(self.aggregated_parts[part_01_id].connections[conn_01_id].active_rules) == 0:
-							for i in range(len(self.aggregated_parts[part_01_id].active_connections)):
-								if self.aggregated_parts[part_01_id].active_connections[i] == conn_01_id:
-									self.aggregated_parts[part_01_id].active_connections.pop(i)
-									break
+						## remove rules if they cause collisions or overlappings (and the connection, if no active rule is left)
+						self.deactivate_rule(part_01_id, conn_01_id, next_rule_id)
 				else:
 					## if no part is available, exit the aggregation routine and return an error message
 					msg = "Could not place " + str(num-added) + " parts"
@@ -817,43 +1260,41 @@ class Aggregation(object):
 	
 	
 	## compute all possibilities for child-parts of the given part, and store them in the aggregation queue
-	def compute_next_w_field(self, part):
+	## if a placement record is given, the new queue entries are stored in it
+	def compute_next_w_field(self, part, record=None):
 		
-		for i in range(len(part.active_connections)-1, -1, -1):
-			conn_id = part.active_connections[i]
+		## candidates are collected first, to check them against the soft global constraints in a single batch
+		candidates = []
+		for conn_id in reversed(part.active_connections):
 			conn = part.connections[conn_id]
-			for i2 in range(len(conn.active_rules)-1, -1, -1):
-				rule_id = conn.active_rules[i2]
+			for rule_id in reversed(conn.active_rules):
 				rule = conn.rules_table[rule_id]
 				
 				next_part = self.parts[rule.part2]
 				
 				next_center = Point3d(next_part.center)
-				orientTransform = Transform.PlaneToPlane(next_part.connections[rule.conn2].flip_pln, conn.pln)
+				orientTransform = self.return_rule_transform(conn, rule.part2, rule.conn2)
 				next_center.Transform(orientTransform)
 				
 				if self.multiple_fields and isinstance(self.field, dict):
 					f_name = next_part.field
 					if self.field[f_name].bbox.Contains(next_center) == True:
 						field_val = self.field[f_name].return_pt_val(next_center)
-						
-						queue_index = bisect.bisect_left(self.queue_values, field_val)
 						queue_entry = (next_part.name, part.id, orientTransform, rule.conn1, rule.conn2)
-						
-						self.queue_values.insert(queue_index, field_val)
-						self.aggregation_queue.insert(queue_index, queue_entry)
-						self.queue_count += 1
+						candidates.append((field_val, queue_entry, next_center))
 					
 				elif self.field is not None and not isinstance(self.field, dict):
 					if self.field.bbox.Contains(next_center):
 						field_val = self.field.return_pt_val(next_center)
-						
-						queue_index = bisect.bisect_left(self.queue_values, field_val)
 						queue_entry = (next_part.name, part.id, orientTransform, rule.conn1, rule.conn2)
-						
-						self.queue_values.insert(queue_index, field_val)
-						self.aggregation_queue.insert(queue_index, queue_entry)
-						self.queue_count += 1
+						candidates.append((field_val, queue_entry, next_center))
+		
+		valid = self.soft_constraints_batch_check([(c[2].X, c[2].Y, c[2].Z) for c in candidates], [c[1][0] for c in candidates])
+		for i in range(len(candidates)):
+			if valid[i]:
+				entry = self.aggregation_queue.push(candidates[i][0], candidates[i][1])
+				if record is not None:
+					record.queue_pushed.append(entry)
 	
 	
 	## field-driven aggregation
@@ -899,10 +1340,11 @@ class Aggregation(object):
 					first_part_trans = first_part.transform(first_transform)
 					
 					for conn in first_part_trans.connections:
-						conn.generate_rules_table(self.rules)
+						conn.generate_rules_table(self.rules, self.rules_tables)
 					
 					first_part_trans.id = 0
 					self.aggregated_parts.append(first_part_trans)
+					record = self.start_record()
 
 					## add data to graph
 					self.graph.add_node(first_part_trans.id)
@@ -910,47 +1352,42 @@ class Aggregation(object):
 					## update catalog
 					if use_catalog and self.catalog is not None:
 						self.catalog.update(first_part_trans.name, -1)
+						record.catalog_name = first_part_trans.name
 					
 					## compute all possible next parts and append to list
-					self.compute_next_w_field(first_part_trans)
+					self.compute_next_w_field(first_part_trans, record)
 					added += 1
 			
 			else:
 				## if no part is available, exit the aggregation routine and return an error message
-				if self.queue_count == 0:
+				if len(self.aggregation_queue) == 0:
 					msg = "Could not place " + str(num-added) + " parts"
 					return msg
 				
 				next_data = None
-				next_data_id = -1
 				next_part = None
 				next_center = None
 				orientTransform = None
 
 				## choose next part
+				## the chosen candidate is removed from the queue, whether it can be placed or not
+				## TO FIX --> do not remove rules when only caused by missing supports
 				#### with catalog > best in queue of a give type
 				if use_catalog and self.catalog is not None:
 					if self.catalog.is_limited and self.catalog.is_empty:
 						msg = "Could not place " + str(num-added) + " parts. Part Catalog is empty."
 						return msg
 					else:
-						next_part_id = None
-						next_part_attempts = 0
-						###### WIP, could be optimized using a set with all names of parts in the queue
-						while next_part_attempts < 1000:
-							next_part_attempts += 1
-							next_part_id = self.catalog.return_weighted_part()
-							for i in range(self.queue_count-1, -1, -1):
-								if self.aggregation_queue[i][0] == next_part_id:
-									next_data = self.aggregation_queue[i]
-									next_data_id = i
-									break
-							if next_data is not None:
-								break
+						## draw only among part types with at least one candidate in the queue
+						next_part_id = self.catalog.return_weighted_part(self.aggregation_queue.part_names())
+						if next_part_id is not None:
+							next_entry = self.aggregation_queue.pop_entry(next_part_id)
+							next_data = next_entry[2]
 				
-				#### without catalog > last item in the queue
+				#### without catalog > best item in the queue
 				else:
-					next_data = self.aggregation_queue[self.queue_count-1]
+					next_entry = self.aggregation_queue.pop_entry()
+					next_data = next_entry[2]
 
 				if next_data is not None:
 					next_part = self.parts[next_data[0]]
@@ -961,10 +1398,7 @@ class Aggregation(object):
 						
 					if not global_check:
 						next_part_trans = next_part.transform(orientTransform)
-						next_part_trans.reset_part(self.rules)
-						
-						for conn in next_part_trans.connections:
-							conn.generate_rules_table(self.rules)
+						next_part_trans.reset_part(self.rules, self.rules_tables)
 						
 						next_part_trans.id = len(self.aggregated_parts)
 
@@ -976,6 +1410,9 @@ class Aggregation(object):
 						
 						## add part to aggregated_parts list
 						self.aggregated_parts.append(next_part_trans)
+						record = self.start_record(next_data[1])
+						## store the placing entry in the record of the new part, to add it back if the part is removed
+						record.queue_popped.append(next_entry)
 
 						## add data to graph
 						self.graph.add_node(next_part_trans.id)
@@ -984,20 +1421,16 @@ class Aggregation(object):
 						## update catalog if using one
 						if use_catalog:
 							self.catalog.update(next_part_trans.name, -1)
+							record.catalog_name = next_part_trans.name
 						
 						## compute all possible next parts and append to list
-						self.compute_next_w_field(next_part_trans)
+						self.compute_next_w_field(next_part_trans, record)
 						added += 1
-					
-					## TO FIX --> do not remove rules when only caused by missing supports
-					if use_catalog:
-						self.aggregation_queue.pop(next_data_id)
-						self.queue_values.pop(next_data_id)
 					else:
-						self.aggregation_queue.pop()
-						self.queue_values.pop()
-					
-					self.queue_count -=1
+						## store the rejected entry in the record of the last placement, to add it back if that placement is undone
+						record = self.current_record()
+						if record is not None:
+							record.queue_popped.append(next_entry)
 				else:
 					msg = "Could not place " + str(num-added) + " parts"
 					return msg
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Priority queue for field-driven aggregation
+"""
+
+import heapq
+
+
+#################################################################### Aggregation Queue ####################################################################
+class AggregationQueue(object):
+	'''
+	Priority queue of aggregation candidates, implemented as a binary heap with lazy invalidation.
+	Candidates with higher values come first. Among candidates with the same value, the oldest one comes first.
+	Each entry is also stored in a sub-heap of its part name (first item of the candidate data), to retrieve the best candidate of a given type in O(log n).
+
+	Attributes:
+		heap ([]): Heap of entries in the form [-value, insertion count, data, valid]
+		count (int): Number of valid entries in the queue
+		name_heaps ({}): Dictionary mapping part names to the heap of entries of that part
+		name_counts ({}): Dictionary mapping part names to the number of valid entries of that part
+	'''
+
+	## constructor
+	def __init__(self):
+		self.heap = []
+		self.count = 0
+		self.insertion_count = 0
+		self.name_heaps = {}
+		self.name_counts = {}
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspAggregationQueue [size: %s]" % (self.count)
+
+
+	def __len__(self):
+		return self.count
+
+
+	## remove all entries
+	def clear(self):
+		self.heap = []
+		self.count = 0
+		self.insertion_count = 0
+		self.name_heaps = {}
+		self.name_counts = {}
+
+
+	## add a candidate with the given value, and return its entry (to be used for invalidation)
+	def push(self, value, data):
+		entry = [-value, self.insertion_count, data, True]
+		self.insertion_count += 1
+		heapq.heappush(self.heap, entry)
+		self.count += 1
+
+		part_name = data[0]
+		if part_name not in self.name_heaps:
+			self.name_heaps[part_name] = []
+			self.name_counts[part_name] = 0
+		heapq.heappush(self.name_heaps[part_name], entry)
+		self.name_counts[part_name] += 1
+		return entry
+
+
+	## mark an entry as invalid (it will be discarded when reaching the top of the heap)
+	def invalidate(self, entry):
+		if entry[3]:
+			entry[3] = False
+			self.count -= 1
+			self.name_counts[entry[2][0]] -= 1
+
+
+	## invalidate all entries whose data satisfies the given condition
+	def invalidate_where(self, condition):
+		for entry in self.heap:
+			if entry[3] and condition(entry[2]):
+				self.invalidate(entry)
+
+
+	## return the names of all parts with at least one valid candidate in the queue
+	def part_names(self):
+		return [name for name in self.name_counts if self.name_counts[name] > 0]
+
+
+	## return the best valid entry, optionally only among candidates of the given part name
+	def _best_entry(self, part_name=None):
+		if part_name is None:
+			heap = self.heap
+		elif part_name in self.name_heaps:
+			heap = self.name_heaps[part_name]
+		else:
+			return None
+
+		## discard invalid entries from the top of the heap
+		while len(heap) > 0 and not heap[0][3]:
+			heapq.heappop(heap)
+
+		if len(heap) > 0:
+			return heap[0]
+		return None
+
+
+	## return (value, data) of the best candidate without removing it, or None if no candidate is available
+	def peek(self, part_name=None):
+		entry = self._best_entry(part_name)
+		if entry is None:
+			return None
+		return -entry[0], entry[2]
+
+
+	## remove and return (value, data) of the best candidate, or None if no candidate is available
+	def pop(self, part_name=None):
+		entry = self.pop_entry(part_name)
+		if entry is None:
+			return None
+		return -entry[0], entry[2]
+
+
+	## remove and return the entry of the best candidate, or None if no candidate is available
+	def pop_entry(self, part_name=None):
+		entry = self._best_entry(part_name)
+		if entry is None:
+			return None
+		self.invalidate(entry)
+		return entry
+
+
+	## add back a removed entry, keeping its original priority
+	## (if the entry was not discarded from the heaps yet, the duplicate is discarded once the entry is removed again)
+	def restore(self, entry):
+		if not entry[3]:
+			entry[3] = True
+			heapq.heappush(self.heap, entry)
+			heapq.heappush(self.name_heaps[entry[2][0]], entry)
+			self.count += 1
+			self.name_counts[entry[2][0]] += 1
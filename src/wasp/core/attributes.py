@@ -9,9 +9,9 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 Attribute classes and utilities
 """
 
-from Rhino.Geometry import Point3d
-from Rhino.Geometry import Plane
-from Rhino.Geometry import Line
+from wasp.geometry import Point3d
+from wasp.geometry import Plane
+from wasp.geometry import Line
 
 #################################################################### Attribute ####################################################################
 class Attribute(object):
@@ -28,45 +28,33 @@ class Attribute(object):
 	
 	## return a transformed copy of the attribute
 	def transform(self, trans):
-		if self.transformable == True:
-			values_trans = []
-			for val in self.values:
-				val_trans = None
-				## !!!! add try..except.. block for other geometry types (?)
-				if type(val) == Point3d:
-					val_trans = Point3d(val)
-				elif type(val) == Plane:
-					val_trans = Plane(val)
-				elif type(val) == Line:
-					val_trans = Line(val.From, val.To)
-				else:
-					val_trans = val.Duplicate()
-				val_trans.Transform(trans)
-				values_trans.append(val_trans)
-			attr_trans = Attribute(self.name, values_trans, self.transformable)
-		else:
-			attr_trans = Attribute(self.name, self.values, self.transformable)
-		return attr_trans
+		return self._clone(trans)
 	
 	## return a copy of the attribute
 	def copy(self):
+		return self._clone()
+	
+	## internal clone, keeping all other attributes of the (sub)class and copying (and transforming) only the values
+	def _clone(self, trans=None):
+		attr_clone = self.__class__.__new__(self.__class__)
+		attr_clone.__dict__.update(self.__dict__)
 		if self.transformable == True:
-			values_copy = []
+			attr_clone.values = []
 			for val in self.values:
-				val_copy = None
+				val_clone = None
+				## !!!! add try..except.. block for other geometry types (?)
 				if type(val) == Point3d:
-					val_copy = Point3d(val)
+					val_clone = Point3d(val)
 				elif type(val) == Plane:
-					val_copy = Plane(val)
+					val_clone = Plane(val)
 				elif type(val) == Line:
-					val_copy = Line(val.From, val.To)
+					val_clone = Line(val.From, val.To)
 				else:
-					val_copy = val.Duplicate()
-				values_copy.append(val_copy)
-			attr_copy = Attribute(self.name, values_copy, self.transformable)
-		else:
-			attr_copy = Attribute(self.name, self.values, self.transformable)
-		return attr_copy
+					val_clone = val.Duplicate()
+				if trans is not None:
+					val_clone.Transform(trans)
+				attr_clone.values.append(val_clone)
+		return attr_clone
 
 
 #################################################################### Attribute ####################################################################
@@ -83,47 +71,7 @@ class SmartAttribute(Attribute):
 	def ToString(self):
 		return "WaspSmartAttribute [name: %s]" % (self.name)
 	
-	## return a transformed copy of the attribute
-	def transform(self, trans):
-		if self.transformable == True:
-			values_trans = []
-			for val in self.values:
-				val_trans = None
-				## !!!! add try..except.. block for other geometry types (?)
-				if type(val) == Point3d:
-					val_trans = Point3d(val)
-				elif type(val) == Plane:
-					val_trans = Plane(val)
-				elif type(val) == Line:
-					val_trans = Line(val.From, val.To)
-				else:
-					val_trans = val.Duplicate()
-				val_trans.Transform(trans)
-				values_trans.append(val_trans)
-			attr_trans = SmartAttribute(self.name, values_trans, self.transformable, self.connections, self.conn_mask)
-		else:
-			attr_trans = SmartAttribute(self.name, self.values, self.transformable, self.connections, self.conn_mask)
-		return attr_trans
-	
-	## return a copy of the attribute
-	def copy(self):
-		if self.transformable == True:
-			values_copy = []
-			for val in self.values:
-				val_copy = None
-				if type(val) == Point3d:
-					val_copy = Point3d(val)
-				elif type(val) == Plane:
-					val_copy = Plane(val)
-				elif type(val) == Line:
-					val_copy = Line(val.From, val.To)
-				else:
-					val_copy = val.Duplicate()
-				values_copy.append(val_copy)
-			attr_copy = SmartAttribute(self.name, values_copy, self.transformable, self.connections, self.conn_mask)
-		else:
-			attr_copy = SmartAttribute(self.name, self.values, self.transformable, self.connections, self.conn_mask)
-		return attr_copy
+	## transform and copy are inherited from Attribute (connections and mask are shared between copies)
 
 
 #################################################################### Support ####################################################################
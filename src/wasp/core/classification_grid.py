@@ -0,0 +1,166 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Inside/outside classification grid of closed meshes
+"""
+
+import math
+from array import array
+
+from wasp.geometry import Point3d
+from wasp import global_tolerance
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+#################################################################### Classification Grid ####################################################################
+class ClassificationGrid(object):
+	'''
+	Regular grid over the bounding box of a closed mesh, classifying each cell as outside, inside or boundary.
+	Boundary cells are computed conservatively from the bounding boxes of the mesh faces (enlarged by the tolerance),
+	so all points of a non-boundary cell share the same classification, and only points in boundary cells need an exact test.
+	Each connected region of non-boundary cells is classified with a single point containment test.
+
+	Args:
+		_origin (tuple): Coordinates of the corner of the first cell
+		_cell_size (float): Size of the grid cells
+		_counts (tuple): Number of cells along X, Y and Z
+		_states ([int]): State of each cell (X varying fastest)
+
+	Attributes:
+		origin (tuple): Coordinates of the corner of the first cell
+		cell_size (float): Size of the grid cells
+		counts (tuple): Number of cells along X, Y and Z
+		states (array): State of each cell (X varying fastest), one of OUTSIDE, INSIDE or BOUNDARY
+	'''
+
+	OUTSIDE = 0
+	INSIDE = 1
+	BOUNDARY = 2
+
+	## constructor
+	def __init__(self, _origin, _cell_size, _counts, _states):
+		self.origin = tuple(_origin)
+		self.cell_size = float(_cell_size)
+		self.counts = tuple(_counts)
+		self.states = array('b', _states)
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspClassificationGrid [cells: %sx%sx%s, boundary: %s]" % (self.counts[0], self.counts[1], self.counts[2], self.states.count(ClassificationGrid.BOUNDARY))
+
+
+	## create the grid of a mesh
+	@classmethod
+	def from_mesh(cls, mesh, cell_size=None, tolerance=global_tolerance):
+		'''
+		Classifies the cells of a grid over the bounding box of a mesh
+
+		Args:
+			mesh (Mesh): Closed mesh
+			cell_size (float): Size of the grid cells (by default 1/32 of the largest bounding box side)
+			tolerance (float): Distance added around each face when computing boundary cells
+
+		Returns:
+			grid (ClassificationGrid): Classification grid of the mesh
+		'''
+		bbox = mesh.GetBoundingBox(True)
+		bounds = (bbox.Min.X, bbox.Min.Y, bbox.Min.Z, bbox.Max.X, bbox.Max.Y, bbox.Max.Z)
+		if cell_size is None:
+			cell_size = max(bounds[3]-bounds[0], bounds[4]-bounds[1], bounds[5]-bounds[2]) / 32.0
+		## one cell of padding, so that the grid border is always outside
+		origin = tuple([bounds[i] - cell_size for i in range(3)])
+		counts = tuple([int(math.ceil((bounds[i+3] - bounds[i]) / cell_size)) + 2 for i in range(3)])
+		nx, ny, nz = counts
+
+		states = [-1] * (nx*ny*nz)
+
+		## boundary cells
+		vertices = [(v.X, v.Y, v.Z) for v in mesh.Vertices]
+		for f in mesh.Faces:
+			face_vertices = [vertices[f.A], vertices[f.B], vertices[f.C]]
+			if f.IsQuad:
+				face_vertices.append(vertices[f.D])
+			lo = [min([v[k] for v in face_vertices]) - tolerance for k in range(3)]
+			hi = [max([v[k] for v in face_vertices]) + tolerance for k in range(3)]
+			i0, j0, k0 = [max(0, int(math.floor((lo[k] - origin[k]) / cell_size))) for k in range(3)]
+			i1, j1, k1 = [min(counts[k] - 1, int(math.floor((hi[k] - origin[k]) / cell_size))) for k in range(3)]
+			for k in range(k0, k1+1):
+				for j in range(j0, j1+1):
+					for i in range(i0, i1+1):
+						states[i + nx*(j + ny*k)] = ClassificationGrid.BOUNDARY
+
+		## flood fill connected regions of non-boundary cells, classifying each region from one of its cells
+		for start in range(len(states)):
+			if states[start] != -1:
+				continue
+			i = start % nx
+			j = (start // nx) % ny
+			k = start // (nx*ny)
+			pt = Point3d(origin[0] + (i+0.5)*cell_size, origin[1] + (j+0.5)*cell_size, origin[2] + (k+0.5)*cell_size)
+			state = ClassificationGrid.INSIDE if mesh.IsPointInside(pt, tolerance, False) else ClassificationGrid.OUTSIDE
+			states[start] = state
+			stack = [start]
+			while len(stack) > 0:
+				n = stack.pop()
+				i = n % nx
+				j = (n // nx) % ny
+				k = n // (nx*ny)
+				for di, dj, dk in ((1,0,0), (-1,0,0), (0,1,0), (0,-1,0), (0,0,1), (0,0,-1)):
+					if 0 <= i+di < nx and 0 <= j+dj < ny and 0 <= k+dk < nz:
+						m = n + di + nx*(dj + ny*dk)
+						if states[m] == -1:
+							states[m] = state
+							stack.append(m)
+
+		return cls(origin, cell_size, counts, states)
+
+
+	## create class from data dictionary
+	@classmethod
+	def from_data(cls, data):
+		return cls(data['origin'], data['cell_size'], data['counts'], data['states'])
+
+
+	## return the data dictionary representing the grid
+	def to_data(self):
+		data = {}
+		data['origin'] = list(self.origin)
+		data['cell_size'] = self.cell_size
+		data['counts'] = list(self.counts)
+		data['states'] = list(self.states)
+		return data
+
+
+	## return the state of the cell containing a point (points outside the grid are outside the mesh)
+	def classify(self, x, y, z):
+		i = int(math.floor((x - self.origin[0]) / self.cell_size))
+		j = int(math.floor((y - self.origin[1]) / self.cell_size))
+		k = int(math.floor((z - self.origin[2]) / self.cell_size))
+		nx, ny, nz = self.counts
+		if i < 0 or j < 0 or k < 0 or i >= nx or j >= ny or k >= nz:
+			return ClassificationGrid.OUTSIDE
+		return self.states[i + nx*(j + ny*k)]
+
+
+	## return the states of the cells containing a list of points (x,y,z), vectorized when NumPy is available
+	def classify_batch(self, centers):
+		if np is None:
+			return [self.classify(c[0], c[1], c[2]) for c in centers]
+		pts = np.asarray(centers, dtype=float).reshape((-1, 3))
+		ijk = np.floor((pts - np.array(self.origin)) / self.cell_size).astype(int)
+		counts = np.array(self.counts)
+		in_grid = np.all((ijk >= 0) & (ijk < counts), axis=1)
+		result = np.full(len(pts), ClassificationGrid.OUTSIDE, dtype=int)
+		ids = ijk[in_grid]
+		result[in_grid] = np.frombuffer(self.states, dtype=np.int8)[ids[:, 0] + counts[0]*(ids[:, 1] + counts[1]*ids[:, 2])]
+		return list(result)
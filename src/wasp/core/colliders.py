@@ -9,12 +9,99 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 Collider classes and utilities
 """
 
-from Rhino.Geometry.Intersect import Intersection
+import math
+
+from wasp.geometry import Intersection, Point3d
 from wasp import rh_version
 from wasp.core import Connection
+from wasp.core.spatial import mesh_bounds, line_segment
+from wasp.core.sdf import SignedDistanceField, transform_entries, transform_max_scale
+from wasp.core.convex import gjk_intersect, convex_decomposition, shrink_points
+from wasp import global_tolerance
 from wasp.utilities import mesh_from_data, mesh_to_data
 
 
+#################################################################### Proxy Spheres ####################################################################
+## return a few spheres (x,y,z,radius) enclosing a mesh, splitting its bounding box along the longest side
+def bounding_spheres(mesh, max_count=4):
+	if mesh.Vertices.Count == 0:
+		return []
+	b = mesh_bounds(mesh)
+	sides = [b[3]-b[0], b[4]-b[1], b[5]-b[2]]
+	axis = sides.index(max(sides))
+	second = max([sides[i] for i in range(3) if i != axis])
+	count = 1
+	if second > 0:
+		count = max(1, min(max_count, int(round(sides[axis] / second))))
+	elif sides[axis] > 0:
+		count = max_count
+
+	## single sphere, shrunk to the farthest vertex when tighter than the box
+	if count == 1:
+		c = ((b[0]+b[3]) / 2.0, (b[1]+b[4]) / 2.0, (b[2]+b[5]) / 2.0)
+		r = math.sqrt(sum([s*s for s in sides])) / 2.0
+		r_vertices = max([math.sqrt((v.X-c[0])**2 + (v.Y-c[1])**2 + (v.Z-c[2])**2) for v in mesh.Vertices])
+		return [(c[0], c[1], c[2], min(r, r_vertices))]
+
+	## spheres circumscribing equal slices of the bounding box
+	spheres = []
+	step = sides[axis] / count
+	slice_sides = list(sides)
+	slice_sides[axis] = step
+	r = math.sqrt(sum([s*s for s in slice_sides])) / 2.0
+	for i in range(count):
+		c = [(b[0]+b[3]) / 2.0, (b[1]+b[4]) / 2.0, (b[2]+b[5]) / 2.0]
+		c[axis] = b[axis] + step * (i + 0.5)
+		spheres.append((c[0], c[1], c[2], r))
+	return spheres
+
+
+## check if any sphere of a set overlaps (within the tolerance) any sphere of another set
+def spheres_overlap(spheres_a, spheres_b, tolerance=global_tolerance):
+	for xa, ya, za, ra in spheres_a:
+		for xb, yb, zb, rb in spheres_b:
+			r = ra + rb + tolerance
+			if (xa-xb)*(xa-xb) + (ya-yb)*(ya-yb) + (za-zb)*(za-zb) <= r*r:
+				return True
+	return False
+
+
+#################################################################### Ray Queries ####################################################################
+## check, for each line, if it intersects the collider of any of the given ids in the parts list (optionally only parts with the given name for each line)
+def lines_hit_parts(lines, parts, ids, tree=None, names=None):
+	'''
+	Batch ray query of a list of lines against the colliders of the given parts.
+	If an AABBTree of the parts colliders is provided (with (part id, geometry id) leaves), all lines are traversed through it at once,
+	and only meshes whose bounding box is crossed by a line are tested for intersection.
+
+	Args:
+		lines ([Line]): Lines to test
+		parts ([Part]): List of parts
+		ids ([int]): Ids of the parts to test in the parts list
+		tree (AABBTree): Bounding volume hierarchy of the parts colliders
+		names ([str]): Optional name of the parts to test for each line (None to test all parts)
+
+	Returns:
+		hits ([bool]): True for each line intersecting at least one collider
+	'''
+	if tree is None:
+		candidates = [[(id, geo_id) for id in ids for geo_id in range(len(parts[id].collider.geometry))] for ln in lines]
+	else:
+		ids_set = set(ids)
+		candidates = [sorted([leaf for leaf in leaves if leaf[0] in ids_set]) for leaves in tree.query_segments([line_segment(ln) for ln in lines], global_tolerance)]
+	hits = []
+	for i in range(len(lines)):
+		hit = False
+		for id, geo_id in candidates[i]:
+			if names is not None and parts[id].name != names[i]:
+				continue
+			if parts[id].collider.check_geometry_intersection_w_line(geo_id, lines[i]):
+				hit = True
+				break
+		hits.append(hit)
+	return hits
+
+
 #################################################################### Collider ####################################################################
 class Collider(object):
 	
@@ -34,6 +121,14 @@ class Collider(object):
 		self.set_connections = False
 		if len(self.connections) == len(self.geometry) and self.multiple == True:
 			self.set_connections = True
+		
+		## coarse proxy of each collider geometry, as a list of enclosing spheres (x,y,z,radius), tested before mesh intersections
+		self.proxy = [bounding_spheres(geo) for geo in self.geometry]
+		
+		## optional signed distance field of the collider geometry (see generate_sdf)
+		self.sdf = None
+		## optional convex pieces approximating the collider geometry, as lists of points (see generate_hulls)
+		self.hulls = None
 	
 	## override Rhino .ToString() method (display name of the class in Gh)
 	def ToString(self):
@@ -48,7 +143,14 @@ class Collider(object):
 		c_check_all = data['check_all']
 		c_connections = [Connection.from_data(c_data) for c_data in data['connections']]
 		c_valid_connections = [int(vc) for vc in data['valid_connections']]
-		return cls(c_geo, _multiple=c_multiple, _check_all=c_check_all, _connections=c_connections, _valid_connections=c_valid_connections)
+		collider = cls(c_geo, _multiple=c_multiple, _check_all=c_check_all, _connections=c_connections, _valid_connections=c_valid_connections)
+		if 'proxy' in data:
+			collider.proxy = [[tuple(sphere) for sphere in spheres] for spheres in data['proxy']]
+		if 'sdf' in data:
+			collider.sdf = SignedDistanceField.from_data(data['sdf'])
+		if 'hulls' in data:
+			collider.hulls = [[tuple(pt) for pt in hull] for hull in data['hulls']]
+		return collider
 
 		
 	## return the data dictionary representing the collider
@@ -59,48 +161,159 @@ class Collider(object):
 		data['check_all'] = self.check_all
 		data['connections'] = [conn.to_data() for conn in self.connections]
 		data['valid_connections'] = self.valid_connections
+		data['proxy'] = [[list(sphere) for sphere in spheres] for spheres in self.proxy]
+		if self.sdf is not None:
+			data['sdf'] = self.sdf.to_data()
+		if self.hulls is not None:
+			data['hulls'] = [[list(pt) for pt in hull] for hull in self.hulls]
 		return data
 
 
 	## return a transformed copy of the collider
 	########################################################################### check if valid connections need to be transformed or re-generated!!!
 	def transform(self, trans, transform_connections = False, maintain_valid = False):
-		geometry_trans = []
-		
-		for geo in self.geometry:
-			geo_trans = geo.Duplicate()
-			geo_trans.Transform(trans)
-			geometry_trans.append(geo_trans)
-		
-		connections_trans = []
-		if transform_connections:
-			for conn in self.connections:
-				connections_trans.append(conn.transform(trans))
-		
-		if maintain_valid:
-			valid_connection_trans = list(self.valid_connections)
-			coll_trans = Collider(geometry_trans, _multiple=self.multiple, _check_all=self.check_all, _connections=connections_trans, _valid_connections=valid_connection_trans)
-		else:
-			coll_trans = Collider(geometry_trans, _multiple=self.multiple, _check_all=self.check_all, _connections=connections_trans)
-		
-		return coll_trans
+		return self._clone(trans, transform_connections, maintain_valid)
 	
 
 	## return a copy of the collider
 	def copy(self):
-		geometry_copy = []
+		return self._clone()
+	
+
+	## internal clone, reusing the cached faces count instead of recomputing it
+	def _clone(self, trans=None, keep_connections=True, keep_valid=True):
+		coll_clone = Collider.__new__(Collider)
+		
+		coll_clone.geometry = []
 		for geo in self.geometry:
-			geo_copy = geo.Duplicate()
-			geometry_copy.append(geo_copy)
+			geo_clone = geo.Duplicate()
+			if trans is not None:
+				geo_clone.Transform(trans)
+			coll_clone.geometry.append(geo_clone)
+		
+		coll_clone.connections = []
+		if keep_connections:
+			coll_clone.connections = [conn._clone(trans) for conn in self.connections]
 		
-		connections_copy = []
-		for conn in self.connections:
-			connections_copy.append(conn.copy())
+		coll_clone.valid_connections = []
+		if keep_valid:
+			coll_clone.valid_connections = list(self.valid_connections)
 		
-		valid_connection_copy = list(self.valid_connections)
-		coll_copy = Collider(geometry_copy, _multiple=self.multiple, _check_all=self.check_all, _connections=connections_copy, _valid_connections=valid_connection_copy)
+		coll_clone.multiple = self.multiple
+		coll_clone.check_all = self.check_all
+		coll_clone.faces_count = self.faces_count
+		coll_clone.set_connections = len(coll_clone.connections) == len(coll_clone.geometry) and coll_clone.multiple == True
 		
-		return coll_copy
+		coll_clone.proxy = self.proxy
+		if trans is not None:
+			m = transform_entries(trans)
+			## radii are scaled by the largest stretch of the transformation, so that the spheres still enclose scaled or sheared geometry
+			scale = transform_max_scale(m)
+			coll_clone.proxy = [[(m[0]*x + m[1]*y + m[2]*z + m[3], m[4]*x + m[5]*y + m[6]*z + m[7], m[8]*x + m[9]*y + m[10]*z + m[11], r*scale) for x, y, z, r in spheres] for spheres in self.proxy]
+		
+		coll_clone.sdf = None
+		if self.sdf is not None:
+			coll_clone.sdf = self.sdf.transform(trans) if trans is not None else self.sdf.copy()
+		
+		coll_clone.hulls = self.hulls
+		if self.hulls is not None and trans is not None:
+			coll_clone.hulls = [[(m[0]*x + m[1]*y + m[2]*z + m[3], m[4]*x + m[5]*y + m[6]*z + m[7], m[8]*x + m[9]*y + m[10]*z + m[11]) for x, y, z in hull] for hull in self.hulls]
+		return coll_clone
+	
+
+	## compute the signed distance field of the collider, used instead of mesh intersections against other colliders with a field
+	def generate_sdf(self, cell_size=None):
+		'''
+		Computes the signed distance field of the collider geometry. Only single (not multiple) colliders made of closed meshes are supported.
+
+		Args:
+			cell_size (float): Distance between grid nodes (by default 1/16 of the largest bounding box side)
+
+		Returns:
+			success (bool): True if the field was computed
+		'''
+		if self.multiple or len(self.geometry) == 0:
+			return False
+		for geo in self.geometry:
+			if not geo.IsClosed:
+				return False
+		self.sdf = SignedDistanceField.from_meshes(self.geometry, cell_size)
+		return True
+	
+
+	## compute convex pieces approximating the collider geometry, used instead of mesh intersections against other colliders with convex pieces
+	def generate_hulls(self, max_depth=4, tolerance=global_tolerance):
+		'''
+		Computes an approximate convex decomposition of the collider geometry, tested with GJK against other colliders with convex pieces.
+		Pieces are shrunk by the tolerance, so that touching colliders do not collide. Only single (not multiple) colliders are supported,
+		and only meshes which can be split into convex pieces within the maximum depth (otherwise no pieces are stored).
+
+		Args:
+			max_depth (int): Maximum number of recursive splits of each mesh (at most 2^max_depth pieces per mesh)
+			tolerance (float): Tolerance for the convexity test, and distance the pieces are shrunk by
+
+		Returns:
+			success (bool): True if the pieces were computed
+		'''
+		if self.multiple or len(self.geometry) == 0:
+			return False
+		hulls = []
+		for geo in self.geometry:
+			pieces = convex_decomposition(geo, max_depth, tolerance)
+			if pieces is None:
+				self.hulls = None
+				return False
+			hulls.extend([shrink_points(piece, tolerance) for piece in pieces])
+		self.hulls = hulls
+		return True
+	
+
+	## check if the proxy of a geometry of the collider overlaps the proxy of a geometry of another collider (if not, the geometries cannot intersect)
+	def check_proxy_collision(self, geo_id, other, other_geo_id):
+		return spheres_overlap(self.proxy[geo_id], other.proxy[other_geo_id])
+	
+
+	## check if the proxy of a geometry of the collider touches the surface of a mesh (if not, the geometry cannot intersect the mesh)
+	def check_proxy_w_mesh(self, geo_id, mesh, tolerance=global_tolerance):
+		for x, y, z, r in self.proxy[geo_id]:
+			pt = Point3d(x, y, z)
+			if pt.DistanceTo(mesh.ClosestPoint(pt)) <= r + tolerance:
+				return True
+		return False
+	
+
+	## check intersection between a geometry of the collider and a mesh, testing the geometry proxy first
+	def check_geometry_w_mesh(self, geo_id, mesh):
+		if not self.check_proxy_w_mesh(geo_id, mesh):
+			return False
+		return len(Intersection.MeshMeshFast(self.geometry[geo_id], mesh)) > 0
+	
+
+	## check intersection between the signed distance fields or the convex pieces of the collider and of another collider
+	def _check_shape_collision(self, other):
+		if self.sdf is not None and other.sdf is not None:
+			return self.sdf.check_collision(other.sdf)
+		for hull in self.hulls:
+			for other_hull in other.hulls:
+				if gjk_intersect(hull, other_hull):
+					return True
+		return False
+	
+
+	## check collision between collider and the given part collider using their signed distance fields or convex pieces
+	## returns None if the two colliders do not share any of these representations
+	def check_shape_collision(self, part, cache=None, pose_key=None):
+		other = part.collider
+		if (self.sdf is None or other.sdf is None) and (self.hulls is None or other.hulls is None):
+			return None
+		if cache is None or pose_key is None:
+			return self._check_shape_collision(other)
+		key = (pose_key, 'shape')
+		result = cache.get(key)
+		if result is None:
+			result = self._check_shape_collision(other)
+			cache.put(key, result)
+		return result
 	
 
 	## check collisions between collider and given part
@@ -113,8 +326,8 @@ class Collider(object):
 			for geo in self.geometry:
 				valid_coll = True
 				for part in parts:
-					for other_geo in part.collider.geometry:
-						if len(Intersection.MeshMeshFast(geo, other_geo)) > 0:
+					for other_geo_id in range(len(part.collider.geometry)):
+						if self.check_proxy_collision(count, part.collider, other_geo_id) and len(Intersection.MeshMeshFast(geo, part.collider.geometry[other_geo_id])) > 0:
 							valid_coll = False
 							break
 					if valid_coll == False:
@@ -132,16 +345,49 @@ class Collider(object):
 		
 		## simple collider
 		else:
-			for geo in self.geometry:
-				for part in parts:
-					for other_geo in part.collider.geometry:
-						if len(Intersection.MeshMeshFast(geo, other_geo)) > 0:
+			mesh_parts = []
+			for part in parts:
+				shape_check = self.check_shape_collision(part)
+				if shape_check:
+					return True
+				elif shape_check is None:
+					mesh_parts.append(part)
+			for geo_id in range(len(self.geometry)):
+				for part in mesh_parts:
+					for other_geo_id in range(len(part.collider.geometry)):
+						if self.check_proxy_collision(geo_id, part.collider, other_geo_id) and len(Intersection.MeshMeshFast(self.geometry[geo_id], part.collider.geometry[other_geo_id])) > 0:
 							return True
 			return False
 	
 
+	## return the (part id, geometry id) pairs of the given parts colliders which might collide with the given geometry
+	def collision_candidates(self, geo, parts, ids, tree=None):
+		if tree is None:
+			return [(id, geo_id) for id in ids for geo_id in range(len(parts[id].collider.geometry))]
+		ids_set = set(ids)
+		return sorted([leaf for leaf in tree.query(mesh_bounds(geo)) if leaf[0] in ids_set])
+	
+
+	## check intersection between a geometry of the collider and a geometry of the given part collider
+	## geometries with disjoint proxies are not tested further
+	## if a collision cache and the key of the relative pose of the two colliders are provided, results are looked up and stored in the cache
+	def check_geometry_collision(self, geo_id, part, other_geo_id, cache=None, pose_key=None):
+		if not self.check_proxy_collision(geo_id, part.collider, other_geo_id):
+			return False
+		if cache is None or pose_key is None:
+			return len(Intersection.MeshMeshFast(self.geometry[geo_id], part.collider.geometry[other_geo_id])) > 0
+		key = (pose_key, geo_id, other_geo_id)
+		result = cache.get(key)
+		if result is None:
+			result = len(Intersection.MeshMeshFast(self.geometry[geo_id], part.collider.geometry[other_geo_id])) > 0
+			cache.put(key, result)
+		return result
+	
+
 	## check collisions between collider and given ids in the given parts list
-	def check_collisions_by_id(self, parts, ids):
+	## if an AABBTree of the parts colliders is provided, only meshes with overlapping bounding boxes are tested
+	## if a collision cache is provided, pose_keys maps part ids to the key of their pose relative to the collider (or None if not cacheable)
+	def check_collisions_by_id(self, parts, ids, tree=None, cache=None, pose_keys={}):
 		## multiple collider with associated connections
 		if self.multiple:
 			valid_colliders = []
@@ -149,11 +395,10 @@ class Collider(object):
 			
 			for geo in self.geometry:
 				valid_coll = True
-				for id in ids:
-					for other_geo in parts[id].collider.geometry:
-						if len(Intersection.MeshMeshFast(geo, other_geo)) > 0:
-							valid_coll = False
-							break
+				for id, geo_id in self.collision_candidates(geo, parts, ids, tree):
+					if self.check_geometry_collision(count, parts[id], geo_id, cache, pose_keys.get(id)):
+						valid_coll = False
+						break
 				valid_colliders.append(valid_coll)
 				if valid_coll and self.check_all == False:
 					break
@@ -164,26 +409,38 @@ class Collider(object):
 		
 		## simple collider
 		else:
-			for geo in self.geometry:
+			mesh_ids = ids
+			if self.sdf is not None or self.hulls is not None:
+				mesh_ids = []
 				for id in ids:
-					for other_geo in parts[id].collider.geometry:
-						if len(Intersection.MeshMeshFast(geo, other_geo)) > 0:
-							return True
+					shape_check = self.check_shape_collision(parts[id], cache, pose_keys.get(id))
+					if shape_check:
+						return True
+					elif shape_check is None:
+						mesh_ids.append(id)
+			for geo_id in range(len(self.geometry)):
+				for id, other_geo_id in self.collision_candidates(self.geometry[geo_id], parts, mesh_ids, tree):
+					if self.check_geometry_collision(geo_id, parts[id], other_geo_id, cache, pose_keys.get(id)):
+						return True
 			return False
 
 
 	## check intersection between collider and line (for supports check)
 	def check_intersection_w_line(self, ln):
-		for geo in self.geometry:
-			if rh_version >= 7:
-				if len(Intersection.MeshLine(geo, ln)) > 0:
-					return True
-			else:
-				if len(Intersection.MeshLine(geo, ln)[0]) > 0:
-					return True
+		for geo_id in range(len(self.geometry)):
+			if self.check_geometry_intersection_w_line(geo_id, ln):
+				return True
 		return False
 	
 
+	## check intersection between a geometry of the collider and line
+	def check_geometry_intersection_w_line(self, geo_id, ln):
+		## Rhino 7+ and the headless backend return a points array
+		if rh_version is None or rh_version >= 7:
+			return len(Intersection.MeshLine(self.geometry[geo_id], ln)) > 0
+		return len(Intersection.MeshLine(self.geometry[geo_id], ln)[0]) > 0
+	
+
 	#### WIP ####
 	def check_global_constraints(self, constraint):
 		return False
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Cache of collision results between part types at given relative poses
+"""
+
+from collections import OrderedDict
+
+from wasp import global_tolerance
+
+
+#################################################################### Collision Cache ####################################################################
+class CollisionCache(object):
+	'''
+	Least-recently-used cache of collision results between collider meshes of two part types, keyed on their relative transformation.
+	Relative transformations are quantized so that two poses sharing a key never move any collider point by more than the tolerance.
+
+	Args:
+		_tolerance (float): Quantization step of the relative transformation
+		_max_size (int): Maximum number of stored results
+
+	Attributes:
+		tolerance (float): Quantization step of the relative transformation
+		max_size (int): Maximum number of stored results
+		results (OrderedDict): Collision results, from the least to the most recently used
+		hits (int): Number of lookups answered by the cache
+		misses (int): Number of lookups not answered by the cache
+	'''
+
+	## constructor
+	def __init__(self, _tolerance=global_tolerance, _max_size=100000):
+		self.tolerance = _tolerance
+		self.max_size = _max_size
+		self.results = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspCollisionCache [size: %s, hits: %s, misses: %s]" % (len(self.results), self.hits, self.misses)
+
+
+	def __len__(self):
+		return len(self.results)
+
+
+	## remove all results and reset counters
+	def clear(self):
+		self.results = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+
+	## return the fraction of lookups answered by the cache
+	def hit_rate(self):
+		if self.hits + self.misses == 0:
+			return 0.0
+		return float(self.hits) / (self.hits + self.misses)
+
+
+	## return the key of a pair of part types at a given relative transformation
+	def pose_key(self, name_a, name_b, rel_trans, radius):
+		'''
+		Returns the cache key of part type A placed with rel_trans in the frame of part type B
+
+		Args:
+			name_a (str): Name of part A
+			name_b (str): Name of part B
+			rel_trans (Transform): Transformation of part A relative to part B
+			radius (float): Maximum distance of the colliders points from the origin of part B frame (to quantize rotations)
+
+		Returns:
+			key (tuple): Cache key
+		'''
+		## a rotation error e moves points at distance r by at most ~3*e*r, translations are quantized by the tolerance
+		rot_step = self.tolerance / (3 * max(radius, self.tolerance))
+		return (name_a, name_b,
+			int(round(rel_trans.M00 / rot_step)), int(round(rel_trans.M01 / rot_step)), int(round(rel_trans.M02 / rot_step)), int(round(rel_trans.M03 / self.tolerance)),
+			int(round(rel_trans.M10 / rot_step)), int(round(rel_trans.M11 / rot_step)), int(round(rel_trans.M12 / rot_step)), int(round(rel_trans.M13 / self.tolerance)),
+			int(round(rel_trans.M20 / rot_step)), int(round(rel_trans.M21 / rot_step)), int(round(rel_trans.M22 / rot_step)), int(round(rel_trans.M23 / self.tolerance)))
+
+
+	## return the stored result for a key (marking it as recently used), or None if not stored
+	def get(self, key):
+		result = self.results.pop(key, None)
+		if result is None:
+			self.misses += 1
+			return None
+		self.results[key] = result
+		self.hits += 1
+		return result
+
+
+	## store the result for a key, discarding the least recently used results when full
+	def put(self, key, result):
+		if key in self.results:
+			del self.results[key]
+		self.results[key] = result
+		while len(self.results) > self.max_size:
+			self.results.popitem(last=False)
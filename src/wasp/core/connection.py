@@ -9,10 +9,12 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 Connection class
 """
 
-from Rhino.Geometry import Plane
-from Rhino.Geometry import Vector3d
+from wasp.geometry import Plane
+from wasp.geometry import Vector3d
+from wasp.geometry import Transform
 
 from wasp.utilities import plane_from_data, plane_to_data
+from wasp.utilities import mask_from_list, mask_to_list
 
 import math
 
@@ -33,8 +35,10 @@ class Connection(object):
 		type (str): Connection type (for automated rules generation)
 		part (str): Name of the part the connection belongs to
 		id (int): Connection ID (unique within each part)
-		rule_table ([]): List of Wasp rules compatible with this connection
+		rule_table ([]): List of Wasp rules compatible with this connection (shared between parts when generated from compiled rules tables)
 		active_rules ([int]): Indexes of still active rules in the rule_table list
+		active_rules_mask (int): Bitmask of still active rules (bit i set if rule i is active)
+		frame (Transform): Transformation from the world XY plane to the connection plane (computed when first needed)
 	'''
 
 	
@@ -52,7 +56,9 @@ class Connection(object):
 		self.id = _id
 		
 		self.rules_table = []
-		self.active_rules = []
+		self.active_rules_mask = 0
+
+		self.frame = None
 	
 
 	## override Rhino .ToString() method (display name of the class in Gh)
@@ -78,6 +84,16 @@ class Connection(object):
 		return data	
 
 	
+	## indexes of active rules, in increasing order (stored as a bitmask)
+	@property
+	def active_rules(self):
+		return mask_to_list(self.active_rules_mask)
+	
+	@active_rules.setter
+	def active_rules(self, rule_ids):
+		self.active_rules_mask = mask_from_list(rule_ids)
+	
+	
 	## return a transformed copy of the connection
 	def transform(self, trans):
 		'''
@@ -89,11 +105,19 @@ class Connection(object):
 		Returns:
 			conn_trans (Connection): Transformed copy of the Connection
 		'''
-		pln_trans = Plane(self.pln.Origin, self.pln.XAxis, self.pln.YAxis)
-		pln_trans.Transform(trans)
-		
-		conn_trans = Connection(pln_trans, self.type, self.part, self.id)
-		return conn_trans
+		return self._clone(trans)
+	
+	## return the transformation from the world XY plane to the connection plane
+	def return_frame(self):
+		'''
+		Returns the transformation from the world XY plane to the connection plane, computing it only once
+
+		Returns:
+			frame (Transformation): World XY to connection plane transformation
+		'''
+		if self.frame is None:
+			self.frame = Transform.PlaneToPlane(Plane.WorldXY, self.pln)
+		return self.frame
 	
 	## return a copy of the connection
 	def copy(self):
@@ -103,23 +127,44 @@ class Connection(object):
 		Returns:
 			conn_copy (Connection): Connection copy
 		'''
-		pln_copy = Plane(self.pln.Origin, self.pln.XAxis, self.pln.YAxis)
-		conn_copy = Connection(pln_copy, self.type, self.part, self.id)
-		return conn_copy
+		return self._clone()
+	
+	## internal clone, transforming the cached frame instead of recomputing it
+	def _clone(self, trans=None):
+		conn_clone = Connection.__new__(Connection)
+		conn_clone.pln = Plane(self.pln)
+		conn_clone.frame = self.frame
+		if trans is not None:
+			conn_clone.pln.Transform(trans)
+			if self.frame is not None:
+				conn_clone.frame = Transform.Multiply(trans, self.frame)
+		
+		flip_pln_Y = Vector3d(conn_clone.pln.YAxis)
+		flip_pln_Y.Reverse()
+		conn_clone.flip_pln = Plane(conn_clone.pln.Origin, conn_clone.pln.XAxis, flip_pln_Y)
+		
+		conn_clone.type = self.type
+		conn_clone.part = self.part
+		conn_clone.id = self.id
+		
+		conn_clone.rules_table = []
+		conn_clone.active_rules_mask = 0
+		return conn_clone
 	
 	## generate the rules-table for the connection
-	def generate_rules_table(self, rules):
+	def generate_rules_table(self, rules, rules_tables=None):
 		'''
 		Generates the Connection rule_table, given a set of rules
 
 		Args:
 			rules ([]): list of available rules
+			rules_tables (RulesTables): Optional tables compiled from the same rules, to share instead of scanning the rules list
 		'''
-		count = 0
-		self.rules_table = []
-		self.active_rules = []
-		for rule in rules:
-			if rule.part1 == self.part and rule.conn1 == self.id:
-				self.rules_table.append(rule)
-				self.active_rules.append(count)
-				count += 1
\ No newline at end of file
+		if rules_tables is not None:
+			self.rules_table = rules_tables.get(self.part, self.id)
+		else:
+			self.rules_table = []
+			for rule in rules:
+				if rule.part1 == self.part and rule.conn1 == self.id:
+					self.rules_table.append(rule)
+		self.active_rules_mask = (1 << len(self.rules_table)) - 1
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Adaptive ordering of aggregation constraint checks
+"""
+
+try:
+	from time import perf_counter as timer
+except ImportError:
+	## IronPython 2.7
+	from time import clock as timer
+
+
+## names of the constraint checks, in their default order
+CHECK_NAMES = ('collision', 'global', 'additional_collider', 'supports', 'adjacencies', 'exclusions', 'orientation')
+## checks relying on the nearby parts found by the collision check
+COLLISION_DEPENDENT_CHECKS = ('supports', 'adjacencies', 'exclusions')
+
+
+#################################################################### Constraint Scheduler ####################################################################
+class ConstraintScheduler(object):
+	'''
+	Records the average cost and the rejection rate of each constraint check for each part type during an aggregation,
+	and orders the checks so that cheap and selective checks run first (ascending cost / rejection rate).
+	Checks relying on the nearby parts found by the collision check always run after it.
+	During the first evaluations of each part type, and periodically afterwards, all checks are run to keep the statistics up to date.
+
+	Args:
+		_warmup (int): Number of evaluations of each part type running all checks in the default order
+		_explore_interval (int): Interval of the evaluations running all checks after the warmup
+
+	Attributes:
+		warmup (int): Number of evaluations of each part type running all checks in the default order
+		explore_interval (int): Interval of the evaluations running all checks after the warmup
+		stats ({}): Dictionary mapping part names to dictionaries mapping check names to [runs, total time, rejections]
+		evaluations ({}): Dictionary mapping part names to the number of evaluated candidates
+		orders ({}): Dictionary mapping part names to the last chosen order of checks
+	'''
+
+	## constructor
+	def __init__(self, _warmup=20, _explore_interval=50):
+		self.warmup = _warmup
+		self.explore_interval = _explore_interval
+		self.stats = {}
+		self.evaluations = {}
+		self.orders = {}
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspConstraintScheduler [parts: %s, evaluations: %s]" % (len(self.evaluations), sum(self.evaluations.values()))
+
+
+	## remove all statistics
+	def clear(self):
+		self.stats = {}
+		self.evaluations = {}
+		self.orders = {}
+
+
+	## register a new candidate of a part type, and return True if all checks should be run for it
+	def start_evaluation(self, part_name):
+		count = self.evaluations.get(part_name, 0)
+		self.evaluations[part_name] = count + 1
+		return count < self.warmup or count % self.explore_interval == 0
+
+
+	## store the cost and the result of a check
+	def record(self, part_name, check_name, cost, rejected):
+		if part_name not in self.stats:
+			self.stats[part_name] = {}
+		if check_name not in self.stats[part_name]:
+			self.stats[part_name][check_name] = [0, 0.0, 0]
+		check_stats = self.stats[part_name][check_name]
+		check_stats[0] += 1
+		check_stats[1] += cost
+		if rejected:
+			check_stats[2] += 1
+
+
+	## return the average cost and the rejection rate of a check, or None if it was never run
+	def check_stats(self, part_name, check_name):
+		check_stats = self.stats.get(part_name, {}).get(check_name)
+		if check_stats is None or check_stats[0] == 0:
+			return None
+		return check_stats[1] / check_stats[0], float(check_stats[2]) / check_stats[0]
+
+
+	## return the given checks (in their default order) ordered by ascending cost / rejection rate
+	def order(self, part_name, checks):
+		if self.evaluations.get(part_name, 0) <= self.warmup:
+			self.orders[part_name] = list(checks)
+			return self.orders[part_name]
+
+		def rank(check_name):
+			stats = self.check_stats(part_name, check_name)
+			if stats is None:
+				return 0.0
+			return stats[0] / max(stats[1], 0.001)
+
+		ordered = []
+		for check_name in sorted(checks, key=rank):
+			## the collision check is moved before the first check depending on it
+			if check_name in COLLISION_DEPENDENT_CHECKS and 'collision' not in ordered:
+				ordered.append('collision')
+			if check_name not in ordered:
+				ordered.append(check_name)
+		self.orders[part_name] = ordered
+		return ordered
+
+
+	## return a report of the chosen orders, with cost (ms) and rejection rate of each check
+	def report(self):
+		lines = []
+		for part_name in sorted(self.orders.keys()):
+			checks = []
+			for check_name in self.orders[part_name]:
+				stats = self.check_stats(part_name, check_name)
+				if stats is None:
+					checks.append(check_name)
+				else:
+					checks.append("%s (%.3f ms, %d%%)" % (check_name, stats[0]*1000, int(round(stats[1]*100))))
+			lines.append("%s: %s" % (part_name, " > ".join(checks)))
+		return "\n".join(lines)
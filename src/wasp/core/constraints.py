@@ -9,14 +9,45 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 Constraints classes
 """
 
-from Rhino.Geometry.Intersect import Intersection
-from Rhino.Geometry import Vector3d, Point3d, Line, Plane, Interval
+from wasp.geometry import Intersection
+from wasp.geometry import Vector3d, Point3d, Line, Plane, Interval
 
 from wasp import global_tolerance
 from wasp.utilities import plane_from_data, plane_to_data, mesh_from_data, mesh_to_data
+from wasp.core.colliders import lines_hit_parts
+from wasp.core.classification_grid import ClassificationGrid
+from wasp.core.sdf import SignedDistanceField
+from wasp.core.collision_cache import CollisionCache
 
 import math
 
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+## return the candidates of a batch check assigned to a constraint (all of them if the constraint is not part-specific)
+def assigned_candidates(constraint, count, names=None):
+	if names is None or len(constraint.parts) == 0:
+		return [True] * count
+	return [name in constraint.parts for name in names]
+
+
+## return the rotation part of a transformation as a tuple of its entries, quantized by the given step
+def rotation_key(trans, step=1e-6):
+	return (int(round(trans.M00 / step)), int(round(trans.M01 / step)), int(round(trans.M02 / step)),
+		int(round(trans.M10 / step)), int(round(trans.M11 / step)), int(round(trans.M12 / step)),
+		int(round(trans.M20 / step)), int(round(trans.M21 / step)), int(round(trans.M22 / step)))
+
+
+## return the signed distances of a list of points (x,y,z) from a plane equation (a,b,c,d)
+def plane_distances(centers, eq):
+	if np is not None:
+		pts = np.asarray(centers, dtype=float).reshape((-1, 3))
+		return list(np.dot(pts, np.array([eq[0], eq[1], eq[2]])) + eq[3])
+	return [eq[0]*c[0] + eq[1]*c[1] + eq[2]*c[2] + eq[3] for c in centers]
+
 
 #################################################################### Plane Constraint ####################################################################
 class Plane_Constraint(object):
@@ -73,12 +104,49 @@ class Plane_Constraint(object):
 				return self.check_hard(pt, collider)
 	
 
+	## batch constraint check method
+	def check_batch(self, centers, names=None, colliders=None):
+		'''
+		Checks the constraint on a batch of candidates at once, using the plane equation
+		(vectorized when NumPy is available)
+
+		Args:
+			centers ([tuple]): Candidates centers, as an (n,3) array or a list of (x,y,z) points
+			names ([str]): Candidates part names (for part-specific constraints)
+			colliders ([Collider]): Candidates transformed colliders (for hard constraints). If None, only the half-space test of hard constraints is performed.
+
+		Returns:
+			valid ([bool]): True for each candidate satisfying the constraint
+		'''
+		eq = self.plane.GetPlaneEquation()
+		distances = plane_distances(centers, eq)
+		assigned = assigned_candidates(self, len(distances), names)
+		valid = []
+		for i in range(len(distances)):
+			if not assigned[i]:
+				valid.append(True)
+			elif (self.positive and distances[i] <= 0) or (not self.positive and distances[i] >= 0):
+				valid.append(False)
+			elif not self.soft and colliders is not None:
+				valid.append(not self.collider_crosses_plane(colliders[i]))
+			else:
+				valid.append(True)
+		return valid
+	
+
+	## check if a collider crosses the constraint plane
+	def collider_crosses_plane(self, collider):
+		for geo in collider.geometry:
+			if Intersection.MeshPlane(geo, self.plane) is not None:
+				return True
+		return False
+	
+
 	## hard constraint check method
 	def check_hard(self, pt, collider):
 		if self.check_soft(pt):
-			for geo in collider.geometry:
-				if Intersection.MeshPlane(geo, self.plane) is not None:
-					return False
+			if self.collider_crosses_plane(collider):
+				return False
 			return True
 		else:
 			return False
@@ -106,6 +174,11 @@ class Mesh_Constraint(object):
 		self.soft = _soft
 		self.required = _required
 		self.parts = _parts
+		
+		## optional inside/outside classification grid of the constraint geometry (see generate_grid)
+		self.grid = None
+		## optional signed distance field of the constraint geometry (see generate_sdf)
+		self.sdf = None
 	
 
 	## override Rhino .ToString() method (display name of the class in Gh)
@@ -115,7 +188,12 @@ class Mesh_Constraint(object):
 	## create class from data dictionary
 	@classmethod
 	def from_data(cls, data):
-		return cls(mesh_from_data(data['geometry']), inside=data['inside'], _soft=data['soft'], _required=data['required'], _parts=data['parts'])
+		constraint = cls(mesh_from_data(data['geometry']), _inside=data['inside'], _soft=data['soft'], _required=data['required'], _parts=data['parts'])
+		if 'grid' in data:
+			constraint.grid = ClassificationGrid.from_data(data['grid'])
+		if 'sdf' in data and constraint.geo.IsClosed:
+			constraint.sdf = SignedDistanceField.from_data(data['sdf'])
+		return constraint
 
 		
 	## return the data dictionary representing the constraint
@@ -127,9 +205,71 @@ class Mesh_Constraint(object):
 		data['soft'] = self.soft
 		data['required'] = self.required
 		data['parts'] = self.parts
+		if self.grid is not None:
+			data['grid'] = self.grid.to_data()
+		if self.sdf is not None:
+			data['sdf'] = self.sdf.to_data()
 		return data	
 
 
+	## compute the inside/outside classification grid of the constraint geometry, used to answer soft checks without exact tests away from its surface
+	def generate_grid(self, cell_size=None):
+		'''
+		Computes the classification grid of the constraint geometry (which should be closed)
+
+		Args:
+			cell_size (float): Size of the grid cells (by default 1/32 of the largest bounding box side)
+		'''
+		self.grid = ClassificationGrid.from_mesh(self.geo, cell_size)
+
+
+	## compute the signed distance field of the constraint geometry, used to decide hard checks without exact tests away from its surface
+	def generate_sdf(self, cell_size=None):
+		'''
+		Computes the signed distance field of the constraint geometry. Only closed meshes are supported,
+		since the sign of the field is meaningless for open meshes (checks then keep using the exact containment test).
+
+		Args:
+			cell_size (float): Distance between grid nodes (by default 1/16 of the largest bounding box side)
+
+		Returns:
+			success (bool): True if the field was computed
+		'''
+		self.sdf = None
+		if not self.geo.IsClosed:
+			return False
+		self.sdf = SignedDistanceField.from_meshes([self.geo], cell_size)
+		return True
+
+
+	## classify a geometry of a collider against the constraint geometry using the signed distance field
+	## returns 0 if they certainly do not intersect, 1 if they certainly intersect, -1 if undecided
+	def sdf_state(self, collider, geo_id):
+		## proxy spheres far from the surface
+		clear = True
+		for x, y, z, r in collider.proxy[geo_id]:
+			lo, hi = self.sdf.value_bounds(x, y, z)
+			if lo <= r + global_tolerance and hi >= -r - global_tolerance:
+				clear = False
+				break
+		if clear:
+			return 0
+		
+		## a face edge with vertices certainly on opposite sides of the surface
+		geo = collider.geometry[geo_id]
+		signs = []
+		for v in geo.Vertices:
+			lo, hi = self.sdf.value_bounds(v.X, v.Y, v.Z)
+			signs.append(1 if lo > global_tolerance else (-1 if hi < -global_tolerance else 0))
+		for f in geo.Faces:
+			face_signs = [signs[f.A], signs[f.B], signs[f.C]]
+			if f.IsQuad:
+				face_signs.append(signs[f.D])
+			if 1 in face_signs and -1 in face_signs:
+				return 1
+		return -1
+
+
 	## constraint check method
 	def check(self, pt = None, collider = None, p_name=None):
 		## check if the constraint is part-specific
@@ -149,19 +289,71 @@ class Mesh_Constraint(object):
 				return self.check_hard(pt, collider)
 	
 
+	## batch constraint check method
+	def check_batch(self, centers, names=None, colliders=None):
+		'''
+		Checks the constraint on a batch of candidates at once
+
+		Args:
+			centers ([tuple]): Candidates centers, as an (n,3) array or a list of (x,y,z) points
+			names ([str]): Candidates part names (for part-specific constraints)
+			colliders ([Collider]): Candidates transformed colliders (for hard constraints). If None, only the inside/outside test of hard constraints is performed.
+
+		Returns:
+			valid ([bool]): True for each candidate satisfying the constraint
+		'''
+		pts = [Point3d(float(c[0]), float(c[1]), float(c[2])) for c in centers]
+		assigned = assigned_candidates(self, len(pts), names)
+		states = None
+		if self.grid is not None:
+			states = self.grid.classify_batch(centers)
+		valid = []
+		for i in range(len(pts)):
+			if not assigned[i]:
+				valid.append(True)
+			elif not self.soft and colliders is not None:
+				valid.append(self.check_hard(pts[i], colliders[i]))
+			elif states is not None and states[i] != ClassificationGrid.BOUNDARY:
+				valid.append((states[i] == ClassificationGrid.INSIDE) == self.inside)
+			else:
+				valid.append(self.check_soft(pts[i]))
+		return valid
+	
+
 	## hard constraint check method
 	def check_hard(self, pt, collider):
 		if self.check_soft(pt):
-			for geo in collider.geometry:
-				if len(Intersection.MeshMeshFast(self.geo, geo)) > 0:
+			## geometries whose proxy does not touch the constraint mesh are not intersected
+			## with a signed distance field, exact tests are only performed for geometries close to the surface and not clearly crossing it
+			for geo_id in range(len(collider.geometry)):
+				state = -1
+				if self.sdf is not None:
+					state = self.sdf_state(collider, geo_id)
+				if state == 1:
+					return False
+				if state == -1 and collider.check_geometry_w_mesh(geo_id, self.geo):
 					return False
 			return True
 		else:
 			return False
 	
 	## soft constraint check method
+	## if a classification grid is available, the exact test is only performed for points in boundary cells
+	## otherwise, if a signed distance field is available, the exact test is only performed for points close to the surface
 	def check_soft(self, pt):
-		is_inside = self.geo.IsPointInside(pt, global_tolerance, False)
+		state = ClassificationGrid.BOUNDARY
+		if self.grid is not None:
+			state = self.grid.classify(pt.X, pt.Y, pt.Z)
+		elif self.sdf is not None:
+			lo, hi = self.sdf.value_bounds(pt.X, pt.Y, pt.Z)
+			if lo > global_tolerance:
+				state = ClassificationGrid.OUTSIDE
+			elif hi < -global_tolerance:
+				state = ClassificationGrid.INSIDE
+		if state == ClassificationGrid.BOUNDARY:
+			is_inside = self.geo.IsPointInside(pt, global_tolerance, False)
+		else:
+			is_inside = state == ClassificationGrid.INSIDE
 		if self.inside:
 			if is_inside:
 				return True
@@ -243,36 +435,19 @@ class Adjacency_Constraint(object):
 	
 
 	## check against a list of parts
-	def check(self, parts, possible_ids):
+	## if an AABBTree of the parts colliders is provided, all directions are queried through it at once
+	def check(self, parts, possible_ids, tree=None):
+		hits = lines_hit_parts(self.directions, parts, possible_ids, tree, None if self.name_independent else self.names)
+
 		## check adjacencies
 		if self.is_adjacency:
-			required_adjacencies = len(self.directions)
-			for i in range(len(self.directions)):
-				for id in possible_ids:
-					if self.name_independent:
-						if parts[id].collider.check_intersection_w_line(self.directions[i]):
-							required_adjacencies -= 1
-							break
-					else:
-						if parts[id].name == self.names[i]:
-							if parts[id].collider.check_intersection_w_line(self.directions[i]):
-								required_adjacencies -= 1
-								break
-			
-			if required_adjacencies == 0:
+			if False not in hits:
 				return True
 		
 		## check exclusions
 		else:
-			for i in range(len(self.directions)):
-				for id in possible_ids:
-					if self.name_independent:
-						if parts[id].collider.check_intersection_w_line(self.directions[i]):
-							return False
-					else:
-						if parts[id].name == self.names[i]:
-							if parts[id].collider.check_intersection_w_line(self.directions[i]):
-								return False
+			if True in hits:
+				return False
 			return True
 
 		return False
@@ -327,6 +502,9 @@ class Orientation_Constraint(object):
 			self.current_dir = self.base_dir
 		else:
 			self.current_dir = _c_dir
+		
+		## least-recently-used cache of check_transform results, by quantized rotation
+		self.results = CollisionCache()
 	
 
 	## override Rhino .ToString() method (display name of the class in Gh)
@@ -379,6 +557,17 @@ class Orientation_Constraint(object):
 		return orient_constraint_copy
 	
 
+	## check if orientation is valid after the given transformation
+	## the result only depends on the rotation part of the transformation, so results are cached by quantized rotation
+	def check_transform(self, trans):
+		key = rotation_key(trans)
+		result = self.results.get(key)
+		if result is None:
+			result = self.transform(trans).check()
+			self.results.put(key, result)
+		return result
+	
+
 	## check if orientation is valid
 	def check(self):
 		angle = Vector3d.VectorAngle(self.base_dir, self.current_dir, self.plane)
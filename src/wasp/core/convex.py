@@ -0,0 +1,227 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Convex shapes utilities: GJK intersection test and approximate convex decomposition of meshes
+"""
+
+import math
+
+from wasp import global_tolerance
+
+
+#################################################################### Vector Utilities ####################################################################
+def _sub(a, b):
+	return (a[0]-b[0], a[1]-b[1], a[2]-b[2])
+
+def _neg(a):
+	return (-a[0], -a[1], -a[2])
+
+def _dot(a, b):
+	return a[0]*b[0] + a[1]*b[1] + a[2]*b[2]
+
+def _cross(a, b):
+	return (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+
+def _triple(a, b, c):
+	return _cross(_cross(a, b), c)
+
+
+#################################################################### GJK ####################################################################
+## return the point of a convex shape (list of points) farthest along a direction
+def support_point(points, d):
+	best = points[0]
+	best_dot = _dot(best, d)
+	for p in points:
+		p_dot = _dot(p, d)
+		if p_dot > best_dot:
+			best = p
+			best_dot = p_dot
+	return best
+
+
+## update the simplex towards the origin, and return (True, None) if it contains the origin, or (False, next search direction)
+def _do_simplex(simplex):
+	a = simplex[-1]
+	ao = _neg(a)
+
+	## line
+	if len(simplex) == 2:
+		b = simplex[0]
+		ab = _sub(b, a)
+		if _dot(ab, ao) > 0:
+			d = _triple(ab, ao, ab)
+			if _dot(d, d) == 0:
+				return True, None
+			return False, d
+		del simplex[0]
+		return False, ao
+
+	## triangle
+	if len(simplex) == 3:
+		c, b = simplex[0], simplex[1]
+		ab = _sub(b, a)
+		ac = _sub(c, a)
+		abc = _cross(ab, ac)
+		if _dot(_cross(abc, ac), ao) > 0:
+			if _dot(ac, ao) > 0:
+				simplex[:] = [c, a]
+				return False, _triple(ac, ao, ac)
+			simplex[:] = [b, a]
+			return _do_simplex(simplex)
+		if _dot(_cross(ab, abc), ao) > 0:
+			simplex[:] = [b, a]
+			return _do_simplex(simplex)
+		abc_dot = _dot(abc, ao)
+		if abc_dot > 0:
+			return False, abc
+		if abc_dot < 0:
+			simplex[:] = [b, c, a]
+			return False, _neg(abc)
+		## origin on the triangle plane
+		return True, None
+
+	## tetrahedron
+	d, c, b = simplex[0], simplex[1], simplex[2]
+	ab = _sub(b, a)
+	ac = _sub(c, a)
+	ad = _sub(d, a)
+	if _dot(_cross(ab, ac), ao) > 0:
+		simplex[:] = [c, b, a]
+		return _do_simplex(simplex)
+	if _dot(_cross(ac, ad), ao) > 0:
+		simplex[:] = [d, c, a]
+		return _do_simplex(simplex)
+	if _dot(_cross(ad, ab), ao) > 0:
+		simplex[:] = [b, d, a]
+		return _do_simplex(simplex)
+	return True, None
+
+
+## check if two convex shapes (lists of points, the shapes being their convex hulls) intersect, with the GJK algorithm
+def gjk_intersect(points_a, points_b, max_iterations=64):
+	'''
+	Checks if the convex hulls of two point sets intersect (touching hulls intersect)
+
+	Args:
+		points_a ([tuple]): Points (x,y,z) of shape A
+		points_b ([tuple]): Points (x,y,z) of shape B
+		max_iterations (int): Maximum number of iterations (shapes are considered intersecting if reached)
+
+	Returns:
+		intersect (bool): True if the shapes intersect
+	'''
+	d = _sub(points_a[0], points_b[0])
+	if _dot(d, d) == 0:
+		d = (1.0, 0.0, 0.0)
+	p = _sub(support_point(points_a, d), support_point(points_b, _neg(d)))
+	simplex = [p]
+	d = _neg(p)
+	for i in range(max_iterations):
+		if _dot(d, d) == 0:
+			return True
+		p = _sub(support_point(points_a, d), support_point(points_b, _neg(d)))
+		if _dot(p, d) < 0:
+			return False
+		simplex.append(p)
+		contains, d = _do_simplex(simplex)
+		if contains:
+			return True
+	return True
+
+
+#################################################################### Convex Decomposition ####################################################################
+## move points towards their centroid by the given distance (so that touching shapes do not intersect)
+def shrink_points(points, distance):
+	n = float(len(points))
+	c = (sum([p[0] for p in points]) / n, sum([p[1] for p in points]) / n, sum([p[2] for p in points]) / n)
+	shrunk = []
+	for p in points:
+		v = _sub(p, c)
+		length = math.sqrt(_dot(v, v))
+		if length <= distance:
+			shrunk.append(c)
+		else:
+			f = 1.0 - distance / length
+			shrunk.append((c[0] + v[0]*f, c[1] + v[1]*f, c[2] + v[2]*f))
+	return shrunk
+
+
+## return the points of each convex piece of an approximate convex decomposition of a mesh
+def convex_decomposition(mesh, max_depth=4, tolerance=global_tolerance):
+	'''
+	Computes an approximate convex decomposition of a mesh, recursively splitting its faces at the median of their centers
+	(along the longest side of their bounding box) until each group of faces is convex.
+	Each piece is the convex hull of the vertices of a group of faces. If a group is still not convex at the maximum depth,
+	its hull would fill concave regions of the mesh, so no decomposition is returned.
+
+	Args:
+		mesh (Mesh): Mesh to decompose (ideally closed, with consistently oriented faces)
+		max_depth (int): Maximum number of recursive splits (at most 2^max_depth pieces)
+		tolerance (float): Tolerance for the convexity test
+
+	Returns:
+		pieces ([[tuple]]): List of pieces, each a list of points (x,y,z), or None if the mesh could not be split into convex pieces
+	'''
+	vertices = [(v.X, v.Y, v.Z) for v in mesh.Vertices]
+	faces = []
+	for f in mesh.Faces:
+		if f.IsQuad:
+			faces.append((f.A, f.B, f.C, f.D))
+		else:
+			faces.append((f.A, f.B, f.C))
+
+	## face normals and centers, oriented outwards (using the sign of the mesh volume)
+	normals = []
+	centers = []
+	volume = 0.0
+	for f in faces:
+		a, b, c = vertices[f[0]], vertices[f[1]], vertices[f[2]]
+		n = _cross(_sub(b, a), _sub(c, a))
+		if len(f) == 4:
+			n2 = _cross(_sub(c, a), _sub(vertices[f[3]], a))
+			n = (n[0]+n2[0], n[1]+n2[1], n[2]+n2[2])
+			volume += _dot(a, _cross(c, vertices[f[3]]))
+		volume += _dot(a, _cross(b, c))
+		normals.append(n)
+		centers.append(tuple([sum([vertices[i][k] for i in f]) / len(f) for k in range(3)]))
+	if volume < 0:
+		normals = [_neg(n) for n in normals]
+
+	## check if all vertices of a group of faces lie behind all their planes
+	def is_convex(face_ids, point_ids):
+		for fi in face_ids:
+			n = normals[fi]
+			length = math.sqrt(_dot(n, n))
+			if length == 0:
+				continue
+			p0 = vertices[faces[fi][0]]
+			for vi in point_ids:
+				if _dot(n, _sub(vertices[vi], p0)) > tolerance * length:
+					return False
+		return True
+
+	pieces = []
+	stack = [(list(range(len(faces))), 0)]
+	while len(stack) > 0:
+		face_ids, depth = stack.pop()
+		point_ids = sorted(set([vi for fi in face_ids for vi in faces[fi]]))
+		if len(face_ids) < 2 or is_convex(face_ids, point_ids):
+			pieces.append([vertices[vi] for vi in point_ids])
+			continue
+		if depth >= max_depth:
+			return None
+
+		## split at the median of the face centers along the longest side of their bounding box
+		extents = [max([centers[fi][k] for fi in face_ids]) - min([centers[fi][k] for fi in face_ids]) for k in range(3)]
+		axis = extents.index(max(extents))
+		sorted_ids = sorted(face_ids, key=lambda fi: centers[fi][axis])
+		half = len(sorted_ids) // 2
+		stack.append((sorted_ids[:half], depth + 1))
+		stack.append((sorted_ids[half:], depth + 1))
+
+	return pieces
@@ -0,0 +1,199 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Open-frontier index of live connections for stochastic aggregation
+"""
+
+import random
+
+
+#################################################################### Indexed Set ####################################################################
+class IndexedSet(object):
+	'''
+	Set supporting insertion, removal and uniform random choice in O(1)
+
+	Attributes:
+		items ([]): List of the items in the set
+		index ({}): Dictionary mapping each item to its position in the items list
+	'''
+
+	## constructor
+	def __init__(self):
+		self.items = []
+		self.index = {}
+
+
+	def __len__(self):
+		return len(self.items)
+
+
+	def __contains__(self, item):
+		return item in self.index
+
+
+	## add an item, and return True if it was not already in the set
+	def add(self, item):
+		if item in self.index:
+			return False
+		self.index[item] = len(self.items)
+		self.items.append(item)
+		return True
+
+
+	## remove an item (swapping it with the last one), and return True if it was in the set
+	def discard(self, item):
+		if item not in self.index:
+			return False
+		i = self.index.pop(item)
+		last = self.items.pop()
+		if i < len(self.items):
+			self.items[i] = last
+			self.index[last] = i
+		return True
+
+
+	## return a random item
+	def choice(self):
+		return self.items[random.randint(0, len(self.items)-1)]
+
+
+#################################################################### Aggregation Frontier ####################################################################
+class AggregationFrontier(object):
+	'''
+	Index of all live (part, connection, rule) triples of an aggregation, organized in three levels (parts > connections > rules).
+	Each level only contains entries with at least one live rule, so sampling a random part, connection and rule never hits a saturated part.
+	Triples are indexed both for all parts and for the name of the part each rule would place, to sample candidates of a given type.
+
+	Attributes:
+		parts ({}): Dictionary mapping a part name (or None for all parts) to the set of parts with live rules
+		connections ({}): Dictionary mapping (part name, part id) to the set of connections with live rules
+		rules ({}): Dictionary mapping (part name, part id, connection id) to the set of live rules
+		count (int): Number of live triples
+	'''
+
+	## constructor
+	def __init__(self):
+		self.parts = {}
+		self.connections = {}
+		self.rules = {}
+		self.count = 0
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspAggregationFrontier [size: %s]" % (self.count)
+
+
+	def __len__(self):
+		return self.count
+
+
+	## remove all triples
+	def clear(self):
+		self.parts = {}
+		self.connections = {}
+		self.rules = {}
+		self.count = 0
+
+
+	## add a triple to the index of the given key (part name or None)
+	def _add_to(self, key, part_id, conn_id, rule_id):
+		rules_key = (key, part_id, conn_id)
+		if rules_key not in self.rules:
+			self.rules[rules_key] = IndexedSet()
+		if not self.rules[rules_key].add(rule_id):
+			return False
+		if len(self.rules[rules_key]) == 1:
+			conns_key = (key, part_id)
+			if conns_key not in self.connections:
+				self.connections[conns_key] = IndexedSet()
+			self.connections[conns_key].add(conn_id)
+			if len(self.connections[conns_key]) == 1:
+				if key not in self.parts:
+					self.parts[key] = IndexedSet()
+				self.parts[key].add(part_id)
+		return True
+
+
+	## remove a triple from the index of the given key (part name or None)
+	def _discard_from(self, key, part_id, conn_id, rule_id):
+		rules_key = (key, part_id, conn_id)
+		if rules_key not in self.rules or not self.rules[rules_key].discard(rule_id):
+			return False
+		if len(self.rules[rules_key]) == 0:
+			del self.rules[rules_key]
+			conns_key = (key, part_id)
+			self.connections[conns_key].discard(conn_id)
+			if len(self.connections[conns_key]) == 0:
+				del self.connections[conns_key]
+				self.parts[key].discard(part_id)
+		return True
+
+
+	## add a live triple, given the name of the part placed by the rule
+	def add(self, part_id, conn_id, rule_id, part_name):
+		if self._add_to(None, part_id, conn_id, rule_id):
+			self._add_to(part_name, part_id, conn_id, rule_id)
+			self.count += 1
+
+
+	## remove a triple, given the name of the part placed by the rule
+	def discard(self, part_id, conn_id, rule_id, part_name):
+		if self._discard_from(None, part_id, conn_id, rule_id):
+			self._discard_from(part_name, part_id, conn_id, rule_id)
+			self.count -= 1
+
+
+	## add all live triples of an aggregated part
+	def add_part(self, part_id, part):
+		for conn_id in part.active_connections:
+			self.add_connection(part_id, part, conn_id)
+
+
+	## remove all triples of an aggregated part
+	def discard_part(self, part_id, part):
+		for conn_id in part.active_connections:
+			self.discard_connection(part_id, part, conn_id)
+
+
+	## add all live triples of a connection of an aggregated part
+	def add_connection(self, part_id, part, conn_id):
+		conn = part.connections[conn_id]
+		for rule_id in conn.active_rules:
+			self.add(part_id, conn_id, rule_id, conn.rules_table[rule_id].part2)
+
+
+	## remove all triples of a connection of an aggregated part
+	def discard_connection(self, part_id, part, conn_id):
+		conn = part.connections[conn_id]
+		for rule_id in conn.active_rules:
+			self.discard(part_id, conn_id, rule_id, conn.rules_table[rule_id].part2)
+
+
+	## return the names of all parts which can be placed by at least one live triple
+	def part_names(self):
+		return [key for key in self.parts if key is not None and len(self.parts[key]) > 0]
+
+
+	## return a random live triple (part id, connection id, rule id), optionally only among rules placing the given part name
+	def sample(self, part_name=None):
+		'''
+		Samples a random live triple, choosing uniformly a part, then one of its live connections, then one of its live rules
+
+		Args:
+			part_name (str): Optional name of the part to be placed by the sampled rule
+
+		Returns:
+			triple (tuple): (part id, connection id, rule id), or None if no triple is available
+		'''
+		if part_name not in self.parts or len(self.parts[part_name]) == 0:
+			return None
+		part_id = self.parts[part_name].choice()
+		conn_id = self.connections[(part_name, part_id)].choice()
+		rule_id = self.rules[(part_name, part_id, conn_id)].choice()
+		return part_id, conn_id, rule_id
@@ -121,14 +121,17 @@ class Graph(object):
 			self.graph_dict[start_id][end_id] = edge_dict		
 	
 	## remove a node and all its relative edges
-	def remove_node(self, id):
+	## if the list of nodes with edges to the removed one is known, only those are checked
+	def remove_node(self, id, in_nodes=None):
 		# delete the node
 		if id in self.graph_dict:
 			del self.graph_dict[id]
 		
 		# delete the edges associated with the node
-		for node in self.graph_dict:
-			if id in self.graph_dict[node]:
+		if in_nodes is None:
+			in_nodes = self.graph_dict.keys()
+		for node in in_nodes:
+			if node in self.graph_dict and id in self.graph_dict[node]:
 				del self.graph_dict[node][id]		
 
 
@@ -0,0 +1,45 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Placement journal, recording the changes caused by each placement to undo them incrementally
+"""
+
+
+#################################################################### Placement Record ####################################################################
+class PlacementRecord(object):
+	'''
+	Changes caused by the placement of an aggregated part, and by the aggregation steps performed until the next placement
+
+	Args:
+		_part_id (int): Position of the placed part in the aggregated parts list
+		_parent_id (int): Position of the parent part, or None for the first part
+
+	Attributes:
+		part_id (int): Position of the placed part in the aggregated parts list
+		parent_id (int): Position of the parent part, or None for the first part
+		catalog_name (str): Name of the part removed from the catalog, or None if no catalog was updated
+		deactivated ([]): Deactivated connections (part_id, conn_id) and rules (part_id, conn_id, rule_id), in order
+		queue_pushed ([]): Aggregation queue entries added
+		queue_popped ([]): Aggregation queue entries removed
+	'''
+
+	__slots__ = ('part_id', 'parent_id', 'catalog_name', 'deactivated', 'queue_pushed', 'queue_popped')
+
+	## constructor
+	def __init__(self, _part_id, _parent_id=None):
+		self.part_id = _part_id
+		self.parent_id = _parent_id
+		self.catalog_name = None
+		self.deactivated = []
+		self.queue_pushed = []
+		self.queue_popped = []
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspPlacementRecord [part: %s, parent: %s, deactivated: %s]" % (self.part_id, self.parent_id, len(self.deactivated))
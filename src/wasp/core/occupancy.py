@@ -0,0 +1,183 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Voxel occupancy grid of aggregated parts colliders
+"""
+
+import math
+
+from wasp.geometry import Point3d
+from wasp import global_tolerance
+
+
+#################################################################### Occupancy Grid ####################################################################
+class OccupancyGrid(object):
+	'''
+	Voxel grid storing, for each cell, which parts colliders cross it (boundary cells) and which parts colliders fully contain it (full cells).
+	Boundary cells are computed conservatively from the bounding boxes of the collider faces, so two meshes can only intersect in a shared boundary cell.
+	Full cells are computed only for closed colliders, testing the cell centers not crossed by the collider surface.
+
+	Args:
+		_voxel_size (float): Size of the grid cells
+		_tolerance (float): Distance added around each face when computing boundary cells
+
+	Attributes:
+		voxel_size (float): Size of the grid cells
+		tolerance (float): Distance added around each face when computing boundary cells
+		boundary ({}): Dictionary mapping cell keys (i,j,k) to the set of ids of parts crossing the cell
+		full ({}): Dictionary mapping cell keys (i,j,k) to the set of ids of parts containing the cell
+		items ({}): Dictionary mapping part ids to their (boundary keys, full keys)
+	'''
+
+	## constructor
+	def __init__(self, _voxel_size, _tolerance=global_tolerance):
+		self.voxel_size = float(_voxel_size)
+		self.tolerance = _tolerance
+		self.boundary = {}
+		self.full = {}
+		self.items = {}
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspOccupancyGrid [voxel size: %s, parts: %s, boundary cells: %s, full cells: %s]" % (self.voxel_size, len(self.items), len(self.boundary), len(self.full))
+
+
+	def __len__(self):
+		return len(self.items)
+
+
+	## remove all parts
+	def clear(self):
+		self.boundary = {}
+		self.full = {}
+		self.items = {}
+
+
+	## return the key of the cell containing a point
+	def cell_key(self, x, y, z):
+		return (int(math.floor(x / self.voxel_size)), int(math.floor(y / self.voxel_size)), int(math.floor(z / self.voxel_size)))
+
+
+	## return the center of a cell
+	def cell_center(self, key):
+		return Point3d((key[0] + 0.5) * self.voxel_size, (key[1] + 0.5) * self.voxel_size, (key[2] + 0.5) * self.voxel_size)
+
+
+	## return the keys of all cells overlapped by the given bounds (min_x, min_y, min_z, max_x, max_y, max_z)
+	def box_keys(self, bounds):
+		k0 = self.cell_key(bounds[0], bounds[1], bounds[2])
+		k1 = self.cell_key(bounds[3], bounds[4], bounds[5])
+		return [(i, j, k) for i in range(k0[0], k1[0]+1) for j in range(k0[1], k1[1]+1) for k in range(k0[2], k1[2]+1)]
+
+
+	## return the keys of all cells overlapped by the bounding boxes of the mesh faces (enlarged by the tolerance)
+	def surface_keys(self, mesh):
+		vertices = [(v.X, v.Y, v.Z) for v in mesh.Vertices]
+		keys = set()
+		t = self.tolerance
+		for f in mesh.Faces:
+			face_vertices = [vertices[f.A], vertices[f.B], vertices[f.C]]
+			if f.IsQuad:
+				face_vertices.append(vertices[f.D])
+			xs = [v[0] for v in face_vertices]
+			ys = [v[1] for v in face_vertices]
+			zs = [v[2] for v in face_vertices]
+			keys.update(self.box_keys((min(xs)-t, min(ys)-t, min(zs)-t, max(xs)+t, max(ys)+t, max(zs)+t)))
+		return keys
+
+
+	## return the keys of all cells containing a vertex of the mesh
+	def vertex_keys(self, mesh):
+		return set([self.cell_key(v.X, v.Y, v.Z) for v in mesh.Vertices])
+
+
+	## return the keys of all cells inside a closed mesh and not crossed by its surface
+	def interior_keys(self, mesh, surface_keys):
+		keys = set()
+		if not mesh.IsClosed:
+			return keys
+		bbox = mesh.GetBoundingBox(True)
+		for key in self.box_keys((bbox.Min.X, bbox.Min.Y, bbox.Min.Z, bbox.Max.X, bbox.Max.Y, bbox.Max.Z)):
+			if key not in surface_keys and mesh.IsPointInside(self.cell_center(key), self.tolerance, True):
+				keys.add(key)
+		return keys
+
+
+	## add the collider meshes of a part to the grid
+	def insert(self, id, meshes):
+		if id in self.items:
+			self.remove(id)
+		boundary_keys = set()
+		full_keys = set()
+		for mesh in meshes:
+			mesh_keys = self.surface_keys(mesh)
+			boundary_keys.update(mesh_keys)
+			full_keys.update(self.interior_keys(mesh, mesh_keys))
+		full_keys.difference_update(boundary_keys)
+
+		for key in boundary_keys:
+			if key not in self.boundary:
+				self.boundary[key] = set()
+			self.boundary[key].add(id)
+		for key in full_keys:
+			if key not in self.full:
+				self.full[key] = set()
+			self.full[key].add(id)
+		self.items[id] = (boundary_keys, full_keys)
+
+
+	## remove a part from the grid
+	def remove(self, id):
+		if id not in self.items:
+			return
+		boundary_keys, full_keys = self.items.pop(id)
+		for key in boundary_keys:
+			self.boundary[key].discard(id)
+			if len(self.boundary[key]) == 0:
+				del self.boundary[key]
+		for key in full_keys:
+			self.full[key].discard(id)
+			if len(self.full[key]) == 0:
+				del self.full[key]
+
+
+	## classify a collider mesh against the grid
+	def check_mesh(self, mesh):
+		'''
+		Classifies a mesh against the parts stored in the grid
+
+		Args:
+			mesh (Mesh): Collider mesh to check
+
+		Returns:
+			state (int): 1 if the mesh certainly collides (a vertex lies in a full cell), 0 if it certainly does not intersect any part, -1 if undecided
+			ids (set): Ids of the parts which might intersect the mesh (sharing a boundary cell), only for undecided meshes
+		'''
+		for key in self.vertex_keys(mesh):
+			if key in self.full:
+				return 1, set()
+		ids = set()
+		for key in self.surface_keys(mesh):
+			if key in self.full:
+				ids.update(self.full[key])
+			if key in self.boundary:
+				ids.update(self.boundary[key])
+		if len(ids) == 0:
+			return 0, ids
+		return -1, ids
+
+
+	## estimate the free space around a point, as the fraction of empty cells within the given distance
+	def free_space(self, pt, radius):
+		keys = self.box_keys((pt.X - radius, pt.Y - radius, pt.Z - radius, pt.X + radius, pt.Y + radius, pt.Z + radius))
+		empty_count = 0
+		for key in keys:
+			if key not in self.boundary and key not in self.full:
+				empty_count += 1
+		return float(empty_count) / len(keys)
@@ -0,0 +1,184 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Columnar store of aggregated parts state
+"""
+
+import math
+from array import array
+
+from wasp.utilities import mask_count
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+## entries of a transform matrix, in row-major order
+TRANSFORM_KEYS = ('M00', 'M01', 'M02', 'M03', 'M10', 'M11', 'M12', 'M13', 'M20', 'M21', 'M22', 'M23', 'M30', 'M31', 'M32', 'M33')
+
+
+## return the parent of a part as an int id (parents can be stored as ids, id strings or part objects), or -1 if it has none
+def parent_id(parent):
+	if parent is None:
+		return -1
+	if hasattr(parent, 'id'):
+		parent = parent.id
+	try:
+		return int(parent)
+	except (TypeError, ValueError):
+		return -1
+
+
+#################################################################### Part Store ####################################################################
+class PartStore(object):
+	'''
+	Struct-of-arrays copy of the state of aggregated parts, indexed by position in the aggregated parts list.
+	Columns are stored in contiguous typed arrays, to scan all parts without touching the part objects
+	(and without creating geometry objects for each comparison).
+
+	Attributes:
+		centers (array): Part centers, as 3 consecutive doubles per part
+		dims (array): Part sizes (Part.dim)
+		transforms (array): Part transformations, as 16 consecutive doubles per part (row-major)
+		type_ids (array): Part type ids, as positions in the type_names list
+		parent_ids (array): Parent ids (-1 for parts without parent or with a parent that is not an int id)
+		active_masks ([]): Bitmask of the active connections of each part
+		type_names ([]): List of part names, indexed by type id
+		type_index ({}): Dictionary mapping part names to type ids
+	'''
+
+	## constructor
+	def __init__(self):
+		self.type_names = []
+		self.type_index = {}
+		self.clear()
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspPartStore [parts: %s, types: %s]" % (len(self.dims), len(self.type_names))
+
+
+	def __len__(self):
+		return len(self.dims)
+
+
+	## remove all parts (type ids are kept)
+	def clear(self):
+		self.centers = array('d')
+		self.dims = array('d')
+		self.transforms = array('d')
+		self.type_ids = array('i')
+		self.parent_ids = array('i')
+		self.active_masks = []
+
+
+	## return the type id of a part name, adding it if not present
+	def type_id(self, name):
+		if name not in self.type_index:
+			self.type_index[name] = len(self.type_names)
+			self.type_names.append(name)
+		return self.type_index[name]
+
+
+	## add a part at the end of the store
+	def append(self, part):
+		self.centers.extend((part.center.X, part.center.Y, part.center.Z))
+		self.dims.append(part.dim)
+		self.transforms.extend([getattr(part.transformation, key) for key in TRANSFORM_KEYS])
+		self.type_ids.append(self.type_id(part.name))
+		self.parent_ids.append(parent_id(part.parent))
+		self.active_masks.append(part.active_connections_mask)
+
+
+	## remove all parts after the given position
+	def truncate(self, num):
+		del self.centers[3*num:]
+		del self.dims[num:]
+		del self.transforms[16*num:]
+		del self.type_ids[num:]
+		del self.parent_ids[num:]
+		del self.active_masks[num:]
+
+
+	## sync the store with a list of parts, assuming the parts already stored did not change
+	def update(self, parts):
+		if len(self) > len(parts):
+			self.truncate(len(parts))
+		for i in range(len(self), len(parts)):
+			self.append(parts[i])
+
+
+	## recompute the whole store from a list of parts
+	def rebuild(self, parts):
+		self.clear()
+		self.update(parts)
+
+
+	## update the active connections bitmask of a stored part
+	def update_mask(self, id, part):
+		self.active_masks[id] = part.active_connections_mask
+
+
+	## return the center of a stored part as a (x,y,z) tuple
+	def center(self, id):
+		return self.centers[3*id], self.centers[3*id+1], self.centers[3*id+2]
+
+
+	## return the name of a stored part
+	def name(self, id):
+		return self.type_names[self.type_ids[id]]
+
+
+	## return the distance between the center of a stored part and a point
+	def distance_to(self, id, pt):
+		dx = self.centers[3*id] - pt.X
+		dy = self.centers[3*id+1] - pt.Y
+		dz = self.centers[3*id+2] - pt.Z
+		return math.sqrt(dx*dx + dy*dy + dz*dz)
+
+
+	## return the number of stored parts for each part name
+	def count_by_type(self):
+		counts = [0] * len(self.type_names)
+		for type_id in self.type_ids:
+			counts[type_id] += 1
+		return dict([(self.type_names[i], counts[i]) for i in range(len(counts)) if counts[i] > 0])
+
+
+	## return the ids of all parts with at least one active connection
+	def open_parts(self):
+		return [i for i in range(len(self.active_masks)) if self.active_masks[i] != 0]
+
+
+	## return the total number of active connections of all stored parts
+	def count_active_connections(self):
+		return sum([mask_count(mask) for mask in self.active_masks])
+
+
+	## return NumPy views of the numeric columns (sharing memory with the store), or None if NumPy is not available
+	def as_numpy(self):
+		'''
+		Returns the numeric columns as NumPy arrays, for vectorized analysis of the aggregation.
+		The arrays share memory with the store, so they are only valid until the next append or truncate.
+
+		Returns:
+			columns ({}): Dictionary with keys centers (n,3), dims (n), transforms (n,4,4), type_ids (n) and parent_ids (n)
+		'''
+		if np is None:
+			return None
+		n = len(self)
+		columns = {}
+		columns['centers'] = np.frombuffer(self.centers, dtype=np.float64).reshape((n, 3))
+		columns['dims'] = np.frombuffer(self.dims, dtype=np.float64)
+		columns['transforms'] = np.frombuffer(self.transforms, dtype=np.float64).reshape((n, 4, 4))
+		columns['type_ids'] = np.frombuffer(self.type_ids, dtype=np.intc)
+		columns['parent_ids'] = np.frombuffer(self.parent_ids, dtype=np.intc)
+		return columns
@@ -9,12 +9,13 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 Part classes and utilities
 """
 
-from Rhino.Geometry import Transform
-from Rhino.Geometry import Point3d
-from Rhino.Geometry import AreaMassProperties
+from wasp.geometry import Transform
+from wasp.geometry import Point3d
+from wasp.geometry import AreaMassProperties
 
 from wasp.utilities import mesh_from_data, mesh_to_data
 from wasp.utilities import transform_from_data, transform_to_data
+from wasp.utilities import mask_from_list, mask_to_list
 from wasp.core import Connection
 from wasp.core.colliders import Collider
 from wasp.core.constraints import Adjacency_Constraint
@@ -26,27 +27,35 @@ import random
 class Part(object):
 	
 	## constructor
-	def __init__(self, name, geometry, connections, collider, attributes, dim=None, id=None, field=None):
+	def __init__(self, name, geometry, connections, collider, attributes, dim=None, id=None, field=None, center=None):
 		
 		self.name = name
 		self.id = id
+
+		## instanced parts store only a reference to a base part and the transformation from it
+		self.base_part = None
+		self.base_transformation = None
+		self.base_inverse = None
 		self.geo = geometry
 		
 		self.field = field
 		
 		self.connections = []
-		self.active_connections = []
 
 		count = 0
 		for conn in connections:
 			conn.part = self.name
 			conn.id = count
 			self.connections.append(conn)
-			self.active_connections.append(count)
 			count += 1
+		## bitmask of active connections (bit i set if connection i is active)
+		self.active_connections_mask = (1 << count) - 1
 		
 		self.transformation = Transform.Identity
-		self.center = AreaMassProperties.Compute(self.geo).Centroid
+		if center is not None:
+			self.center = center
+		else:
+			self.center = AreaMassProperties.Compute(self.geo).Centroid
 		self.collider = collider
 		
 		##part size
@@ -57,7 +66,7 @@ class Part(object):
 			for coll_geo in self.collider.geometry:
 				for v in coll_geo.Vertices:
 					dist = self.center.DistanceTo(v)
-					if dist > max_collider_dist or max_collider_dist is None:
+					if max_collider_dist is None or dist > max_collider_dist:
 						max_collider_dist = dist
 			
 			self.dim = max_collider_dist
@@ -79,26 +88,111 @@ class Part(object):
 		return "WaspPart [name: %s, id: %s]" % (self.name, self.id)
 	
 
+	## part geometry (materialized from the base part when first needed, for instanced parts)
+	@property
+	def geo(self):
+		if self._geo is None and self.base_part is not None:
+			self._geo = self.base_part.geo.Duplicate()
+			self._geo.Transform(self.base_transformation)
+		return self._geo
+	
+	@geo.setter
+	def geo(self, geometry):
+		self._geo = geometry
+	
+
+	## indexes of active connections, in increasing order (stored as a bitmask)
+	@property
+	def active_connections(self):
+		return mask_to_list(self.active_connections_mask)
+	
+	@active_connections.setter
+	def active_connections(self, conn_ids):
+		self.active_connections_mask = mask_from_list(conn_ids)
+	
+
+	## part collider (materialized from the base part when first needed, for instanced parts)
+	@property
+	def collider(self):
+		if self._collider is None and self.base_part is not None:
+			self._collider = self.base_part.collider.transform(self.base_transformation)
+		return self._collider
+	
+	@collider.setter
+	def collider(self, collider):
+		self._collider = collider
+	
+
+	## check if the part is an instance of a base part
+	def is_instance(self):
+		return self.base_part is not None
+	
+
+	## set the part as an instance of the given part, transformed by trans
+	def set_base_part(self, part, trans):
+		if part.base_part is not None:
+			self.base_part = part.base_part
+			self.base_transformation = Transform.Multiply(trans, part.base_transformation)
+		else:
+			self.base_part = part
+			self.base_transformation = trans
+		self.base_inverse = None
+		self._geo = None
+		self._collider = None
+	
+
+	## return the inverse of the transformation from the base part (computed when first needed), or None for non-instanced parts
+	def return_base_inverse(self):
+		if self.base_inverse is None and self.base_part is not None:
+			success, inverse = self.base_transformation.TryGetInverse()
+			if success:
+				self.base_inverse = inverse
+		return self.base_inverse
+	
+
+	## discard the world-space geometry and collider of an instanced part (they will be materialized again when needed)
+	def release_geometry(self):
+		if self.base_part is not None:
+			self._geo = None
+			self._collider = None
+	
+
+	## turn an instanced part into a part owning its geometry and collider, to edit them in place without losing the changes on release
+	def detach_geometry(self):
+		if self.base_part is not None:
+			geo = self.geo
+			collider = self.collider
+			self.base_part = None
+			self.base_transformation = None
+			self.base_inverse = None
+			self._geo = geo
+			self._collider = collider
+	
+
 	## create class from data dictionary
 	@classmethod
 	def from_data(cls, data, base_part=None):
 		p_name = data['name']
-		if data.has_key('geometry'):
+		p_center = None
+		if 'geometry' in data:
 			p_geometry = mesh_from_data(data['geometry'])
 		elif base_part is not None:
-			p_geometry = base_part.geo.Duplicate()
+			## instance of the base part, geometry is materialized when needed
+			p_geometry = None
 			p_trasform = transform_from_data(data['transform'])
-			p_geometry.Transform(p_trasform)
+			p_center = base_part.transform_center(p_trasform)
 		else:
 			return None
 
 		p_connections = [Connection.from_data(c_data) for c_data in data['connections']]
 
-		if data.has_key('collider'):
+		if 'collider' in data:
 			p_collider = Collider.from_data(data['collider'])
+		elif base_part is not None and p_geometry is not None:
+			p_collider = base_part.collider.transform(transform_from_data(data['transform']), transform_connections=True, maintain_valid=True)
 		elif base_part is not None:
-			p_trasform = transform_from_data(data['transform'])
-			p_collider = base_part.collider.transform(p_trasform, transform_connections=True, maintain_valid=True)
+			## instance of the base part, collider is materialized when needed
+			p_collider = None
 		else:
 			return None
 			
@@ -113,7 +207,11 @@ class Part(object):
 		
 		p_field = data['field']
 
-		part = cls(p_name, p_geometry, p_connections, p_collider, p_attributes, dim=p_dim, id=p_id, field=p_field)
+		part = cls(p_name, p_geometry, p_connections, p_collider, p_attributes, dim=p_dim, id=p_id, field=p_field, center=p_center)
+		if p_geometry is None:
+			part.set_base_part(base_part, p_trasform)
+			if p_collider is not None:
+				part.collider = p_collider
 
 		part.transformation = transform_from_data(data['transform'])
 		part.parent = data['parent']
@@ -154,13 +252,10 @@ class Part(object):
 
 
 	## reset the part and connections according to new provided aggregation rules
-	def reset_part(self, rules):
-		count = 0
-		self.active_connections = []
+	def reset_part(self, rules, rules_tables=None):
 		for conn in self.connections:
-			conn.generate_rules_table(rules)
-			self.active_connections.append(count)
-			count += 1
+			conn.generate_rules_table(rules, rules_tables)
+		self.active_connections_mask = (1 << len(self.connections)) - 1
 	
 	
 	## return a dictionary containing all part data
@@ -181,59 +276,60 @@ class Part(object):
 		return data
 	
 
-	## return a transformed copy of the part
+	## return a transformed copy of the part, as an instance sharing geometry and collider with the base part
 	def transform(self, trans, transform_sub_parts=False, maintain_parenting = False):
-		geo_trans = self.geo.Duplicate()
-		geo_trans.Transform(trans)
-		
-		collider_trans = self.collider.transform(trans)
-		
-		connections_trans = []
-		for conn in self.connections:
-			connections_trans.append(conn.transform(trans))
-		
-		attributes_trans = []
-		if len(self.attributes) > 0:
-			for attr in self.attributes:
-				attributes_trans.append(attr.transform(trans))
-		
-		part_trans = Part(self.name, geo_trans, connections_trans, collider_trans, attributes_trans, dim=self.dim, id=self.id, field=self.field)
-
-		part_trans.transformation = Transform.Multiply(trans, self.transformation)
-
-		if maintain_parenting:
-			part_trans.parent = self.parent
-			part_trans.conn_on_parent = self.conn_on_parent
-			part_trans.conn_to_parent = self.conn_to_parent
-			part_trans.children = self.children
-
-		return part_trans
+		return self._clone(trans, maintain_parenting=maintain_parenting)
 	
-	## return a copy of the part
+	## return a copy of the part (copies of instanced parts are instances of the same base part)
 	def copy(self, maintain_parenting = False):
-		geo_copy = self.geo.Duplicate()
-		
-		collider_copy = self.collider.copy()
-		
-		connections_copy = []
-		for conn in self.connections:
-			connections_copy.append(conn.copy())
-		
-		attributes_copy = []
-		if len(self.attributes) > 0:
-			for attr in self.attributes:
-				attributes_copy.append(attr.copy())
-		
-		part_copy = Part(self.name, geo_copy, connections_copy, collider_copy, attributes_copy, dim=self.dim, id=self.id, field=self.field)
-		part_copy.transformation = self.transformation
-
+		return self._clone(maintain_parenting=maintain_parenting)
+	
+	## internal clone, transforming cached derived data (center, dim, connection frames) instead of recomputing them
+	def _clone(self, trans=None, maintain_parenting=False):
+		part_clone = self.__class__.__new__(self.__class__)
+		part_clone.name = self.name
+		part_clone.id = self.id
+		part_clone.field = self.field
+		part_clone.dim = self.dim
+		part_clone.is_constrained = False
+		
+		part_clone.connections = [conn._clone(trans) for conn in self.connections]
+		part_clone.active_connections_mask = (1 << len(part_clone.connections)) - 1
+		
+		part_clone.attributes = []
+		for attr in self.attributes:
+			if trans is not None:
+				part_clone.attributes.append(attr.transform(trans))
+			else:
+				part_clone.attributes.append(attr.copy())
+		
+		part_clone.center = Point3d(self.center)
+		if trans is not None:
+			part_clone.center.Transform(trans)
+			part_clone.set_base_part(self, trans)
+			part_clone.transformation = Transform.Multiply(trans, self.transformation)
+		elif self.base_part is not None:
+			part_clone.set_base_part(self.base_part, self.base_transformation)
+			part_clone.transformation = self.transformation
+		else:
+			part_clone.base_part = None
+			part_clone.base_transformation = None
+			part_clone.base_inverse = None
+			part_clone.geo = self.geo.Duplicate()
+			part_clone.collider = self.collider._clone()
+			part_clone.transformation = self.transformation
+		
+		part_clone.parent = None
+		part_clone.conn_on_parent = None
+		part_clone.conn_to_parent = None
+		part_clone.children = []
 		if maintain_parenting:
-			part_copy.parent = self.parent
-			part_copy.conn_on_parent = self.conn_on_parent
-			part_copy.conn_to_parent = self.conn_to_parent
-			part_copy.children = self.children
-
-		return part_copy
+			part_clone.parent = self.parent
+			part_clone.conn_on_parent = self.conn_on_parent
+			part_clone.conn_to_parent = self.conn_to_parent
+			part_clone.children = self.children
+		
+		return part_clone
 	
 	## return transformed center point of the part
 	def transform_center(self, trans):
@@ -250,9 +346,9 @@ class Part(object):
 class AdvancedPart(Part):
 	
 	## constructor
-	def __init__(self, name, geometry, connections, collider, attributes, additional_collider, supports, dim = None, id=None, field=None, sub_parts=[], adjacency_const = [], orientation_const=[]):
+	def __init__(self, name, geometry, connections, collider, attributes, additional_collider, supports, dim = None, id=None, field=None, sub_parts=[], adjacency_const = [], orientation_const=[], center=None):
 		
-		super(AdvancedPart, self).__init__(name, geometry, connections, collider, attributes, dim=dim, id=id, field=field)
+		super(AdvancedPart, self).__init__(name, geometry, connections, collider, attributes, dim=dim, id=id, field=field, center=center)
 		
 		self.add_collider = additional_collider
 		self.supports = supports
@@ -278,13 +374,15 @@ class AdvancedPart(Part):
 	@classmethod
 	def from_data(cls, data, base_part=None):
 		p_name = data['name']
+		p_center = None
 		
-		if data.has_key('geometry'):
+		if 'geometry' in data:
 			p_geometry = mesh_from_data(data['geometry'])
 		elif base_part is not None:
-			p_geometry = base_part.geo.Duplicate()
+			## instance of the base part, geometry is materialized when needed
+			p_geometry = None
 			p_transform = transform_from_data(data['transform'])
-			p_geometry.Transform(p_transform)
+			p_center = base_part.transform_center(p_transform)
 		else:
 			return None
 
@@ -308,7 +406,10 @@ class AdvancedPart(Part):
 		p_sub_parts = [AdvancedPart.from_data(sp_data) for sp_data in data['sub_parts']]
 		p_adjacency_const = [Adjacency_Constraint.from_data(adj_data) for adj_data in data['adjacency_const']]
 
-		adv_part = cls(p_name, p_geometry, p_connections, p_collider, p_attributes, p_add_collider, p_supports, dim=p_dim, id=p_id, field=p_field, sub_parts=p_sub_parts, adjacency_const=p_adjacency_const)
+		adv_part = cls(p_name, p_geometry, p_connections, p_collider, p_attributes, p_add_collider, p_supports, dim=p_dim, id=p_id, field=p_field, sub_parts=p_sub_parts, adjacency_const=p_adjacency_const, center=p_center)
+		if p_geometry is None:
+			adv_part.set_base_part(base_part, p_transform)
+			adv_part.collider = p_collider
 
 		adv_part.transformation = transform_from_data(data['transform'])
 
@@ -381,142 +482,46 @@ class AdvancedPart(Part):
 		return data_dict
 	
 
-	## return a transformed copy of the part
+	## return a transformed copy of the part, as an instance sharing geometry and collider with the base part
 	def transform(self, trans, transform_sub_parts=False, sub_level = 0, maintain_parenting = False):
-		geo_trans = self.geo.Duplicate()
-		geo_trans.Transform(trans)
-		
-		collider_trans = self.collider.transform(trans)
-		
-		connections_trans = []
-		for conn in self.connections:
-			connections_trans.append(conn.transform(trans))
-		
-		attributes_trans = []
-		if len(self.attributes) > 0:
-			for attr in self.attributes:
-				attributes_trans.append(attr.transform(trans))
-		
-		add_collider_trans = None
-		if(self.add_collider != None):
-			add_collider_trans = self.add_collider.transform(trans, transform_connections=True, maintain_valid=True)
-			
-		supports_trans = []
-		if len(self.supports) > 0:
-			for sup in self.supports:
-				sup_trans = sup.transform(trans)
-				supports_trans.append(sup_trans)
-
-		adjacency_const_trans = []
-		if len(self.adjacency_const) > 0:
-			for ac in self.adjacency_const:
-				ac_trans = ac.transform(trans)
-				adjacency_const_trans.append(ac_trans)
-		
-		orient_const_trans = []
-		if len(self.orientation_const) > 0:
-			for oc in self.orientation_const:
-				oc_trans = oc.transform(trans)
-				orient_const_trans.append(oc_trans)
-
-		if transform_sub_parts and len(self.sub_parts) > 0 and sub_level > 0:
-			sub_parts_trans = []
-			for sp in self.sub_parts:
-				sp_trans = sp.transform(trans, transform_sub_parts = True, sub_level = sub_level - 1)
-				sub_parts_trans.append(sp_trans)
-			part_trans = AdvancedPart(self.name, geo_trans, connections_trans, collider_trans, attributes_trans, add_collider_trans, supports_trans, dim=self.dim, id=self.id, field=self.field, sub_parts=sub_parts_trans, adjacency_const = adjacency_const_trans, orientation_const=orient_const_trans)
-			part_trans.transformation = Transform.Multiply(trans, self.transformation)
-			part_trans.is_constrained = True
-			
-			if maintain_parenting:
-				part_trans.parent = self.parent
-				part_trans.conn_on_parent = self.conn_on_parent
-				part_trans.conn_to_parent = self.conn_to_parent
-				part_trans.children = self.children
-
-			return part_trans
-		
-		else:
-			part_trans = AdvancedPart(self.name, geo_trans, connections_trans, collider_trans, attributes_trans, add_collider_trans, supports_trans, dim=self.dim, id=self.id, field=self.field, sub_parts=self.sub_parts, adjacency_const = adjacency_const_trans, orientation_const=orient_const_trans)
-			part_trans.transformation = Transform.Multiply(trans, self.transformation)
-			part_trans.is_constrained = True
-			
-			if maintain_parenting:
-				part_trans.parent = self.parent
-				part_trans.conn_on_parent = self.conn_on_parent
-				part_trans.conn_to_parent = self.conn_to_parent
-				part_trans.children = self.children
-
-			return part_trans
+		return self._clone(trans, maintain_parenting=maintain_parenting, transform_sub_parts=transform_sub_parts, sub_level=sub_level)
 	
 	
-	## return a copy of the part		
+	## return a copy of the part (copies of instanced parts are instances of the same base part)
 	def copy(self, maintain_parenting = False):
-		geo_copy = self.geo.Duplicate()
-		
-		collider_copy = self.collider.copy()
+		return self._clone(maintain_parenting=maintain_parenting)
+	
+	
+	## internal clone, extending the Part clone with additional collider, constraints and sub-parts
+	def _clone(self, trans=None, maintain_parenting=False, transform_sub_parts=False, sub_level=0):
+		part_clone = super(AdvancedPart, self)._clone(trans, maintain_parenting=maintain_parenting)
+		part_clone.is_constrained = True
+		part_clone.hierarchy_level = self.hierarchy_level
 		
-		connections_copy = []
-		for conn in self.connections:
-			connections_copy.append(conn.copy())
+		part_clone.add_collider = None
+		if self.add_collider is not None:
+			if trans is not None:
+				part_clone.add_collider = self.add_collider.transform(trans, transform_connections=True, maintain_valid=True)
+			else:
+				part_clone.add_collider = self.add_collider.copy()
 		
-		attributes_copy = []
-		if len(self.attributes) > 0:
-			for attr in self.attributes:
-				attributes_copy.append(attr.copy())
+		if trans is not None:
+			part_clone.supports = [sup.transform(trans) for sup in self.supports]
+			part_clone.adjacency_const = [ac.transform(trans) for ac in self.adjacency_const]
+			part_clone.orientation_const = [oc.transform(trans) for oc in self.orientation_const]
+		else:
+			part_clone.supports = [sup.copy() for sup in self.supports]
+			part_clone.adjacency_const = [ac.copy() for ac in self.adjacency_const]
+			part_clone.orientation_const = [oc.copy() for oc in self.orientation_const]
 		
-		add_collider_copy = None
-		if(self.add_collider != None):
-			add_collider_copy = self.add_collider.copy()
-			
-		supports_copy = []
-		if len(self.supports) > 0:
-			for sup in self.supports:
-				sup_copy = sup.copy()
-				supports_copy.append(sup_copy)
-		
-		adjacency_const_copy = []
-		if len(self.adjacency_const) > 0:
-			for ac in self.adjacency_const:
-				ac_copy = ac.copy()
-				adjacency_const_copy.append(ac_copy)
-		
-		orient_const_copy = []
-		if len(self.orientation_const) > 0:
-			for oc in self.orientation_const:
-				oc_copy = oc.copy()
-				orient_const_copy.append(oc_copy)
-
-		if len(self.sub_parts) > 0:
-			sub_parts_copy = []
-			for sp in self.sub_parts:
-				sp_copy = sp.copy()
-				sub_parts_copy.append(sp_copy)
-			
-			part_copy = AdvancedPart(self.name, geo_copy, connections_copy, collider_copy, attributes_copy, add_collider_copy, supports_copy, dim=self.dim, id=self.id, field=self.field, sub_parts=sub_parts_copy, adjacency_const=adjacency_const_copy, orientation_const=orient_const_copy)
-			part_copy.transformation = self.transformation
-			part_copy.is_constrained = True
-			
-			if maintain_parenting:
-				part_copy.parent = self.parent
-				part_copy.conn_on_parent = self.conn_on_parent
-				part_copy.conn_to_parent = self.conn_to_parent
-				part_copy.children = self.children
-			
-			return part_copy
+		part_clone.sub_parts = self.sub_parts
+		if trans is not None:
+			if transform_sub_parts and len(self.sub_parts) > 0 and sub_level > 0:
+				part_clone.sub_parts = [sp.transform(trans, transform_sub_parts = True, sub_level = sub_level - 1) for sp in self.sub_parts]
+		elif len(self.sub_parts) > 0:
+			part_clone.sub_parts = [sp.copy() for sp in self.sub_parts]
 		
-		else:
-			part_copy = AdvancedPart(self.name, geo_copy, connections_copy, collider_copy, attributes_copy, add_collider_copy, supports_copy, dim=self.dim, id=self.id, field=self.field, sub_parts=self.sub_parts, adjacency_const=adjacency_const_copy, orientation_const=orient_const_copy)
-			part_copy.transformation = self.transformation
-			part_copy.is_constrained = True
-			
-			if maintain_parenting:
-				part_copy.parent = self.parent
-				part_copy.conn_on_parent = self.conn_on_parent
-				part_copy.conn_to_parent = self.conn_to_parent
-				part_copy.children = self.children
-			
-			return part_copy
+		return part_clone
 
 
 ################################################################# Parts Catalog ##################################################################
@@ -569,12 +574,21 @@ class PartCatalog(object):
 	
 
 	## return a weighted-choice between the available parts, give the available parts amounts
-	def return_weighted_part(self):
+	## if a list of part names is given, the choice is limited to those parts
+	def return_weighted_part(self, part_names=None):
 		if self.parts_total == 0:
 			self.is_empty = True
 			return None
-		n = random.uniform(0, self.parts_total)
-		for key in self.dict:
+		if part_names is None:
+			keys = self.dict.keys()
+			total = self.parts_total
+		else:
+			keys = [key for key in self.dict if key in part_names]
+			total = sum([self.dict[key] for key in keys])
+			if total <= 0:
+				return None
+		n = random.uniform(0, total)
+		for key in keys:
 			if n < self.dict[key]:
 				return key
 			n = n - self.dict[key]
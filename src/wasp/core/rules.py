@@ -39,4 +39,53 @@ class Rule(object):
 		data['part2'] = self.part2
 		data['conn2'] = self.conn2
 		data['active'] = self.active
-		return data	
\ No newline at end of file
+		return data	
+
+#################################################################### Rules Tables ####################################################################
+class RulesTables(object):
+	'''
+	Rules tables of all connections, compiled once for a set of rules and shared (read-only) by all parts.
+	Each aggregated part only stores the bitmask of the rules still active for each of its connections.
+
+	Args:
+		_rules ([]): List of rules
+
+	Attributes:
+		rules (tuple): Rules the tables were compiled from
+		tables ({}): Dictionary mapping (part name, connection id) to the tuple of rules starting from that connection
+	'''
+
+	## constructor
+	def __init__(self, _rules):
+		self.rules = tuple(_rules)
+		
+		tables = {}
+		for rule in self.rules:
+			key = (rule.part1, rule.conn1)
+			if key not in tables:
+				tables[key] = []
+			tables[key].append(rule)
+		
+		self.tables = {}
+		for key in tables:
+			self.tables[key] = tuple(tables[key])
+	
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspRulesTables [rules: %s, connections: %s]" % (len(self.rules), len(self.tables))
+	
+
+	## return the rules table of a connection
+	def get(self, part_name, conn_id):
+		return self.tables.get((part_name, conn_id), ())
+	
+
+	## check if the tables were compiled from the given rules (same rule objects, in the same order)
+	def matches(self, rules):
+		if len(rules) != len(self.rules):
+			return False
+		for i in range(len(rules)):
+			if rules[i] is not self.rules[i]:
+				return False
+		return True
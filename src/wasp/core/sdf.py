@@ -0,0 +1,285 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Signed distance fields of closed colliders
+"""
+
+import math
+from array import array
+
+from wasp.geometry import Point3d, Transform
+from wasp import global_tolerance
+from wasp.utilities import transform_from_data, transform_to_data
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+## return the 12 affine entries of a transformation
+def transform_entries(trans):
+	return (trans.M00, trans.M01, trans.M02, trans.M03, trans.M10, trans.M11, trans.M12, trans.M13, trans.M20, trans.M21, trans.M22, trans.M23)
+
+
+## return an upper bound of the factor by which the linear part of a transformation (as returned by transform_entries) can stretch a distance
+## (the largest axis scale when the transformed axes stay orthogonal, the Frobenius norm for shears)
+def transform_max_scale(m):
+	columns = ((m[0], m[4], m[8]), (m[1], m[5], m[9]), (m[2], m[6], m[10]))
+	squared_lengths = [c[0]*c[0] + c[1]*c[1] + c[2]*c[2] for c in columns]
+	for a, b in ((0, 1), (1, 2), (0, 2)):
+		dot = columns[a][0]*columns[b][0] + columns[a][1]*columns[b][1] + columns[a][2]*columns[b][2]
+		if abs(dot) > 1e-9 * max(squared_lengths):
+			return math.sqrt(sum(squared_lengths))
+	return math.sqrt(max(squared_lengths))
+
+
+## return points (x,y,z) sampled on a triangle, with the given maximum spacing
+def sample_triangle(a, b, c, spacing):
+	edge = max([math.sqrt(sum([(p[i]-q[i])**2 for i in range(3)])) for p, q in ((a, b), (b, c), (c, a))])
+	n = max(1, int(math.ceil(edge / spacing)))
+	points = []
+	for i in range(n+1):
+		for j in range(n+1-i):
+			u = float(i) / n
+			v = float(j) / n
+			points.append(tuple([a[k] + (b[k]-a[k])*u + (c[k]-a[k])*v for k in range(3)]))
+	return points
+
+
+#################################################################### Signed Distance Field ####################################################################
+class SignedDistanceField(object):
+	'''
+	Signed distance field sampled on a regular grid in the local frame of a collider (negative inside), with a sparse set of surface sample points.
+	Transformed fields share grid and samples, and only store the transformation from the local frame (frame).
+
+	Args:
+		_origin (tuple): Local coordinates of the first grid node
+		_cell_size (float): Distance between grid nodes
+		_counts (tuple): Number of grid nodes along X, Y and Z
+		_values ([float]): Signed distances at grid nodes (X varying fastest)
+		_samples ([tuple]): Local coordinates of points sampled on the collider surface
+		_frame (Transform): Transformation from the local frame to the world
+
+	Attributes:
+		origin (tuple): Local coordinates of the first grid node
+		cell_size (float): Distance between grid nodes
+		counts (tuple): Number of grid nodes along X, Y and Z
+		values (array): Signed distances at grid nodes (X varying fastest)
+		samples ([tuple]): Local coordinates of points sampled on the collider surface
+		frame (Transform): Transformation from the local frame to the world
+		inverse (Transform): Transformation from the world to the local frame (computed when first needed)
+		samples_array (array): Samples as a NumPy array, when NumPy is available (computed when first needed)
+	'''
+
+	## constructor
+	def __init__(self, _origin, _cell_size, _counts, _values, _samples, _frame=None):
+		self.origin = tuple(_origin)
+		self.cell_size = float(_cell_size)
+		self.counts = tuple(_counts)
+		self.values = array('d', _values)
+		self.samples = [tuple(s) for s in _samples]
+		self.frame = _frame if _frame is not None else Transform.Identity
+		self.inverse = None
+		self.samples_array = None
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspSignedDistanceField [nodes: %sx%sx%s, samples: %s]" % (self.counts[0], self.counts[1], self.counts[2], len(self.samples))
+
+
+	## create the field of a list of closed meshes
+	@classmethod
+	def from_meshes(cls, meshes, cell_size=None, padding=2):
+		'''
+		Computes the signed distance field of a list of closed meshes, in their current coordinates
+
+		Args:
+			meshes ([Mesh]): Closed meshes
+			cell_size (float): Distance between grid nodes (by default 1/16 of the largest bounding box side)
+			padding (int): Number of grid nodes added around the meshes bounding box
+
+		Returns:
+			sdf (SignedDistanceField): Signed distance field of the union of the meshes
+		'''
+		bounds = None
+		for mesh in meshes:
+			bbox = mesh.GetBoundingBox(True)
+			mesh_bounds = (bbox.Min.X, bbox.Min.Y, bbox.Min.Z, bbox.Max.X, bbox.Max.Y, bbox.Max.Z)
+			if bounds is None:
+				bounds = mesh_bounds
+			else:
+				bounds = tuple([min(bounds[i], mesh_bounds[i]) for i in range(3)] + [max(bounds[i], mesh_bounds[i]) for i in range(3, 6)])
+
+		if cell_size is None:
+			cell_size = max(bounds[3]-bounds[0], bounds[4]-bounds[1], bounds[5]-bounds[2]) / 16.0
+		origin = tuple([bounds[i] - padding*cell_size for i in range(3)])
+		counts = tuple([int(math.ceil((bounds[i+3] - bounds[i]) / cell_size)) + 2*padding + 1 for i in range(3)])
+
+		values = []
+		for k in range(counts[2]):
+			for j in range(counts[1]):
+				for i in range(counts[0]):
+					pt = Point3d(origin[0] + i*cell_size, origin[1] + j*cell_size, origin[2] + k*cell_size)
+					dist = min([pt.DistanceTo(mesh.ClosestPoint(pt)) for mesh in meshes])
+					for mesh in meshes:
+						if mesh.IsPointInside(pt, global_tolerance, True):
+							dist = -dist
+							break
+					values.append(dist)
+
+		## surface samples (vertices and points on faces, spaced by two grid cells)
+		samples = []
+		for mesh in meshes:
+			vertices = [(v.X, v.Y, v.Z) for v in mesh.Vertices]
+			for f in mesh.Faces:
+				samples.extend(sample_triangle(vertices[f.A], vertices[f.B], vertices[f.C], 2*cell_size))
+				if f.IsQuad:
+					samples.extend(sample_triangle(vertices[f.A], vertices[f.C], vertices[f.D], 2*cell_size))
+		samples = list(set(samples))
+
+		return cls(origin, cell_size, counts, values, samples)
+
+
+	## create class from data dictionary
+	@classmethod
+	def from_data(cls, data):
+		return cls(data['origin'], data['cell_size'], data['counts'], data['values'], data['samples'], _frame=transform_from_data(data['frame']))
+
+
+	## return the data dictionary representing the field
+	def to_data(self):
+		data = {}
+		data['origin'] = list(self.origin)
+		data['cell_size'] = self.cell_size
+		data['counts'] = list(self.counts)
+		data['values'] = list(self.values)
+		data['samples'] = [list(s) for s in self.samples]
+		data['frame'] = transform_to_data(self.frame)
+		return data
+
+
+	## return a transformed copy of the field (sharing grid and samples)
+	def transform(self, trans):
+		sdf_trans = SignedDistanceField.__new__(SignedDistanceField)
+		sdf_trans.origin = self.origin
+		sdf_trans.cell_size = self.cell_size
+		sdf_trans.counts = self.counts
+		sdf_trans.values = self.values
+		sdf_trans.samples = self.samples
+		sdf_trans.samples_array = self.samples_array
+		sdf_trans.frame = Transform.Multiply(trans, self.frame)
+		sdf_trans.inverse = None
+		return sdf_trans
+
+
+	## return a copy of the field (sharing grid and samples)
+	def copy(self):
+		return self.transform(Transform.Identity)
+
+
+	## return the transformation from the world to the local frame
+	def return_inverse(self):
+		if self.inverse is None:
+			success, self.inverse = self.frame.TryGetInverse()
+		return self.inverse
+
+
+	## return the signed distance at a point in local coordinates (trilinear interpolation, points outside the grid are clamped and offset by their distance from it)
+	def value(self, x, y, z):
+		nx, ny, nz = self.counts
+		u = (x - self.origin[0]) / self.cell_size
+		v = (y - self.origin[1]) / self.cell_size
+		w = (z - self.origin[2]) / self.cell_size
+
+		outside = 0.0
+		uc = min(max(u, 0.0), nx - 1.0)
+		vc = min(max(v, 0.0), ny - 1.0)
+		wc = min(max(w, 0.0), nz - 1.0)
+		if uc != u or vc != v or wc != w:
+			outside = math.sqrt((u-uc)**2 + (v-vc)**2 + (w-wc)**2) * self.cell_size
+
+		i = min(int(uc), nx - 2)
+		j = min(int(vc), ny - 2)
+		k = min(int(wc), nz - 2)
+		fu = uc - i
+		fv = vc - j
+		fw = wc - k
+
+		vals = self.values
+		n0 = i + nx*(j + ny*k)
+		n1 = n0 + nx*ny
+		c00 = vals[n0] + (vals[n0+1] - vals[n0]) * fu
+		c10 = vals[n0+nx] + (vals[n0+nx+1] - vals[n0+nx]) * fu
+		c01 = vals[n1] + (vals[n1+1] - vals[n1]) * fu
+		c11 = vals[n1+nx] + (vals[n1+nx+1] - vals[n1+nx]) * fu
+		c0 = c00 + (c10 - c00) * fv
+		c1 = c01 + (c11 - c01) * fv
+		return c0 + (c1 - c0) * fw + outside
+
+
+	## return lower and upper bounds of the exact signed distance at a point in local coordinates
+	## (signed distances are 1-Lipschitz, so interpolated values are within one cell diagonal of the exact value, and points outside the grid are outside the meshes)
+	def value_bounds(self, x, y, z, tolerance=global_tolerance):
+		nx, ny, nz = self.counts
+		ox, oy, oz = self.origin
+		size = self.cell_size
+		dx = max(ox - x, 0.0, x - (ox + (nx-1)*size))
+		dy = max(oy - y, 0.0, y - (oy + (ny-1)*size))
+		dz = max(oz - z, 0.0, z - (oz + (nz-1)*size))
+		outside = math.sqrt(dx*dx + dy*dy + dz*dz)
+		v = self.value(x, y, z) - outside
+		error = math.sqrt(3) * size + 2 * tolerance
+		if outside > 0:
+			return max(outside, v - error), v + error + outside
+		return v - error, v + error
+
+
+	## return the signed distances at an (n,3) NumPy array of points in local coordinates (vectorized version of value)
+	def values_at(self, pts):
+		nx, ny, nz = self.counts
+		uvw = (pts - np.array(self.origin)) / self.cell_size
+		uvw_c = np.clip(uvw, 0.0, np.array([nx - 1.0, ny - 1.0, nz - 1.0]))
+		outside = np.sqrt(np.sum((uvw - uvw_c)**2, axis=1)) * self.cell_size
+
+		ijk = np.minimum(uvw_c.astype(int), np.array([nx - 2, ny - 2, nz - 2]))
+		f = uvw_c - ijk
+		fu = f[:, 0]
+		fv = f[:, 1]
+		fw = f[:, 2]
+
+		vals = np.frombuffer(self.values, dtype=np.float64)
+		n0 = ijk[:, 0] + nx*(ijk[:, 1] + ny*ijk[:, 2])
+		n1 = n0 + nx*ny
+		c00 = vals[n0] + (vals[n0+1] - vals[n0]) * fu
+		c10 = vals[n0+nx] + (vals[n0+nx+1] - vals[n0+nx]) * fu
+		c01 = vals[n1] + (vals[n1+1] - vals[n1]) * fu
+		c11 = vals[n1+nx] + (vals[n1+nx+1] - vals[n1+nx]) * fu
+		c0 = c00 + (c10 - c00) * fv
+		c1 = c01 + (c11 - c01) * fv
+		return c0 + (c1 - c0) * fw + outside
+
+
+	## check if any surface sample of another field is deeper than the tolerance inside this field
+	def check_samples(self, other, tolerance=global_tolerance):
+		m = transform_entries(Transform.Multiply(self.return_inverse(), other.frame))
+		if np is not None:
+			if other.samples_array is None:
+				other.samples_array = np.array(other.samples, dtype=float).reshape((-1, 3))
+			pts = np.dot(other.samples_array, np.array([m[0:3], m[4:7], m[8:11]]).T) + np.array([m[3], m[7], m[11]])
+			return bool(np.any(self.values_at(pts) < -tolerance))
+		for x, y, z in other.samples:
+			if self.value(m[0]*x + m[1]*y + m[2]*z + m[3], m[4]*x + m[5]*y + m[6]*z + m[7], m[8]*x + m[9]*y + m[10]*z + m[11]) < -tolerance:
+				return True
+		return False
+
+
+	## check if two fields penetrate each other by more than the tolerance (touching fields do not collide)
+	def check_collision(self, other, tolerance=global_tolerance):
+		return self.check_samples(other, tolerance) or other.check_samples(self, tolerance)
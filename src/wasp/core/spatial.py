@@ -0,0 +1,432 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Spatial indexing structures for collision broad-phase and mesh-level queries
+"""
+
+import math
+
+
+#################################################################### Spatial Hash ####################################################################
+class SpatialHash(object):
+	'''
+	Uniform grid hashing the bounding spheres of aggregated parts (center + dim) into cubic cells.
+	Each item is stored in all cells overlapped by the bounding box of its sphere,
+	so two overlapping spheres always share at least one cell.
+	Items with a radius larger than the cell size are stored in a separate list, checked by every query,
+	so that large parts in mixed-size aggregations do not fill a large number of cells.
+
+	Args:
+		_cell_size (float): Size of the grid cells
+
+	Attributes:
+		cell_size (float): Size of the grid cells
+		cells ({}): Dictionary mapping cell keys (i,j,k) to the set of item ids inside the cell
+		items ({}): Dictionary mapping item ids to the list of cell keys they occupy
+		large_items ({}): Dictionary mapping ids of items larger than the cells to their sphere (x,y,z,radius)
+	'''
+
+	## constructor
+	def __init__(self, _cell_size):
+		self.cell_size = float(_cell_size)
+		self.cells = {}
+		self.items = {}
+		self.large_items = {}
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspSpatialHash [cell size: %s, items: %s, large items: %s]" % (self.cell_size, len(self), len(self.large_items))
+
+
+	def __len__(self):
+		return len(self.items) + len(self.large_items)
+
+
+	## compute a cell size from the distribution of part sizes
+	@staticmethod
+	def cell_size_from_dims(dims):
+		'''
+		Returns a cell size equal to the diameter of the median part, so that most parts occupy at most 8 cells
+		(parts larger than the cells are stored separately)
+
+		Args:
+			dims ([float]): List of part sizes (Part.dim)
+
+		Returns:
+			cell_size (float): Suggested cell size
+		'''
+		valid_dims = sorted([d for d in dims if d is not None and d > 0])
+		if len(valid_dims) == 0:
+			return 1.0
+		return 2 * valid_dims[len(valid_dims) // 2]
+
+
+	## return the range of cell indexes overlapped by a sphere bounding box, as (x0, y0, z0, x1, y1, z1)
+	def cell_range(self, center, radius):
+		return (int(math.floor((center.X - radius) / self.cell_size)), int(math.floor((center.Y - radius) / self.cell_size)), int(math.floor((center.Z - radius) / self.cell_size)),
+			int(math.floor((center.X + radius) / self.cell_size)), int(math.floor((center.Y + radius) / self.cell_size)), int(math.floor((center.Z + radius) / self.cell_size)))
+
+
+	## return the keys of all cells overlapped by a sphere bounding box
+	def cell_keys(self, center, radius):
+		x0, y0, z0, x1, y1, z1 = self.cell_range(center, radius)
+		return [(i, j, k) for i in range(x0, x1+1) for j in range(y0, y1+1) for k in range(z0, z1+1)]
+
+
+	## add an item to the grid
+	def insert(self, id, center, radius):
+		if id in self.items or id in self.large_items:
+			self.remove(id)
+		if radius > self.cell_size:
+			self.large_items[id] = (center.X, center.Y, center.Z, radius)
+			return
+		keys = self.cell_keys(center, radius)
+		for key in keys:
+			if key not in self.cells:
+				self.cells[key] = set()
+			self.cells[key].add(id)
+		self.items[id] = keys
+
+
+	## remove an item from the grid
+	def remove(self, id):
+		if id in self.large_items:
+			del self.large_items[id]
+		if id in self.items:
+			for key in self.items[id]:
+				self.cells[key].discard(id)
+				if len(self.cells[key]) == 0:
+					del self.cells[key]
+			del self.items[id]
+
+
+	## remove all items
+	def clear(self):
+		self.cells = {}
+		self.items = {}
+		self.large_items = {}
+
+
+	## return the sorted ids of all items whose sphere bounding box overlaps the given sphere bounding box
+	def query(self, center, radius):
+		found = set()
+		x0, y0, z0, x1, y1, z1 = self.cell_range(center, radius)
+		## large queries scan the occupied cells instead of all the cells in their range
+		if (x1-x0+1) * (y1-y0+1) * (z1-z0+1) <= len(self.cells):
+			for key in self.cell_keys(center, radius):
+				if key in self.cells:
+					found.update(self.cells[key])
+		else:
+			for key, ids in self.cells.items():
+				if x0 <= key[0] <= x1 and y0 <= key[1] <= y1 and z0 <= key[2] <= z1:
+					found.update(ids)
+		for id, (x, y, z, r) in self.large_items.items():
+			if abs(x - center.X) <= r + radius and abs(y - center.Y) <= r + radius and abs(z - center.Z) <= r + radius:
+				found.add(id)
+		return sorted(found)
+
+
+#################################################################### AABB Tree ####################################################################
+## return the axis-aligned bounds of a mesh as (min_x, min_y, min_z, max_x, max_y, max_z)
+def mesh_bounds(mesh):
+	bbox = mesh.GetBoundingBox(True)
+	return (bbox.Min.X, bbox.Min.Y, bbox.Min.Z, bbox.Max.X, bbox.Max.Y, bbox.Max.Z)
+
+
+## union of two bounds
+def bounds_union(a, b):
+	return (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+
+## surface area of bounds (cost metric for the tree)
+def bounds_area(a):
+	dx = a[3] - a[0]
+	dy = a[4] - a[1]
+	dz = a[5] - a[2]
+	return 2 * (dx*dy + dy*dz + dz*dx)
+
+
+## check if two bounds overlap (touching bounds are considered overlapping)
+def bounds_overlap(a, b):
+	return a[0] <= b[3] and b[0] <= a[3] and a[1] <= b[4] and b[1] <= a[4] and a[2] <= b[5] and b[2] <= a[5]
+
+
+## return a segment as (start, end) tuples from a line
+def line_segment(ln):
+	return (ln.FromX, ln.FromY, ln.FromZ), (ln.ToX, ln.ToY, ln.ToZ)
+
+
+## check if a segment crosses bounds enlarged by the tolerance (slab test)
+def segment_overlaps_bounds(start, end, bounds, tolerance=0.0):
+	t0 = 0.0
+	t1 = 1.0
+	for i in range(3):
+		lo = bounds[i] - tolerance
+		hi = bounds[i+3] + tolerance
+		d = end[i] - start[i]
+		if d == 0:
+			if start[i] < lo or start[i] > hi:
+				return False
+		else:
+			ta = (lo - start[i]) / d
+			tb = (hi - start[i]) / d
+			if ta > tb:
+				ta, tb = tb, ta
+			if ta > t0:
+				t0 = ta
+			if tb < t1:
+				t1 = tb
+			if t0 > t1:
+				return False
+	return True
+
+
+class AABBNode(object):
+
+	__slots__ = ('bounds', 'parent', 'child1', 'child2', 'height', 'data')
+
+	def __init__(self, bounds, data=None):
+		self.bounds = bounds
+		self.parent = None
+		self.child1 = None
+		self.child2 = None
+		self.height = 0
+		self.data = data
+
+	def is_leaf(self):
+		return self.child1 is None
+
+
+class AABBTree(object):
+	'''
+	Dynamic bounding volume hierarchy of axis-aligned bounding boxes, supporting incremental insertions and removals.
+	Leaves are inserted with a surface area heuristic and the tree is kept balanced with AVL-style rotations.
+
+	Attributes:
+		root (AABBNode): Root node of the tree
+		leaves_count (int): Number of leaves in the tree
+	'''
+
+	## constructor
+	def __init__(self):
+		self.root = None
+		self.leaves_count = 0
+
+
+	## override Rhino .ToString() method (display name of the class in Gh)
+	def ToString(self):
+		return "WaspAABBTree [leaves: %s, height: %s]" % (self.leaves_count, self.root.height if self.root is not None else 0)
+
+
+	def __len__(self):
+		return self.leaves_count
+
+
+	## remove all leaves
+	def clear(self):
+		self.root = None
+		self.leaves_count = 0
+
+
+	## insert new data with the given bounds, and return its leaf node (to be used for removal)
+	def insert(self, data, bounds):
+		leaf = AABBNode(tuple(bounds), data)
+		self.leaves_count += 1
+
+		if self.root is None:
+			self.root = leaf
+			return leaf
+
+		## find the best sibling for the new leaf
+		sibling = self.root
+		while not sibling.is_leaf():
+			area = bounds_area(sibling.bounds)
+			combined_area = bounds_area(bounds_union(sibling.bounds, leaf.bounds))
+
+			## cost of creating a new parent for this node and the new leaf
+			cost = 2 * combined_area
+			## minimum cost of pushing the leaf further down the tree
+			inheritance_cost = 2 * (combined_area - area)
+
+			child_costs = []
+			for child in (sibling.child1, sibling.child2):
+				child_cost = bounds_area(bounds_union(child.bounds, leaf.bounds)) + inheritance_cost
+				if not child.is_leaf():
+					child_cost -= bounds_area(child.bounds)
+				child_costs.append(child_cost)
+
+			if cost < child_costs[0] and cost < child_costs[1]:
+				break
+			if child_costs[0] < child_costs[1]:
+				sibling = sibling.child1
+			else:
+				sibling = sibling.child2
+
+		## create a new parent
+		old_parent = sibling.parent
+		new_parent = AABBNode(bounds_union(sibling.bounds, leaf.bounds))
+		new_parent.parent = old_parent
+		new_parent.height = sibling.height + 1
+		if old_parent is not None:
+			if old_parent.child1 is sibling:
+				old_parent.child1 = new_parent
+			else:
+				old_parent.child2 = new_parent
+		else:
+			self.root = new_parent
+		new_parent.child1 = sibling
+		new_parent.child2 = leaf
+		sibling.parent = new_parent
+		leaf.parent = new_parent
+
+		## walk back up the tree fixing heights and bounds
+		self._refit(leaf.parent)
+		return leaf
+
+
+	## remove a leaf from the tree
+	def remove(self, leaf):
+		self.leaves_count -= 1
+		if leaf is self.root:
+			self.root = None
+			return
+
+		parent = leaf.parent
+		grand_parent = parent.parent
+		sibling = parent.child2 if parent.child1 is leaf else parent.child1
+
+		if grand_parent is not None:
+			## connect sibling to grand parent and destroy parent
+			if grand_parent.child1 is parent:
+				grand_parent.child1 = sibling
+			else:
+				grand_parent.child2 = sibling
+			sibling.parent = grand_parent
+			self._refit(grand_parent)
+		else:
+			self.root = sibling
+			sibling.parent = None
+		leaf.parent = None
+
+
+	## return data of all leaves overlapping the given bounds
+	def query(self, bounds):
+		found = []
+		if self.root is None:
+			return found
+		stack = [self.root]
+		while len(stack) > 0:
+			node = stack.pop()
+			if bounds_overlap(node.bounds, bounds):
+				if node.is_leaf():
+					found.append(node.data)
+				else:
+					stack.append(node.child1)
+					stack.append(node.child2)
+		return found
+
+
+	## return data of all leaves crossed by a segment (start and end as (x,y,z) tuples)
+	def query_segment(self, start, end, tolerance=0.0):
+		return self.query_segments([(start, end)], tolerance)[0]
+
+
+	## return, for each segment, data of all leaves crossed by it (all segments are tested in a single traversal)
+	def query_segments(self, segments, tolerance=0.0):
+		found = [[] for seg in segments]
+		if self.root is None:
+			return found
+		stack = [(self.root, list(range(len(segments))))]
+		while len(stack) > 0:
+			node, seg_ids = stack.pop()
+			seg_ids = [i for i in seg_ids if segment_overlaps_bounds(segments[i][0], segments[i][1], node.bounds, tolerance)]
+			if len(seg_ids) == 0:
+				continue
+			if node.is_leaf():
+				for i in seg_ids:
+					found[i].append(node.data)
+			else:
+				stack.append((node.child1, seg_ids))
+				stack.append((node.child2, seg_ids))
+		return found
+
+
+	## fix heights and bounds from the given node up to the root
+	def _refit(self, node):
+		while node is not None:
+			node = self._balance(node)
+			node.height = 1 + max(node.child1.height, node.child2.height)
+			node.bounds = bounds_union(node.child1.bounds, node.child2.bounds)
+			node = node.parent
+
+
+	## perform a left or right rotation if node A is imbalanced, and return the new subtree root
+	def _balance(self, a):
+		if a.is_leaf() or a.height < 2:
+			return a
+
+		b = a.child1
+		c = a.child2
+		balance = c.height - b.height
+
+		## rotate C up
+		if balance > 1:
+			f = c.child1
+			g = c.child2
+			c.child1 = a
+			c.parent = a.parent
+			a.parent = c
+			self._replace_child(c.parent, a, c)
+			if f.height > g.height:
+				c.child2 = f
+				a.child2 = g
+				g.parent = a
+			else:
+				c.child2 = g
+				a.child2 = f
+				f.parent = a
+			a.bounds = bounds_union(a.child1.bounds, a.child2.bounds)
+			a.height = 1 + max(a.child1.height, a.child2.height)
+			c.bounds = bounds_union(c.child1.bounds, c.child2.bounds)
+			c.height = 1 + max(c.child1.height, c.child2.height)
+			return c
+
+		## rotate B up
+		if balance < -1:
+			d = b.child1
+			e = b.child2
+			b.child1 = a
+			b.parent = a.parent
+			a.parent = b
+			self._replace_child(b.parent, a, b)
+			if d.height > e.height:
+				b.child2 = d
+				a.child1 = e
+				e.parent = a
+			else:
+				b.child2 = e
+				a.child1 = d
+				d.parent = a
+			a.bounds = bounds_union(a.child1.bounds, a.child2.bounds)
+			a.height = 1 + max(a.child1.height, a.child2.height)
+			b.bounds = bounds_union(b.child1.bounds, b.child2.bounds)
+			b.height = 1 + max(b.child1.height, b.child2.height)
+			return b
+
+		return a
+
+
+	## replace a child of the given parent (or the root)
+	def _replace_child(self, parent, old_child, new_child):
+		if parent is None:
+			self.root = new_child
+		elif parent.child1 is old_child:
+			parent.child1 = new_child
+		else:
+			parent.child2 = new_child
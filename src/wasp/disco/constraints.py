@@ -9,7 +9,7 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 DisCo geometric constraints classes
 """
 
-from Rhino.Geometry import Point3d
+from wasp.geometry import Point3d
 
 
 #################################################################### Point Constraint ####################################################################
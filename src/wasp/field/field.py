@@ -12,11 +12,11 @@ Classes and utilities for voxel fields generation
 
 import math
 
-from Rhino.Geometry import BoundingBox
-from Rhino.Geometry import Vector3d, Point3d
-from Rhino.Geometry import Plane, Box
-from Rhino.Geometry import Transform
-from Rhino.Geometry import Mesh
+from wasp.geometry import BoundingBox
+from wasp.geometry import Vector3d, Point3d
+from wasp.geometry import Plane, Box
+from wasp.geometry import Transform
+from wasp.geometry import Mesh
 
 from wasp import global_tolerance
 from wasp.utilities import mesh_from_data, mesh_to_data, plane_from_data, plane_to_data
@@ -207,6 +207,10 @@ class Field(object):
 
 	## find and return highest value in the field ########################### TO FIX FOR ORIENTABLE FIELD!!!
 	def return_highest_pt(self, constraints = None):
+		## scalar fields with constraints: candidates are checked in batches, from the highest value down
+		if constraints is not None and not self.is_tensor_field:
+			return Plane(self.pts[self.return_highest_valid_count(constraints)], self.plane.XAxis, self.plane.YAxis)
+		
 		max_val = -1
 		max_coords = None
 		max_count = -1
@@ -259,6 +263,22 @@ class Field(object):
 		return highest_pt
 	
 
+	## return the index of the point with the highest value (above -1) satisfying the soft part of the given constraints, or -1 if none
+	def return_highest_valid_count(self, constraints, batch_size=256):
+		values = [self.vals[z][y][x] for z in range(self.z_count) for y in range(self.y_count) for x in range(self.x_count)]
+		counts = sorted([count for count in range(len(values)) if values[count] > -1], key=lambda count: (-values[count], count))
+		for start in range(0, len(counts), batch_size):
+			batch = counts[start:start+batch_size]
+			## each constraint only checks the candidates satisfying the previous ones
+			for constraint in constraints:
+				centers = [(self.pts[count].X, self.pts[count].Y, self.pts[count].Z) for count in batch]
+				valid = constraint.check_batch(centers)
+				batch = [batch[i] for i in range(len(batch)) if valid[i]]
+			if len(batch) > 0:
+				return batch[0]
+		return -1
+	
+
 	def compute_voxel_mesh(self, iso, cap = True):
 		voxel_mesh = Mesh()
 		for z in range(self.z_count):
@@ -6,5 +6,35 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 
 @version 0.7.001
 
-WIP - Wasp geometry library for interoperability between different softwares
-"""
\ No newline at end of file
+Wasp geometry library for interoperability between different softwares
+
+The geometry backend is selected at import time: RhinoCommon when available, the headless NumPy backend otherwise.
+Set the WASP_GEOMETRY_BACKEND environment variable to "rhino" or "numpy" to force a specific backend.
+"""
+
+import os
+
+requested_backend = os.environ.get("WASP_GEOMETRY_BACKEND", "").lower()
+backend = None
+
+if requested_backend != "numpy":
+	try:
+		from Rhino.Geometry import Point3d, Vector3d, Plane, Transform
+		from Rhino.Geometry import Line, LineCurve, Interval
+		from Rhino.Geometry import BoundingBox, Box
+		from Rhino.Geometry import Mesh
+		from Rhino.Geometry import AreaMassProperties
+		from Rhino.Geometry.Intersect import Intersection
+		backend = "rhino"
+	except ImportError:
+		if requested_backend == "rhino":
+			raise
+
+if backend is None:
+	from wasp.geometry.numpy_geometry import Point3d, Vector3d, Plane, Transform
+	from wasp.geometry.numpy_geometry import Line, LineCurve, Interval
+	from wasp.geometry.numpy_geometry import BoundingBox, Box
+	from wasp.geometry.numpy_geometry import Mesh
+	from wasp.geometry.numpy_geometry import AreaMassProperties
+	from wasp.geometry.numpy_geometry import Intersection
+	backend = "numpy"
@@ -0,0 +1,1184 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Headless geometry backend, implementing with NumPy the subset of RhinoCommon used by Wasp
+"""
+
+import math
+
+import numpy as np
+
+
+## tolerance used to discard numerically degenerate geometry
+zero_tolerance = 1e-9
+
+
+#################################################################### Helpers ####################################################################
+## class-level property returning a new object at every access (mimics RhinoCommon static struct properties)
+class _static_property(object):
+	def __init__(self, fget):
+		self.fget = fget
+
+	def __get__(self, obj, cls):
+		return self.fget(cls)
+
+
+## row-wise dot product
+def _dot(a, b):
+	return np.einsum('ij,ij->i', a, b)
+
+
+#################################################################### Point3d ####################################################################
+class Point3d(object):
+
+	__slots__ = ('X', 'Y', 'Z')
+
+	## constructor
+	def __init__(self, *args):
+		if len(args) == 3:
+			self.X = float(args[0])
+			self.Y = float(args[1])
+			self.Z = float(args[2])
+		elif len(args) == 1:
+			self.X = float(args[0].X)
+			self.Y = float(args[0].Y)
+			self.Z = float(args[0].Z)
+		else:
+			self.X = 0.0
+			self.Y = 0.0
+			self.Z = 0.0
+
+	def ToString(self):
+		return "%s,%s,%s" % (self.X, self.Y, self.Z)
+
+	def __repr__(self):
+		return "Point3d(%s)" % (self.ToString())
+
+	@_static_property
+	def Origin(cls):
+		return cls(0, 0, 0)
+
+	def __getitem__(self, i):
+		return (self.X, self.Y, self.Z)[i]
+
+	def __eq__(self, other):
+		try:
+			return self.X == other.X and self.Y == other.Y and self.Z == other.Z
+		except AttributeError:
+			return False
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash((self.X, self.Y, self.Z))
+
+	def __add__(self, other):
+		return Point3d(self.X + other.X, self.Y + other.Y, self.Z + other.Z)
+
+	def __sub__(self, other):
+		if isinstance(other, Point3d):
+			return Vector3d(self.X - other.X, self.Y - other.Y, self.Z - other.Z)
+		return Point3d(self.X - other.X, self.Y - other.Y, self.Z - other.Z)
+
+	def __mul__(self, s):
+		return Point3d(self.X * s, self.Y * s, self.Z * s)
+
+	__rmul__ = __mul__
+
+	def __truediv__(self, s):
+		return Point3d(self.X / s, self.Y / s, self.Z / s)
+
+	__div__ = __truediv__
+
+	def __neg__(self):
+		return Point3d(-self.X, -self.Y, -self.Z)
+
+	## distance to another point
+	def DistanceTo(self, other):
+		dx = self.X - other.X
+		dy = self.Y - other.Y
+		dz = self.Z - other.Z
+		return math.sqrt(dx*dx + dy*dy + dz*dz)
+
+	def EpsilonEquals(self, other, epsilon):
+		return abs(self.X - other.X) <= epsilon and abs(self.Y - other.Y) <= epsilon and abs(self.Z - other.Z) <= epsilon
+
+	## transform the point in place
+	def Transform(self, xform):
+		m = xform.m
+		x = m[0, 0]*self.X + m[0, 1]*self.Y + m[0, 2]*self.Z + m[0, 3]
+		y = m[1, 0]*self.X + m[1, 1]*self.Y + m[1, 2]*self.Z + m[1, 3]
+		z = m[2, 0]*self.X + m[2, 1]*self.Y + m[2, 2]*self.Z + m[2, 3]
+		w = m[3, 0]*self.X + m[3, 1]*self.Y + m[3, 2]*self.Z + m[3, 3]
+		if w != 1.0 and w != 0.0:
+			x /= w
+			y /= w
+			z /= w
+		self.X = float(x)
+		self.Y = float(y)
+		self.Z = float(z)
+
+	## backend helper, return coordinates as numpy array
+	def to_array(self):
+		return np.array([self.X, self.Y, self.Z])
+
+
+#################################################################### Vector3d ####################################################################
+class Vector3d(object):
+
+	__slots__ = ('X', 'Y', 'Z')
+
+	## constructor
+	def __init__(self, *args):
+		if len(args) == 3:
+			self.X = float(args[0])
+			self.Y = float(args[1])
+			self.Z = float(args[2])
+		elif len(args) == 1:
+			self.X = float(args[0].X)
+			self.Y = float(args[0].Y)
+			self.Z = float(args[0].Z)
+		else:
+			self.X = 0.0
+			self.Y = 0.0
+			self.Z = 0.0
+
+	def ToString(self):
+		return "%s,%s,%s" % (self.X, self.Y, self.Z)
+
+	def __repr__(self):
+		return "Vector3d(%s)" % (self.ToString())
+
+	@_static_property
+	def XAxis(cls):
+		return cls(1, 0, 0)
+
+	@_static_property
+	def YAxis(cls):
+		return cls(0, 1, 0)
+
+	@_static_property
+	def ZAxis(cls):
+		return cls(0, 0, 1)
+
+	@_static_property
+	def Zero(cls):
+		return cls(0, 0, 0)
+
+	def __getitem__(self, i):
+		return (self.X, self.Y, self.Z)[i]
+
+	def __eq__(self, other):
+		try:
+			return self.X == other.X and self.Y == other.Y and self.Z == other.Z
+		except AttributeError:
+			return False
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash((self.X, self.Y, self.Z))
+
+	def __add__(self, other):
+		if isinstance(other, Point3d):
+			return Point3d(self.X + other.X, self.Y + other.Y, self.Z + other.Z)
+		return Vector3d(self.X + other.X, self.Y + other.Y, self.Z + other.Z)
+
+	def __sub__(self, other):
+		return Vector3d(self.X - other.X, self.Y - other.Y, self.Z - other.Z)
+
+	## vector * vector returns the dot product (as in RhinoCommon)
+	def __mul__(self, other):
+		if isinstance(other, Vector3d):
+			return self.X*other.X + self.Y*other.Y + self.Z*other.Z
+		return Vector3d(self.X * other, self.Y * other, self.Z * other)
+
+	__rmul__ = __mul__
+
+	def __truediv__(self, s):
+		return Vector3d(self.X / s, self.Y / s, self.Z / s)
+
+	__div__ = __truediv__
+
+	def __neg__(self):
+		return Vector3d(-self.X, -self.Y, -self.Z)
+
+	@property
+	def Length(self):
+		return math.sqrt(self.X*self.X + self.Y*self.Y + self.Z*self.Z)
+
+	@property
+	def IsZero(self):
+		return self.X == 0.0 and self.Y == 0.0 and self.Z == 0.0
+
+	## unitize the vector in place
+	def Unitize(self):
+		length = self.Length
+		if length < zero_tolerance:
+			return False
+		self.X /= length
+		self.Y /= length
+		self.Z /= length
+		return True
+
+	## reverse the vector in place
+	def Reverse(self):
+		self.X = -self.X
+		self.Y = -self.Y
+		self.Z = -self.Z
+		return True
+
+	## transform the vector in place (translations are ignored)
+	def Transform(self, xform):
+		m = xform.m
+		x = m[0, 0]*self.X + m[0, 1]*self.Y + m[0, 2]*self.Z
+		y = m[1, 0]*self.X + m[1, 1]*self.Y + m[1, 2]*self.Z
+		z = m[2, 0]*self.X + m[2, 1]*self.Y + m[2, 2]*self.Z
+		self.X = float(x)
+		self.Y = float(y)
+		self.Z = float(z)
+
+	@staticmethod
+	def CrossProduct(a, b):
+		return Vector3d(a.Y*b.Z - a.Z*b.Y, a.Z*b.X - a.X*b.Z, a.X*b.Y - a.Y*b.X)
+
+	@staticmethod
+	def Multiply(a, b):
+		return a.X*b.X + a.Y*b.Y + a.Z*b.Z
+
+	## angle between two vectors, optionally measured counter-clockwise in the given plane
+	@staticmethod
+	def VectorAngle(a, b, plane=None):
+		if plane is not None:
+			a = Vector3d(a*plane.XAxis, a*plane.YAxis, 0)
+			b = Vector3d(b*plane.XAxis, b*plane.YAxis, 0)
+		a = Vector3d(a)
+		b = Vector3d(b)
+		if not a.Unitize() or not b.Unitize():
+			return -1.23432101234321e+308
+		angle = math.acos(max(-1.0, min(1.0, a*b)))
+		if plane is not None and a.X*b.Y - a.Y*b.X < 0:
+			angle = 2*math.pi - angle
+		return angle
+
+	## backend helper, return coordinates as numpy array
+	def to_array(self):
+		return np.array([self.X, self.Y, self.Z])
+
+
+#################################################################### Interval ####################################################################
+class Interval(object):
+
+	## constructor
+	def __init__(self, t0, t1):
+		self.T0 = float(t0)
+		self.T1 = float(t1)
+
+	def ToString(self):
+		return "%s,%s" % (self.T0, self.T1)
+
+	@property
+	def Min(self):
+		return min(self.T0, self.T1)
+
+	@property
+	def Max(self):
+		return max(self.T0, self.T1)
+
+	@property
+	def Length(self):
+		return self.T1 - self.T0
+
+	def IncludesParameter(self, t, strict=False):
+		if strict:
+			return self.Min < t < self.Max
+		return self.Min <= t <= self.Max
+
+	def Grow(self, t):
+		if t < self.Min:
+			if self.T0 <= self.T1:
+				self.T0 = float(t)
+			else:
+				self.T1 = float(t)
+		elif t > self.Max:
+			if self.T0 <= self.T1:
+				self.T1 = float(t)
+			else:
+				self.T0 = float(t)
+
+
+#################################################################### Plane ####################################################################
+class Plane(object):
+
+	## constructor, accepts (plane), (origin, normal) or (origin, x_dir, y_dir)
+	def __init__(self, *args):
+		if len(args) == 1:
+			self.Origin = Point3d(args[0].Origin)
+			self.XAxis = Vector3d(args[0].XAxis)
+			self.YAxis = Vector3d(args[0].YAxis)
+			self.ZAxis = Vector3d(args[0].ZAxis)
+		elif len(args) == 2:
+			normal = Vector3d(args[1])
+			normal.Unitize()
+			if abs(normal.Z) < 0.9:
+				x_dir = Vector3d.CrossProduct(Vector3d.ZAxis, normal)
+			else:
+				x_dir = Vector3d.CrossProduct(Vector3d.XAxis, normal)
+				x_dir.Reverse()
+			self._set_frame(args[0], x_dir, Vector3d.CrossProduct(normal, x_dir))
+		elif len(args) == 3:
+			self._set_frame(args[0], args[1], args[2])
+		else:
+			self._set_frame(Point3d(0, 0, 0), Vector3d.XAxis, Vector3d.YAxis)
+
+	def _set_frame(self, origin, x_dir, y_dir):
+		self.Origin = Point3d(origin)
+		self.XAxis = Vector3d(x_dir)
+		self.XAxis.Unitize()
+		self.ZAxis = Vector3d.CrossProduct(self.XAxis, y_dir)
+		self.ZAxis.Unitize()
+		self.YAxis = Vector3d.CrossProduct(self.ZAxis, self.XAxis)
+
+	def ToString(self):
+		return "Origin=%s XAxis=%s, YAxis=%s, ZAxis=%s" % (self.Origin.ToString(), self.XAxis.ToString(), self.YAxis.ToString(), self.ZAxis.ToString())
+
+	@_static_property
+	def WorldXY(cls):
+		return cls(Point3d(0, 0, 0), Vector3d.XAxis, Vector3d.YAxis)
+
+	@_static_property
+	def WorldYZ(cls):
+		return cls(Point3d(0, 0, 0), Vector3d.YAxis, Vector3d.ZAxis)
+
+	@_static_property
+	def WorldZX(cls):
+		return cls(Point3d(0, 0, 0), Vector3d.ZAxis, Vector3d.XAxis)
+
+	@property
+	def Normal(self):
+		return Vector3d(self.ZAxis)
+
+	## transform the plane in place
+	def Transform(self, xform):
+		origin = Point3d(self.Origin)
+		origin.Transform(xform)
+		x_dir = Vector3d(self.XAxis)
+		x_dir.Transform(xform)
+		y_dir = Vector3d(self.YAxis)
+		y_dir.Transform(xform)
+		self._set_frame(origin, x_dir, y_dir)
+		return True
+
+	def Flip(self):
+		self.XAxis, self.YAxis = self.YAxis, self.XAxis
+		self.ZAxis.Reverse()
+
+	def PointAt(self, u, v, w=0.0):
+		return Point3d(self.Origin.X + u*self.XAxis.X + v*self.YAxis.X + w*self.ZAxis.X,
+			self.Origin.Y + u*self.XAxis.Y + v*self.YAxis.Y + w*self.ZAxis.Y,
+			self.Origin.Z + u*self.XAxis.Z + v*self.YAxis.Z + w*self.ZAxis.Z)
+
+	## return (True, point expressed in plane coordinates)
+	def RemapToPlaneSpace(self, pt):
+		d = pt - self.Origin
+		return True, Point3d(d*self.XAxis, d*self.YAxis, d*self.ZAxis)
+
+	def ClosestPoint(self, pt):
+		d = pt - self.Origin
+		return self.PointAt(d*self.XAxis, d*self.YAxis)
+
+	## signed distance of a point from the plane
+	def DistanceTo(self, pt):
+		return (pt - self.Origin)*self.ZAxis
+
+	def GetPlaneEquation(self):
+		return [self.ZAxis.X, self.ZAxis.Y, self.ZAxis.Z, -(self.ZAxis.X*self.Origin.X + self.ZAxis.Y*self.Origin.Y + self.ZAxis.Z*self.Origin.Z)]
+
+	## backend helper, return the 4x4 matrix mapping plane coordinates to world coordinates
+	def to_matrix(self):
+		m = np.identity(4)
+		m[:3, 0] = (self.XAxis.X, self.XAxis.Y, self.XAxis.Z)
+		m[:3, 1] = (self.YAxis.X, self.YAxis.Y, self.YAxis.Z)
+		m[:3, 2] = (self.ZAxis.X, self.ZAxis.Y, self.ZAxis.Z)
+		m[:3, 3] = (self.Origin.X, self.Origin.Y, self.Origin.Z)
+		return m
+
+
+#################################################################### Transform ####################################################################
+class Transform(object):
+
+	## constructor, accepts a diagonal value (as RhinoCommon) or a 4x4 matrix
+	def __init__(self, value=0.0):
+		if np.isscalar(value):
+			self.m = np.identity(4) * float(value)
+		else:
+			self.m = np.array(value, dtype=float).reshape(4, 4)
+
+	def ToString(self):
+		return "R0=(%s,%s,%s,%s), R1=(%s,%s,%s,%s), R2=(%s,%s,%s,%s), R3=(%s,%s,%s,%s)" % tuple(self.m.flatten())
+
+	@_static_property
+	def Identity(cls):
+		return cls(1.0)
+
+	@_static_property
+	def ZeroTransformation(cls):
+		return cls(0.0)
+
+	@property
+	def IsIdentity(self):
+		return bool(np.array_equal(self.m, np.identity(4)))
+
+	def __mul__(self, other):
+		if isinstance(other, Transform):
+			return Transform(np.dot(self.m, other.m))
+		elif isinstance(other, Point3d):
+			pt = Point3d(other)
+			pt.Transform(self)
+			return pt
+		elif isinstance(other, Vector3d):
+			vec = Vector3d(other)
+			vec.Transform(self)
+			return vec
+		return NotImplemented
+
+	def __eq__(self, other):
+		return isinstance(other, Transform) and bool(np.array_equal(self.m, other.m))
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	__hash__ = None
+
+	@staticmethod
+	def Multiply(a, b):
+		return Transform(np.dot(a.m, b.m))
+
+	## transformation orienting geometry from plane a to plane b
+	@staticmethod
+	def PlaneToPlane(a, b):
+		ma = a.to_matrix()
+		inv_a = np.identity(4)
+		inv_a[:3, :3] = ma[:3, :3].T
+		inv_a[:3, 3] = -np.dot(ma[:3, :3].T, ma[:3, 3])
+		return Transform(np.dot(b.to_matrix(), inv_a))
+
+	@staticmethod
+	def Translation(*args):
+		if len(args) == 1:
+			x, y, z = args[0].X, args[0].Y, args[0].Z
+		else:
+			x, y, z = args
+		trans = Transform(1.0)
+		trans.m[:3, 3] = (x, y, z)
+		return trans
+
+	## uniform scale around a point, or non-uniform scale in a plane
+	@staticmethod
+	def Scale(*args):
+		if len(args) == 2:
+			anchor = args[0]
+			s = float(args[1])
+			trans = Transform(1.0)
+			trans.m[:3, :3] *= s
+			trans.m[:3, 3] = (np.array([anchor.X, anchor.Y, anchor.Z]) * (1.0 - s))
+			return trans
+		plane = args[0]
+		scale = np.identity(4)
+		scale[0, 0] = args[1]
+		scale[1, 1] = args[2]
+		scale[2, 2] = args[3]
+		pm = plane.to_matrix()
+		return Transform(np.dot(pm, np.dot(scale, np.linalg.inv(pm))))
+
+	## rotation of an angle (radians) around an axis through a center point
+	@staticmethod
+	def Rotation(angle, axis, center):
+		u = axis.to_array()
+		u = u / np.linalg.norm(u)
+		c = math.cos(angle)
+		s = math.sin(angle)
+		ux = np.array([[0, -u[2], u[1]], [u[2], 0, -u[0]], [-u[1], u[0], 0]])
+		r = c*np.identity(3) + s*ux + (1 - c)*np.outer(u, u)
+		trans = Transform(1.0)
+		trans.m[:3, :3] = r
+		p = center.to_array()
+		trans.m[:3, 3] = p - np.dot(r, p)
+		return trans
+
+	## return (success, inverse transformation)
+	def TryGetInverse(self):
+		try:
+			return True, Transform(np.linalg.inv(self.m))
+		except np.linalg.LinAlgError:
+			return False, Transform(0.0)
+
+	## backend helper, transform an (n,3) array of points
+	def apply_to_points(self, pts):
+		pts = np.asarray(pts, dtype=float)
+		res = np.dot(pts, self.m[:3, :3].T) + self.m[:3, 3]
+		return res
+
+
+## generate M00...M33 properties
+def _matrix_property(i, j):
+	def fget(self):
+		return float(self.m[i, j])
+
+	def fset(self, value):
+		self.m[i, j] = value
+	return property(fget, fset)
+
+for _i in range(4):
+	for _j in range(4):
+		setattr(Transform, "M%d%d" % (_i, _j), _matrix_property(_i, _j))
+
+
+#################################################################### Line ####################################################################
+class Line(object):
+
+	## constructor, accepts (from, to) or (x0, y0, z0, x1, y1, z1)
+	def __init__(self, *args):
+		if len(args) == 6:
+			self.From = Point3d(args[0], args[1], args[2])
+			self.To = Point3d(args[3], args[4], args[5])
+		elif len(args) == 2:
+			self.From = Point3d(args[0])
+			self.To = Point3d(args[1])
+		else:
+			self.From = Point3d()
+			self.To = Point3d()
+
+	def ToString(self):
+		return "%s,%s" % (self.From.ToString(), self.To.ToString())
+
+	FromX = property(lambda self: self.From.X)
+	FromY = property(lambda self: self.From.Y)
+	FromZ = property(lambda self: self.From.Z)
+	ToX = property(lambda self: self.To.X)
+	ToY = property(lambda self: self.To.Y)
+	ToZ = property(lambda self: self.To.Z)
+
+	@property
+	def Length(self):
+		return self.From.DistanceTo(self.To)
+
+	@property
+	def Direction(self):
+		return self.To - self.From
+
+	def PointAt(self, t):
+		return Point3d(self.From.X + (self.To.X - self.From.X)*t, self.From.Y + (self.To.Y - self.From.Y)*t, self.From.Z + (self.To.Z - self.From.Z)*t)
+
+	def Transform(self, xform):
+		self.From.Transform(xform)
+		self.To.Transform(xform)
+		return True
+
+	def ToNurbsCurve(self):
+		return LineCurve(self)
+
+
+class LineCurve(object):
+
+	## constructor, accepts (line) or (from, to)
+	def __init__(self, *args):
+		if len(args) == 1:
+			self.Line = Line(args[0].From, args[0].To)
+		else:
+			self.Line = Line(args[0], args[1])
+
+	@property
+	def PointAtStart(self):
+		return Point3d(self.Line.From)
+
+	@property
+	def PointAtEnd(self):
+		return Point3d(self.Line.To)
+
+	def Transform(self, xform):
+		return self.Line.Transform(xform)
+
+	def ToNurbsCurve(self):
+		return self
+
+
+#################################################################### Boxes ####################################################################
+class BoundingBox(object):
+
+	## constructor, accepts (points), (min, max) or (x0, y0, z0, x1, y1, z1)
+	def __init__(self, *args):
+		if len(args) == 6:
+			self.Min = Point3d(args[0], args[1], args[2])
+			self.Max = Point3d(args[3], args[4], args[5])
+		elif len(args) == 2:
+			self.Min = Point3d(args[0])
+			self.Max = Point3d(args[1])
+		elif len(args) == 1:
+			arr = np.array([[p.X, p.Y, p.Z] for p in args[0]], dtype=float)
+			self.Min = Point3d(*arr.min(axis=0))
+			self.Max = Point3d(*arr.max(axis=0))
+		else:
+			self.Min = Point3d(1, 1, 1)
+			self.Max = Point3d(-1, -1, -1)
+
+	@_static_property
+	def Empty(cls):
+		return cls()
+
+	@property
+	def IsValid(self):
+		return self.Min.X <= self.Max.X and self.Min.Y <= self.Max.Y and self.Min.Z <= self.Max.Z
+
+	@property
+	def Center(self):
+		return Point3d((self.Min.X + self.Max.X)*0.5, (self.Min.Y + self.Max.Y)*0.5, (self.Min.Z + self.Max.Z)*0.5)
+
+	@property
+	def Diagonal(self):
+		return self.Max - self.Min
+
+	def Contains(self, pt, strict=False):
+		if strict:
+			return self.Min.X < pt.X < self.Max.X and self.Min.Y < pt.Y < self.Max.Y and self.Min.Z < pt.Z < self.Max.Z
+		return self.Min.X <= pt.X <= self.Max.X and self.Min.Y <= pt.Y <= self.Max.Y and self.Min.Z <= pt.Z <= self.Max.Z
+
+	## grow the box to include a point or another box
+	def Union(self, other):
+		if isinstance(other, BoundingBox):
+			if not other.IsValid:
+				return
+			self.Union(other.Min)
+			self.Union(other.Max)
+		elif not self.IsValid:
+			self.Min = Point3d(other)
+			self.Max = Point3d(other)
+		else:
+			self.Min = Point3d(min(self.Min.X, other.X), min(self.Min.Y, other.Y), min(self.Min.Z, other.Z))
+			self.Max = Point3d(max(self.Max.X, other.X), max(self.Max.Y, other.Y), max(self.Max.Z, other.Z))
+
+	def Inflate(self, amount):
+		self.Min = Point3d(self.Min.X - amount, self.Min.Y - amount, self.Min.Z - amount)
+		self.Max = Point3d(self.Max.X + amount, self.Max.Y + amount, self.Max.Z + amount)
+
+	def GetCorners(self):
+		return [Point3d(x, y, z) for z in (self.Min.Z, self.Max.Z) for y in (self.Min.Y, self.Max.Y) for x in (self.Min.X, self.Max.X)]
+
+
+class Box(object):
+
+	## constructor, accepts (bounding_box), (plane, points_or_geometry) or (plane, x_interval, y_interval, z_interval)
+	def __init__(self, *args):
+		if len(args) == 1:
+			self.Plane = Plane.WorldXY
+			self.X = Interval(args[0].Min.X, args[0].Max.X)
+			self.Y = Interval(args[0].Min.Y, args[0].Max.Y)
+			self.Z = Interval(args[0].Min.Z, args[0].Max.Z)
+		elif len(args) == 4:
+			self.Plane = Plane(args[0])
+			self.X = Interval(args[1].T0, args[1].T1)
+			self.Y = Interval(args[2].T0, args[2].T1)
+			self.Z = Interval(args[3].T0, args[3].T1)
+		else:
+			self.Plane = Plane(args[0])
+			if isinstance(args[1], Mesh):
+				pts = args[1].vertex_array()
+			else:
+				pts = np.array([[p.X, p.Y, p.Z] for p in args[1]], dtype=float)
+			local = np.dot(pts - self.Plane.Origin.to_array(), self.Plane.to_matrix()[:3, :3])
+			lo = local.min(axis=0)
+			hi = local.max(axis=0)
+			self.X = Interval(lo[0], hi[0])
+			self.Y = Interval(lo[1], hi[1])
+			self.Z = Interval(lo[2], hi[2])
+
+	@property
+	def Center(self):
+		return self.PointAt(0.5, 0.5, 0.5)
+
+	@property
+	def BoundingBox(self):
+		return BoundingBox(self.GetCorners())
+
+	def Contains(self, pt, strict=False):
+		local = self.Plane.RemapToPlaneSpace(pt)[1]
+		return self.X.IncludesParameter(local.X, strict) and self.Y.IncludesParameter(local.Y, strict) and self.Z.IncludesParameter(local.Z, strict)
+
+	## evaluate the box at normalized parameters
+	def PointAt(self, x, y, z):
+		return self.Plane.PointAt(self.X.T0 + self.X.Length*x, self.Y.T0 + self.Y.Length*y, self.Z.T0 + self.Z.Length*z)
+
+	def GetCorners(self):
+		return [self.PointAt(x, y, z) for z in (0, 1) for y in (0, 1) for x in (0, 1)]
+
+	## grow the box to include a point
+	def Union(self, pt):
+		local = self.Plane.RemapToPlaneSpace(pt)[1]
+		self.X.Grow(local.X)
+		self.Y.Grow(local.Y)
+		self.Z.Grow(local.Z)
+
+
+#################################################################### Mesh ####################################################################
+class MeshFace(object):
+
+	__slots__ = ('A', 'B', 'C', 'D')
+
+	def __init__(self, a, b, c, d=None):
+		self.A = int(a)
+		self.B = int(b)
+		self.C = int(c)
+		self.D = int(c) if d is None else int(d)
+
+	@property
+	def IsQuad(self):
+		return self.C != self.D
+
+	@property
+	def IsTriangle(self):
+		return self.C == self.D
+
+
+class MeshVertexList(object):
+
+	def __init__(self, mesh):
+		self._mesh = mesh
+
+	@property
+	def Count(self):
+		return len(self._mesh.vertex_array())
+
+	def __len__(self):
+		return self.Count
+
+	def __getitem__(self, i):
+		v = self._mesh.vertex_array()[i]
+		return Point3d(v[0], v[1], v[2])
+
+	def __iter__(self):
+		for v in self._mesh.vertex_array().tolist():
+			yield Point3d(v[0], v[1], v[2])
+
+	## add a vertex, given as point or coordinates, and return its index
+	def Add(self, *args):
+		if len(args) == 1:
+			args = (args[0].X, args[0].Y, args[0].Z)
+		self._mesh._pending_vertices.append((float(args[0]), float(args[1]), float(args[2])))
+		self._mesh._clear_cache()
+		return len(self._mesh._vertices) + len(self._mesh._pending_vertices) - 1
+
+	def SetVertex(self, i, x, y, z):
+		self._mesh.vertex_array()[i] = (x, y, z)
+		self._mesh._clear_cache()
+		return True
+
+	def ToPoint3dArray(self):
+		return list(self)
+
+
+class MeshFaceList(object):
+
+	def __init__(self, mesh):
+		self._mesh = mesh
+
+	@property
+	def Count(self):
+		return len(self._mesh.face_array())
+
+	def __len__(self):
+		return self.Count
+
+	def __getitem__(self, i):
+		return MeshFace(*self._mesh.face_array()[i])
+
+	def __iter__(self):
+		for f in self._mesh.face_array().tolist():
+			yield MeshFace(*f)
+
+	## add a triangular or quad face and return its index
+	def AddFace(self, a, b, c, d=None):
+		if d is None:
+			d = c
+		self._mesh._pending_faces.append((int(a), int(b), int(c), int(d)))
+		self._mesh._clear_cache()
+		return len(self._mesh._faces) + len(self._mesh._pending_faces) - 1
+
+
+class Mesh(object):
+
+	## constructor
+	def __init__(self):
+		self._vertices = np.zeros((0, 3), dtype=float)
+		self._faces = np.zeros((0, 4), dtype=int)
+		self._pending_vertices = []
+		self._pending_faces = []
+		self._triangles = None
+		self.Vertices = MeshVertexList(self)
+		self.Faces = MeshFaceList(self)
+
+	def ToString(self):
+		return "Mesh (%s vertices, %s faces)" % (self.Vertices.Count, self.Faces.Count)
+
+	## backend helper, create a mesh from vertices and faces arrays
+	@classmethod
+	def from_arrays(cls, vertices, faces):
+		mesh = cls()
+		mesh._vertices = np.array(vertices, dtype=float).reshape(-1, 3)
+		faces = np.array(faces, dtype=int)
+		if faces.size == 0:
+			faces = faces.reshape(0, 4)
+		elif faces.shape[1] == 3:
+			faces = np.hstack((faces, faces[:, 2:3]))
+		mesh._faces = faces
+		return mesh
+
+	def _clear_cache(self):
+		self._triangles = None
+
+	## backend helper, return the (n,3) vertex array
+	def vertex_array(self):
+		if len(self._pending_vertices) > 0:
+			self._vertices = np.vstack((self._vertices, np.array(self._pending_vertices, dtype=float)))
+			self._pending_vertices = []
+		return self._vertices
+
+	## backend helper, return the (n,4) face array (triangles repeat the third vertex, as RhinoCommon)
+	def face_array(self):
+		if len(self._pending_faces) > 0:
+			self._faces = np.vstack((self._faces, np.array(self._pending_faces, dtype=int)))
+			self._pending_faces = []
+		return self._faces
+
+	## backend helper, return the (n,3,3) array of triangles (quads are split in two triangles)
+	def triangle_array(self):
+		if self._triangles is None:
+			v = self.vertex_array()
+			f = self.face_array()
+			quads = f[f[:, 2] != f[:, 3]]
+			tri_ids = np.vstack((f[:, :3], quads[:, [0, 2, 3]]))
+			self._triangles = v[tri_ids] if len(tri_ids) > 0 else np.zeros((0, 3, 3))
+		return self._triangles
+
+	def Duplicate(self):
+		mesh = Mesh.from_arrays(self.vertex_array().copy(), self.face_array().copy())
+		mesh._triangles = self._triangles
+		return mesh
+
+	def DuplicateMesh(self):
+		return self.Duplicate()
+
+	## transform the mesh in place
+	def Transform(self, xform):
+		self._vertices = xform.apply_to_points(self.vertex_array())
+		self._clear_cache()
+		return True
+
+	def Translate(self, *args):
+		return self.Transform(Transform.Translation(*args))
+
+	def Append(self, other):
+		offset = len(self.vertex_array())
+		self._vertices = np.vstack((self._vertices, other.vertex_array()))
+		self._faces = np.vstack((self.face_array(), other.face_array() + offset))
+		self._clear_cache()
+
+	## normals are computed on demand by this backend
+	def RebuildNormals(self):
+		return True
+
+	## merge coincident vertices
+	def Weld(self, angle_radians):
+		v = self.vertex_array()
+		if len(v) == 0:
+			return
+		keys = np.round(v / zero_tolerance).astype(np.int64)
+		_, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+		self._vertices = v[first]
+		self._faces = inverse.reshape(-1)[self.face_array()]
+		self._clear_cache()
+
+	def GetBoundingBox(self, accurate=True):
+		v = self.vertex_array()
+		if len(v) == 0:
+			return BoundingBox()
+		lo = v.min(axis=0)
+		hi = v.max(axis=0)
+		return BoundingBox(lo[0], lo[1], lo[2], hi[0], hi[1], hi[2])
+
+	## a mesh is closed if every edge is shared by exactly two faces
+	@property
+	def IsClosed(self):
+		f = self.face_array()
+		if len(f) == 0:
+			return False
+		quads = f[f[:, 2] != f[:, 3]]
+		tris = f[f[:, 2] == f[:, 3]]
+		edges = [tris[:, [0, 1]], tris[:, [1, 2]], tris[:, [2, 0]], quads[:, [0, 1]], quads[:, [1, 2]], quads[:, [2, 3]], quads[:, [3, 0]]]
+		edges = np.sort(np.vstack(edges), axis=1)
+		_, counts = np.unique(edges, axis=0, return_counts=True)
+		return bool(np.all(counts == 2))
+
+	def ClosestPoint(self, pt):
+		tris = self.triangle_array()
+		if len(tris) == 0:
+			return Point3d(pt)
+		cp = _closest_points_on_triangles(pt.to_array(), tris)
+		d = np.sum((cp - pt.to_array())**2, axis=1)
+		best = cp[np.argmin(d)]
+		return Point3d(best[0], best[1], best[2])
+
+	## point containment test by ray parity (majority of three rays)
+	def IsPointInside(self, pt, tolerance, strictlyIn):
+		tris = self.triangle_array()
+		if len(tris) == 0:
+			return False
+		p = pt.to_array()
+		cp = _closest_points_on_triangles(p, tris)
+		if np.min(np.sum((cp - p)**2, axis=1)) <= tolerance*tolerance:
+			return not strictlyIn
+		votes = 0
+		for direction in _parity_directions:
+			hits = _ray_triangle_params(p, direction, tris)
+			t = np.sort(hits[hits > zero_tolerance])
+			if len(t) > 0:
+				## discard duplicate hits on shared edges
+				t = t[np.concatenate(([True], np.diff(t) > zero_tolerance))]
+			if len(t) % 2 == 1:
+				votes += 1
+		return votes >= 2
+
+
+## fixed, non axis-aligned directions for parity tests
+_parity_directions = [np.array(d) / np.linalg.norm(d) for d in ([0.5773, 0.5774, 0.5775], [-0.3141, 0.5926, 0.7414], [0.8164, -0.4082, 0.4086])]
+
+
+## closest points from a point to each of the (n,3,3) triangles (Ericson, Real-Time Collision Detection 5.1.5)
+def _closest_points_on_triangles(p, tris):
+	a = tris[:, 0]
+	b = tris[:, 1]
+	c = tris[:, 2]
+	ab = b - a
+	ac = c - a
+	ap = p - a
+	bp = p - b
+	cp = p - c
+	d1 = _dot(ab, ap)
+	d2 = _dot(ac, ap)
+	d3 = _dot(ab, bp)
+	d4 = _dot(ac, bp)
+	d5 = _dot(ab, cp)
+	d6 = _dot(ac, cp)
+	va = d3*d6 - d5*d4
+	vb = d5*d2 - d1*d6
+	vc = d1*d4 - d3*d2
+	with np.errstate(divide='ignore', invalid='ignore'):
+		denom = va + vb + vc
+		v = np.where(denom != 0, vb / denom, 0.0)
+		w = np.where(denom != 0, vc / denom, 0.0)
+		res = a + ab*v[:, None] + ac*w[:, None]
+		## edge bc
+		w_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+		mask = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+		res = np.where(mask[:, None], b + (c - b)*w_bc[:, None], res)
+		## edge ac
+		w_ac = d2 / (d2 - d6)
+		mask = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+		res = np.where(mask[:, None], a + ac*w_ac[:, None], res)
+		## vertex c
+		mask = (d6 >= 0) & (d5 <= d6)
+		res = np.where(mask[:, None], c, res)
+		## edge ab
+		v_ab = d1 / (d1 - d3)
+		mask = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+		res = np.where(mask[:, None], a + ab*v_ab[:, None], res)
+		## vertex b
+		mask = (d3 >= 0) & (d4 <= d3)
+		res = np.where(mask[:, None], b, res)
+		## vertex a
+		mask = (d1 <= 0) & (d2 <= 0)
+		res = np.where(mask[:, None], a, res)
+	return res
+
+
+## ray parameters of the intersections between a ray and (n,3,3) triangles (Moller-Trumbore), nan where missed
+def _ray_triangle_params(origin, direction, tris):
+	e1 = tris[:, 1] - tris[:, 0]
+	e2 = tris[:, 2] - tris[:, 0]
+	p = np.cross(direction, e2)
+	det = _dot(e1, p)
+	valid = np.abs(det) > zero_tolerance*zero_tolerance
+	with np.errstate(divide='ignore', invalid='ignore'):
+		inv = np.where(valid, 1.0 / det, 0.0)
+		s = origin - tris[:, 0]
+		u = _dot(s, p) * inv
+		q = np.cross(s, e1)
+		v = np.dot(q, direction) * inv
+		t = _dot(e2, q) * inv
+	hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1)
+	return np.where(hit, t, np.nan)
+
+
+## endpoints of the section of a triangle by a plane, given the signed distances of its vertices
+def _triangle_plane_section(tri, dist):
+	pts = []
+	for i in range(3):
+		if abs(dist[i]) <= zero_tolerance:
+			pts.append(tri[i])
+	for i, j in ((0, 1), (1, 2), (2, 0)):
+		if (dist[i] > zero_tolerance and dist[j] < -zero_tolerance) or (dist[i] < -zero_tolerance and dist[j] > zero_tolerance):
+			pts.append(tri[i] + (tri[j] - tri[i]) * (dist[i] / (dist[i] - dist[j])))
+	return pts
+
+
+## triangle normals (unitized) and plane offsets
+def _triangle_planes(tris):
+	n = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+	length = np.linalg.norm(n, axis=1)
+	valid = length > zero_tolerance*zero_tolerance
+	n[valid] /= length[valid][:, None]
+	d = -_dot(n, tris[:, 0])
+	return n, d, valid
+
+
+#################################################################### Intersection ####################################################################
+class Intersection(object):
+
+	## return the intersection segments between two meshes (coplanar contacts are not reported)
+	@staticmethod
+	def MeshMeshFast(mesh_a, mesh_b):
+		tris_a = mesh_a.triangle_array()
+		tris_b = mesh_b.triangle_array()
+		if len(tris_a) == 0 or len(tris_b) == 0:
+			return []
+
+		a_min = tris_a.min(axis=1)
+		a_max = tris_a.max(axis=1)
+		b_min = tris_b.min(axis=1)
+		b_max = tris_b.max(axis=1)
+
+		## discard triangles outside of the other mesh bounding box
+		ids_a = np.nonzero(np.all(a_max >= b_min.min(axis=0), axis=1) & np.all(a_min <= b_max.max(axis=0), axis=1))[0]
+		ids_b = np.nonzero(np.all(b_max >= a_min.min(axis=0), axis=1) & np.all(b_min <= a_max.max(axis=0), axis=1))[0]
+		if len(ids_a) == 0 or len(ids_b) == 0:
+			return []
+
+		n_a, d_a, valid_a = _triangle_planes(tris_a)
+		n_b, d_b, valid_b = _triangle_planes(tris_b)
+
+		segments = []
+		chunk = max(1, 2**20 // len(ids_b))
+		for start in range(0, len(ids_a), chunk):
+			sub_a = ids_a[start:start+chunk]
+			## triangle bounding boxes overlap
+			overlap = np.all((a_max[sub_a][:, None, :] >= b_min[ids_b][None, :, :]) & (a_min[sub_a][:, None, :] <= b_max[ids_b][None, :, :]), axis=2)
+			pa, pb = np.nonzero(overlap)
+			if len(pa) == 0:
+				continue
+			ia = sub_a[pa]
+			ib = ids_b[pb]
+			keep = valid_a[ia] & valid_b[ib]
+			ia = ia[keep]
+			ib = ib[keep]
+
+			## signed distances of each triangle vertices from the other triangle plane
+			dist_b = np.einsum('ij,ikj->ik', n_a[ia], tris_b[ib]) + d_a[ia][:, None]
+			dist_a = np.einsum('ij,ikj->ik', n_b[ib], tris_a[ia]) + d_b[ib][:, None]
+			crossing = ~(np.all(dist_b > zero_tolerance, axis=1) | np.all(dist_b < -zero_tolerance, axis=1))
+			crossing &= ~(np.all(dist_a > zero_tolerance, axis=1) | np.all(dist_a < -zero_tolerance, axis=1))
+
+			for k in np.nonzero(crossing)[0]:
+				seg = _triangle_triangle_segment(tris_a[ia[k]], n_a[ia[k]], dist_a[k], tris_b[ib[k]], n_b[ib[k]], dist_b[k])
+				if seg is not None:
+					segments.append(seg)
+		return segments
+
+
+	## return the intersection points between a mesh and a line segment, sorted along the line
+	@staticmethod
+	def MeshLine(mesh, line):
+		tris = mesh.triangle_array()
+		if len(tris) == 0:
+			return []
+		origin = line.From.to_array()
+		direction = line.To.to_array() - origin
+		t = _ray_triangle_params(origin, direction, tris)
+		t = np.sort(t[(t >= 0) & (t <= 1)])
+		if len(t) > 0:
+			t = t[np.concatenate(([True], np.diff(t) > zero_tolerance))]
+		return [line.PointAt(float(ti)) for ti in t]
+
+
+	## return the section of a mesh by a plane as a list of polylines (lists of points), or None if there is no intersection
+	@staticmethod
+	def MeshPlane(mesh, plane):
+		tris = mesh.triangle_array()
+		if len(tris) == 0:
+			return None
+		eq = plane.GetPlaneEquation()
+		dist = np.dot(tris, eq[:3]) + eq[3]
+		crossing = ~(np.all(dist > zero_tolerance, axis=1) | np.all(dist < -zero_tolerance, axis=1))
+		polylines = []
+		for k in np.nonzero(crossing)[0]:
+			pts = _triangle_plane_section(tris[k], dist[k])
+			if len(pts) >= 2:
+				polylines.append([Point3d(p[0], p[1], p[2]) for p in pts[:2]])
+		if len(polylines) == 0:
+			return None
+		return polylines
+
+
+## intersection segment between two non-coplanar triangles, or None
+def _triangle_triangle_segment(tri_a, n_a, dist_a, tri_b, n_b, dist_b):
+	direction = np.cross(n_a, n_b)
+	if np.dot(direction, direction) < zero_tolerance:
+		return None
+	sec_a = _triangle_plane_section(tri_a, dist_a)
+	sec_b = _triangle_plane_section(tri_b, dist_b)
+	if len(sec_a) == 0 or len(sec_b) == 0:
+		return None
+	t_a = [np.dot(p, direction) for p in sec_a]
+	t_b = [np.dot(p, direction) for p in sec_b]
+	lo = max(min(t_a), min(t_b))
+	hi = min(max(t_a), max(t_b))
+	## discard point contacts
+	if hi - lo <= zero_tolerance:
+		return None
+	pts = sec_a if (max(t_a) - min(t_a)) >= (max(t_b) - min(t_b)) else sec_b
+	t_pts = t_a if pts is sec_a else t_b
+	p0 = pts[int(np.argmin(t_pts))]
+	p1 = pts[int(np.argmax(t_pts))]
+	span = max(t_pts) - min(t_pts)
+	start = p0 + (p1 - p0) * ((lo - min(t_pts)) / span)
+	end = p0 + (p1 - p0) * ((hi - min(t_pts)) / span)
+	return Line(start[0], start[1], start[2], end[0], end[1], end[2])
+
+
+#################################################################### AreaMassProperties ####################################################################
+class AreaMassProperties(object):
+
+	def __init__(self, area, centroid):
+		self.Area = area
+		self.Centroid = centroid
+
+	## compute area and area centroid of a mesh
+	@staticmethod
+	def Compute(geo):
+		if not isinstance(geo, Mesh):
+			return None
+		tris = geo.triangle_array()
+		if len(tris) == 0:
+			return None
+		areas = 0.5 * np.linalg.norm(np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]), axis=1)
+		total = areas.sum()
+		if total <= zero_tolerance:
+			c = geo.vertex_array().mean(axis=0)
+		else:
+			c = (tris.mean(axis=1) * areas[:, None]).sum(axis=0) / total
+		return AreaMassProperties(float(total), Point3d(c[0], c[1], c[2]))
@@ -9,11 +9,11 @@ This file is part of Wasp. https://github.com/ar0551/Wasp
 Utilities
 """
 
-from Rhino.Geometry import Mesh
-from Rhino.Geometry import Plane
-from Rhino.Geometry import Vector3d, Point3d
-from Rhino.Geometry import LineCurve
-from Rhino.Geometry import Transform
+from wasp.geometry import Mesh
+from wasp.geometry import Plane
+from wasp.geometry import Vector3d, Point3d
+from wasp.geometry import LineCurve
+from wasp.geometry import Transform
 
 
 #################################################################### Utilities ####################################################################
@@ -109,4 +109,28 @@ def transform_from_data(data):
 	trans.M31 = float(data['M31'])
 	trans.M32 = float(data['M32'])
 	trans.M33 = float(data['M33'])
-	return trans
\ No newline at end of file
+	return trans
+
+#################################################################### Bitmasks ####################################################################
+## bitmasks store sets of small non-negative ints (connection and rule indexes) in a single int, with bit i set if i is in the set
+
+def mask_from_list(indexes):
+	mask = 0
+	for i in indexes:
+		mask |= 1 << i
+	return mask
+
+
+def mask_to_list(mask):
+	indexes = []
+	while mask:
+		low_bit = mask & -mask
+		indexes.append(low_bit.bit_length() - 1)
+		mask ^= low_bit
+	return indexes
+
+
+## number of set bits
+def mask_count(mask):
+	return bin(mask).count('1')
+
@@ -0,0 +1,83 @@
+"""
+(C) 2017-2020 Andrea Rossi <ghwasp@gmail.com>
+
+This file is part of Wasp. https://github.com/ar0551/Wasp
+@license GPL-3.0 <https://www.gnu.org/licenses/gpl.html>
+
+@version 0.7.001
+
+Tests of the placement journal (run with the headless geometry backend)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from wasp.geometry import Point3d, Vector3d, Plane, Mesh
+from wasp.core import Part, Connection, Collider, Rule, Aggregation
+from wasp.field import Field
+
+
+## axis aligned box mesh
+def box_mesh(size):
+	h = size / 2.0
+	mesh = Mesh()
+	for z in (-h, h):
+		for y in (-h, h):
+			for x in (-h, h):
+				mesh.Vertices.Add(x, y, z)
+	for f in ((0,2,3,1), (4,5,7,6), (0,1,5,4), (2,6,7,3), (0,4,6,2), (1,3,7,5)):
+		mesh.Faces.AddFace(*f)
+	return mesh
+
+
+## cube part with one connection on each face
+def cube_part(name, collider_size):
+	conns = []
+	dirs = [(Vector3d(1,0,0), Vector3d(0,1,0)), (Vector3d(-1,0,0), Vector3d(0,1,0)), (Vector3d(0,1,0), Vector3d(0,0,1)), (Vector3d(0,-1,0), Vector3d(0,0,1)), (Vector3d(0,0,1), Vector3d(1,0,0)), (Vector3d(0,0,-1), Vector3d(1,0,0))]
+	for i, (n, x) in enumerate(dirs):
+		conns.append(Connection(Plane(Point3d(n.X*0.5, n.Y*0.5, n.Z*0.5), x, Vector3d.CrossProduct(n, x)), 'T', name, i))
+	return Part(name, box_mesh(1.0), conns, Collider([box_mesh(collider_size)]), [])
+
+
+## spherical scalar field, highest at the center of the grid
+def sphere_field(n):
+	pts = []
+	values = []
+	for z in range(n):
+		for y in range(n):
+			for x in range(n):
+				pts.append(Point3d(x - n/2.0, y - n/2.0, z - n/2.0))
+				values.append(-((x - n/2.0)**2 + (y - n/2.0)**2 + (z - n/2.0)**2))
+	return Field('f', pts, [n, n, n], 1.0, values=values)
+
+
+def field_aggregation():
+	parts = [cube_part('A', 0.98), cube_part('B', 0.9)]
+	rules = []
+	for p1 in parts:
+		for c1 in range(len(p1.connections)):
+			for p2 in parts:
+				for c2 in range(len(p2.connections)):
+					rules.append(Rule(p1.name, c1, p2.name, c2))
+	return Aggregation('test', parts, rules, 0, _field=[sphere_field(8)], _rnd_seed=1)
+
+
+def placements(aggregation):
+	return [(p.name, p.parent, p.conn_on_parent, round(p.center.X, 6), round(p.center.Y, 6), round(p.center.Z, 6)) for p in aggregation.aggregated_parts]
+
+
+## removing parts and aggregating again places the same parts as an uninterrupted aggregation
+def test_field_trim_then_regrow_matches_direct_run():
+	direct = field_aggregation()
+	direct.aggregate_field(60)
+
+	trimmed = field_aggregation()
+	trimmed.aggregate_field(60)
+	trimmed.remove_elements(30)
+	trimmed.aggregate_field(10)
+	trimmed.remove_elements(15)
+	trimmed.aggregate_field(45)
+
+	assert placements(trimmed) == placements(direct)